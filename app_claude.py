@@ -1,16 +1,29 @@
 import streamlit as st
-import pandas as pd
 import json
-from openai import OpenAI
-import PyPDF2
-import io
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT, TA_CENTER
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+import time
+
+from persona_core.pdf import generate_persona_pdf, persona_pdf_key
+from persona_core.export import personas_zip, merged_personas_pdf
+from persona_core.generation import DEFAULT_MAX_IN_FLIGHT
+from persona_core.jobs import JobQueue, DONE, FAILED, CANCELLED
+from persona_core.cache import PersonaCache, prompt_key
+from persona_core.store import PersonaStore
+from persona_core.streaming import StreamCollector
+from persona_core.backends import OpenAIBackend, user_message, system_message
+from persona_core.prompts import assemble_prompt
+from persona_core.retrieval import CatalogueIndex, segment_query
+from persona_core.chat_context import ChatContext
+from persona_core.telemetry import InstrumentedBackend, TelemetryRecorder
+from persona_core.scheduler import RequestScheduler, ScheduledBackend
+from persona_core.history import ChatHistoryManager, DEFAULT_HISTORY_BUDGET
+from persona_core.catalogue import content_hash, parse_pdf_catalogue
+from persona_core.segments import (
+    load_segment_csv, find_segment, find_segment_name, SegmentSchemaError,
+    SEGMENTS_PER_PAGE, MAX_SELECT_OPTIONS, PREVIEW_ROWS, MAX_CHAT_SEGMENTS,
+)
+
+# Espace de travail de cette application dans le stockage des personas
+PERSONA_WORKSPACE = "app_claude"
 
 # Configuration Streamlit
 st.set_page_config(
@@ -53,17 +66,93 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_telemetry():
+    """
+    Journal des appels LLM (tokens, latences, cache), partagé par toutes les sessions du serveur
+    """
+    return TelemetryRecorder()
+
+@st.cache_resource
+def get_scheduler():
+    """
+    Limites de débit, nouvelles tentatives et échéances des appels LLM, partagées par toutes les sessions
+    """
+    return RequestScheduler()
+
+@st.cache_resource
+def get_persona_store():
+    """
+    Stockage persistant des personas (SQLite WAL, écriture différée), partagé par toutes les sessions
+    """
+    return PersonaStore()
+
+@st.cache_resource
+def get_job_queue():
+    """
+    Pool des générations en arrière-plan, partagé par toutes les sessions : survit aux reruns du script
+    """
+    return JobQueue()
+
 # Initialiser la session
-if "client" not in st.session_state:
-    st.session_state.client = None
+if "backend" not in st.session_state:
+    st.session_state.backend = None
 if "personas" not in st.session_state:
+    # Complété dans l'onglet Génération par les personas enregistrés qui correspondent aux segments et au catalogue
     st.session_state.personas = {}
+if "personas_restored_for" not in st.session_state:
+    st.session_state.personas_restored_for = None
 if "conversation_history" not in st.session_state:
     st.session_state.conversation_history = []
 if "produits_bancaires_text" not in st.session_state:
     st.session_state.produits_bancaires_text = None
 if "loaded_segments" not in st.session_state:
     st.session_state.loaded_segments = None
+if "segments_file_hash" not in st.session_state:
+    st.session_state.segments_file_hash = None
+    st.session_state.segments_load_report = None
+if "catalogue_index" not in st.session_state:
+    st.session_state.catalogue_index = None
+if "pdf_ready" not in st.session_state:
+    st.session_state.pdf_ready = set()
+if "chat_context" not in st.session_state:
+    st.session_state.chat_context = ChatContext()
+if "generation_batch" not in st.session_state:
+    # Lot de générations en arrière-plan de cette session et nombre de ses résultats déjà repris
+    st.session_state.generation_batch = None
+    st.session_state.generation_seen = 0
+if "history_manager" not in st.session_state:
+    st.session_state.history_manager = ChatHistoryManager()
+
+@st.cache_resource
+def get_persona_cache():
+    """
+    Cache disque des personas, partagé par toutes les sessions du serveur
+    """
+    return PersonaCache()
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_pdf_catalogue(file_hash, _data):
+    """
+    Extrait le texte du PDF une seule fois par contenu de fichier (clé : empreinte SHA-256).
+    Les pages déjà vues dans une version précédente du document sont relues depuis le cache de pages.
+    """
+    start = time.perf_counter()
+    pdf_text, page_count, extracted_count = parse_pdf_catalogue(_data)
+    return pdf_text, page_count, extracted_count, time.perf_counter() - start
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def persona_pdf_bytes(pdf_key, persona_id, _persona_content, segment_name):
+    """
+    PDF d'un persona, rendu une seule fois par clé (contenu, nom du segment, version des styles)
+    """
+    return generate_persona_pdf(persona_id, _persona_content, segment_name).getvalue()
+
+# Reruns partiels : st.fragment (Streamlit >= 1.37), st.experimental_fragment avant, page entière sinon
+# (utilisable en @fragment ou fragment(run_every=...) ; sans fragments, pas de rafraîchissement périodique)
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (
+    lambda func=None, **kwargs: func or (lambda f: f)
+)
 
 # Sidebar - Configuration
 with st.sidebar:
@@ -72,8 +161,14 @@ with st.sidebar:
     # API Key
     api_key = st.text_input("Clé API OpenAI", type="password", key="api_key")
     
-    if api_key and st.session_state.client is None:
-        st.session_state.client = OpenAI(api_key=api_key)
+    if api_key and st.session_state.backend is None:
+        # Client importé seulement une fois la clé saisie
+        from openai import OpenAI
+        
+        # max_retries=0 : seul RequestScheduler relance les appels (et voit les 429 pour la pause globale)
+        st.session_state.backend = ScheduledBackend(
+            InstrumentedBackend(OpenAIBackend(OpenAI(api_key=api_key, max_retries=0)), get_telemetry()), get_scheduler()
+        )
         st.success("✅ Connecté à OpenAI !")
     
     st.divider()
@@ -89,17 +184,23 @@ with st.sidebar:
     
     if uploaded_pdf is not None:
         try:
-            # Lire le PDF
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(uploaded_pdf.read()))
-            
-            # Extraire le texte
-            pdf_text = ""
-            for page in pdf_reader.pages:
-                pdf_text += page.extract_text() + "\n"
+            # Lire le PDF (analysé une seule fois par contenu de fichier, pas à chaque rerun)
+            pdf_data = uploaded_pdf.getvalue()
+            load_start = time.perf_counter()
+            pdf_text, page_count, extracted_count, parse_seconds = load_pdf_catalogue(content_hash(pdf_data), pdf_data)
+            load_seconds = time.perf_counter() - load_start
             
             st.session_state.produits_bancaires_text = pdf_text
             
-            st.success(f"✅ PDF chargé ! ({len(pdf_reader.pages)} pages)")
+            # Index de recherche reconstruit uniquement si le contenu du catalogue a changé
+            if st.session_state.catalogue_index is None or st.session_state.catalogue_index.source_text != pdf_text:
+                st.session_state.catalogue_index = CatalogueIndex.from_text(pdf_text)
+            
+            st.success(f"✅ PDF chargé ! ({page_count} pages)")
+            if load_seconds < parse_seconds / 2:
+                st.caption(f"⏱️ Analysé en {parse_seconds:.2f} s au premier chargement, réutilisé depuis le cache ({load_seconds * 1000:.0f} ms)")
+            else:
+                st.caption(f"⏱️ Analysé en {parse_seconds:.2f} s ({extracted_count} page(s) extraite(s), {page_count - extracted_count} inchangée(s))")
             
             # Aperçu
             with st.expander("📄 Aperçu du contenu"):
@@ -112,6 +213,7 @@ with st.sidebar:
         st.info("✅ Catalogue produits chargé en mémoire")
         if st.button("🗑️ Supprimer le catalogue"):
             st.session_state.produits_bancaires_text = None
+            st.session_state.catalogue_index = None
             st.rerun()
     else:
         st.warning("⚠️ Aucun catalogue chargé")
@@ -128,6 +230,23 @@ with st.sidebar:
         index=0
     )
     
+    max_in_flight = st.slider(
+        "Générations simultanées",
+        min_value=1,
+        max_value=16,
+        value=DEFAULT_MAX_IN_FLIGHT,
+        help="Nombre maximum d'appels OpenAI en parallèle lors de la génération par lot"
+    )
+
+    history_budget = st.slider(
+        "Budget de l'historique du chat (tokens)",
+        min_value=1000,
+        max_value=16000,
+        value=DEFAULT_HISTORY_BUDGET,
+        step=500,
+        help="Au-delà, les anciens échanges sont résumés en arrière-plan ; seuls les plus récents sont envoyés tels quels"
+    )
+    
     st.divider()
     st.info("💡 Configurez votre clé API OpenAI et chargez le catalogue produits pour commencer")
 
@@ -190,29 +309,36 @@ segments_data = [
     }
 ]
 
-def create_prompt(segment):
-    base_info = f"""Génère une description complète et détaillée d'une persona marketing pour un segment bancaire avec les caractéristiques suivantes:
+def catalogue_index():
+    """
+    Index BM25 du catalogue, construit au chargement (reconstruit si le texte a changé)
+    """
+    index = st.session_state.catalogue_index
+    if index is None or index.source_text != st.session_state.produits_bancaires_text:
+        index = CatalogueIndex.from_text(st.session_state.produits_bancaires_text)
+        st.session_state.catalogue_index = index
+    return index
 
-Nom du segment: {segment.get('name', 'N/A')}
-Âge moyen: {segment.get('age', 'N/A')} ans
-Nombre de produits utilisés: {segment.get('nbProducts', 'N/A')}
-Revenu mensuel (Hommes): {segment.get('revenueHommes', 'N/A')}
-Revenu mensuel (Femmes): {segment.get('revenueFemmes', 'N/A')}
-Accessibilité mobile: {segment.get('mobileAccess', 'N/A')}
-Accessibilité email: {segment.get('emailAccess', 'N/A')}
-Caractéristiques principales: {segment.get('characteristics', 'N/A')}"""
+def catalogue_context(query):
+    """
+    Produits du catalogue les plus pertinents pour une requête
+    """
+    return catalogue_index().relevant_products(query)
 
+def create_prompt(segment):
+    # Instructions d'abord, identiques pour tous les segments (préfixe mis en cache par le fournisseur) ;
+    # les données du segment et sa sélection du catalogue sont ajoutées à la fin par assemble_prompt.
+    # Un catalogue qui tient en entier dans une sélection va dans le préfixe, commun à tout le lot.
+    catalogue_products = shared_catalogue = None
     if st.session_state.produits_bancaires_text:
-        produits_info = f"""
-
-CATALOGUE DES PRODUITS BANCAIRES DISPONIBLES:
-{st.session_state.produits_bancaires_text[:8000]}
+        shared_catalogue, catalogue_products = catalogue_index().persona_catalogue(segment_query(segment))
+        produits_info = """
 
-IMPORTANT: Utilise ce catalogue pour recommander des produits SPÉCIFIQUES avec leurs TARIFS EXACTS du catalogue."""
+IMPORTANT: Utilise le catalogue fourni en fin de message pour recommander des produits SPÉCIFIQUES avec leurs TARIFS EXACTS du catalogue."""
     else:
         produits_info = "\n\nNote: Aucun catalogue produits chargé. Fais des recommandations générales sans tarifs spécifiques."
     
-    prompt = base_info + produits_info + """
+    instructions = "Génère une description complète et détaillée d'une persona marketing pour le segment bancaire décrit dans les DONNÉES DU SEGMENT en fin de message." + produits_info + """
 
 Fournis une description professionnelle en français incluant:
 - Profil démographique détaillé (avec différences possibles entre hommes et femmes)
@@ -227,159 +353,7 @@ Fournis une description professionnelle en français incluant:
 
 Format: Utilise des sections claires avec des titres en gras."""
     
-    return prompt
-
-def generate_persona_pdf(persona_id, persona_content, segment_name):
-    """
-    Génère un PDF formaté pour un persona
-    """
-    buffer = io.BytesIO()
-    
-    # Créer le document PDF
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=2*cm,
-        leftMargin=2*cm,
-        topMargin=2*cm,
-        bottomMargin=2*cm
-    )
-    
-    # Styles
-    styles = getSampleStyleSheet()
-    
-    # Style personnalisé pour le titre
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor='#d32f2f',
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    # Style pour les sous-titres
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor='#b71c1c',
-        spaceAfter=12,
-        spaceBefore=12
-    )
-    
-    # Style pour le texte normal
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=11,
-        alignment=TA_JUSTIFY,
-        spaceAfter=10
-    )
-    
-    # Contenu du PDF
-    story = []
-    
-    # Titre
-    story.append(Paragraph(f"PERSONA MARKETING", title_style))
-    story.append(Paragraph(f"Cluster {persona_id}: {segment_name}", heading_style))
-    story.append(Spacer(1, 0.5*cm))
-    
-    # Convertir le contenu markdown en paragraphes PDF
-    lines = persona_content.split('\n')
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            story.append(Spacer(1, 0.3*cm))
-            continue
-        
-        # Détection des titres (lignes avec **)
-        if line.startswith('**') and line.endswith('**'):
-            title_text = line.replace('**', '')
-            story.append(Paragraph(title_text, heading_style))
-        elif line.startswith('###'):
-            title_text = line.replace('###', '').strip()
-            story.append(Paragraph(title_text, heading_style))
-        elif line.startswith('##'):
-            title_text = line.replace('##', '').strip()
-            story.append(Paragraph(title_text, heading_style))
-        elif line.startswith('#'):
-            title_text = line.replace('#', '').strip()
-            story.append(Paragraph(title_text, heading_style))
-        elif line.startswith('- ') or line.startswith('• '):
-            # Liste à puces
-            text = line[2:].strip()
-            story.append(Paragraph(f"• {text}", normal_style))
-        else:
-            # Texte normal - nettoyer le markdown basique
-            text = line.replace('**', '')
-            if text:
-                story.append(Paragraph(text, normal_style))
-    
-    # Footer
-    story.append(Spacer(1, 1*cm))
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor='gray',
-        alignment=TA_CENTER
-    )
-    story.append(Paragraph("Généré par le Générateur de Personas Marketing - Société Générale Côte d'Ivoire", footer_style))
-    
-    # Générer le PDF
-    doc.build(story)
-    
-    buffer.seek(0)
-    return buffer
-
-def generate_persona(segment, model):
-    """
-    Génère un persona avec OpenAI
-    """
-    if st.session_state.client is None:
-        st.error("❌ Veuillez d'abord configurer votre clé API OpenAI dans la barre latérale.")
-        return None
-    
-    prompt = create_prompt(segment)
-    
-    try:
-        message = st.session_state.client.chat.completions.create(
-            model=model,
-            max_tokens=2500,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        st.session_state.personas[segment.get("id", 0)] = message.choices[0].message.content
-        return message.choices[0].message.content
-    
-    except Exception as e:
-        st.error(f"❌ Erreur lors de la génération: {e}")
-        return None
-    if st.session_state.client is None:
-        st.error("❌ Veuillez d'abord configurer votre clé API OpenAI dans la barre latérale.")
-        return None
-    
-    prompt = create_prompt(segment)
-    
-    try:
-        message = st.session_state.client.chat.completions.create(
-            model=model,
-            max_tokens=2500,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        st.session_state.personas[segment.get("id", 0)] = message.choices[0].message.content
-        return message.choices[0].message.content
-    
-    except Exception as e:
-        st.error(f"❌ Erreur lors de la génération: {e}")
-        return None
+    return assemble_prompt(instructions, segment, catalogue_products, shared_catalogue)
 
 # Onglets principaux
 tab1, tab2, tab3 = st.tabs(["📋 Segments", "🎯 Générer Personas", "💬 Chat Intelligent"])
@@ -400,11 +374,37 @@ with tab1:
         uploaded_file = st.file_uploader("Chargez un fichier CSV avec vos segments", type="csv")
         
         if uploaded_file is not None:
-            df = pd.read_csv(uploaded_file)
-            st.session_state.loaded_segments = df.to_dict('records')
-            st.dataframe(df, use_container_width=True)
-            st.success("✅ Fichier chargé avec succès!")
-            current_segments = st.session_state.loaded_segments
+            # Lecture et validation une seule fois par fichier : les reruns réutilisent la table en colonnes
+            file_hash = content_hash(uploaded_file.getvalue())
+            if st.session_state.segments_file_hash != file_hash:
+                load_start = time.perf_counter()
+                try:
+                    st.session_state.loaded_segments, ignored, missing, warnings = load_segment_csv(uploaded_file)
+                    st.session_state.segments_load_report = (time.perf_counter() - load_start, ignored, missing, warnings)
+                except SegmentSchemaError as e:
+                    st.session_state.loaded_segments = None
+                    st.session_state.segments_load_report = e
+                st.session_state.segments_file_hash = file_hash
+            
+            if isinstance(st.session_state.segments_load_report, SegmentSchemaError):
+                st.error(f"❌ Erreur lors du chargement du CSV: {st.session_state.segments_load_report}")
+                current_segments = []
+            else:
+                load_seconds, ignored, missing, warnings = st.session_state.segments_load_report
+                current_segments = st.session_state.loaded_segments
+                # Aperçu limité : le tableau complet serait renvoyé au navigateur à chaque rerun
+                st.dataframe(current_segments.frame.head(PREVIEW_ROWS), use_container_width=True)
+                st.success(
+                    f"✅ {len(current_segments)} segments chargés en {load_seconds:.2f} s "
+                    f"({current_segments.memory_bytes() / 1e6:.1f} Mo en mémoire)"
+                )
+                if missing:
+                    st.caption(f"Colonnes absentes (affichées N/A) : {', '.join(missing)}")
+                if ignored:
+                    st.warning(f"⚠️ Colonnes ignorées : {', '.join(ignored)}")
+                # Valeurs non numériques vidées, lignes sans id écartées : le reste du fichier est chargé
+                for warning in warnings:
+                    st.warning(f"⚠️ {warning}")
         else:
             st.info("💡 Veuillez charger un fichier CSV pour continuer")
             current_segments = []
@@ -414,8 +414,14 @@ with tab1:
     if current_segments:
         st.divider()
         st.subheader("Segments à traiter")
+        # Une page de cartes à la fois : le rendu ne dépend pas du nombre de segments
+        page_count = -(-len(current_segments) // SEGMENTS_PER_PAGE)
+        page = 1
+        if page_count > 1:
+            page = st.number_input(f"Page (sur {page_count})", min_value=1, max_value=page_count, value=1)
+        page_start = (page - 1) * SEGMENTS_PER_PAGE
         cols = st.columns(2)
-        for idx, segment in enumerate(current_segments):
+        for idx, segment in enumerate(current_segments[page_start:page_start + SEGMENTS_PER_PAGE], page_start):
             with cols[idx % 2]:
                 st.markdown(f"""
                 <div class="cluster-box">
@@ -429,6 +435,149 @@ with tab1:
                 </div>
                 """, unsafe_allow_html=True)
 
+# Personas générés (colonne de droite de l'onglet 2)
+@fragment
+def personas_panel(segments_to_use):
+    """
+    Affichage, téléchargements et export groupé en fragment : changer de persona ou
+    préparer un PDF ne réexécute que ce panneau
+    """
+    if st.session_state.personas:
+        st.write("**Personas générés:**")
+        
+        # Identifiants en options (entiers ou textes comme "C1") : key=str trie les types mélangés
+        persona_id = st.selectbox(
+            "Afficher le persona de:",
+            sorted(st.session_state.personas.keys(), key=str),
+            format_func=lambda k: f"Cluster {k}: {find_segment_name(segments_to_use, k)[:40]}..."
+        )
+        
+        if persona_id is not None:
+            
+            st.markdown("---")
+            st.markdown('<div class="persona-output">', unsafe_allow_html=True)
+            st.markdown(st.session_state.personas[persona_id])
+            st.markdown('</div>', unsafe_allow_html=True)
+            
+            col_a, col_b = st.columns(2)
+            
+            with col_a:
+                st.download_button(
+                    label="📥 Télécharger en TXT",
+                    data=st.session_state.personas[persona_id],
+                    file_name=f"persona_cluster_{persona_id}.txt",
+                    mime="text/plain"
+                )
+            
+            with col_b:
+                segment_name = find_segment_name(segments_to_use, persona_id)
+                persona_content = st.session_state.personas[persona_id]
+                pdf_key = persona_pdf_key(persona_id, persona_content, segment_name)
+                
+                # Le PDF n'est rendu qu'à la demande, puis relu depuis le cache aux reruns suivants
+                if pdf_key in st.session_state.pdf_ready or st.button("📄 Préparer le PDF", key=f"prepare_pdf_{persona_id}"):
+                    st.session_state.pdf_ready.add(pdf_key)
+                    st.download_button(
+                        label="📥 Télécharger en PDF",
+                        data=persona_pdf_bytes(pdf_key, persona_id, persona_content, segment_name),
+                        file_name=f"persona_cluster_{persona_id}.pdf",
+                        mime="application/pdf"
+                    )
+        
+        # Export groupé : rendu à la demande, gardé en session tant que les personas ne changent pas
+        st.markdown("---")
+        st.write("**Exporter tous les personas:**")
+        export_format = st.radio(
+            "Format d'export",
+            ["ZIP (PDF + TXT)", "PDF unique avec sommaire"],
+            horizontal=True,
+            label_visibility="collapsed"
+        )
+        export_key = (export_format, tuple(sorted(((k, hash(v)) for k, v in st.session_state.personas.items()), key=str)))
+        
+        if st.button(f"📦 Préparer l'export ({len(st.session_state.personas)} personas)", use_container_width=True):
+            export_items = [
+                (k, st.session_state.personas[k], find_segment_name(segments_to_use, k))
+                for k in sorted(st.session_state.personas.keys(), key=str)
+            ]
+            with st.spinner("Rendu des PDF..."):
+                start = time.perf_counter()
+                if export_format.startswith("ZIP"):
+                    export_data = ("personas.zip", personas_zip(export_items), "application/zip")
+                else:
+                    export_data = ("personas.pdf", merged_personas_pdf(export_items), "application/pdf")
+            st.session_state.bulk_export = (export_key, export_data)
+            st.caption(f"⏱️ {len(export_items)} PDF rendus en {time.perf_counter() - start:.1f} s")
+        
+        bulk_export = st.session_state.get("bulk_export")
+        if bulk_export and bulk_export[0] == export_key:
+            file_name, data, mime = bulk_export[1]
+            st.download_button(
+                label=f"📥 Télécharger {file_name}",
+                data=data,
+                file_name=file_name,
+                mime=mime,
+                use_container_width=True
+            )
+    else:
+        st.info("💡 Générez des personas pour les voir ici")
+
+# Suivi du lot de générations en arrière-plan (colonne de droite de l'onglet 2)
+def generation_status():
+    """
+    Reprend les personas terminés par le lot de cette session et affiche sa progression ;
+    exécuté en fragment rafraîchi chaque seconde tant que le lot tourne
+    """
+    batch = get_job_queue().batch(st.session_state.generation_batch)
+    if batch is None:
+        return
+    
+    # Personas terminés depuis le dernier passage, quels que soient les reruns intervenus entre-temps
+    completed = batch.completed[st.session_state.generation_seen:]
+    for job in completed:
+        if job.error is None and job.result[0]:
+            st.session_state.personas[job.key] = job.result[0]
+    st.session_state.generation_seen += len(completed)
+    
+    counts = batch.counts()
+    finished = counts[DONE] + counts[FAILED]
+    if not batch.done:
+        st.progress(
+            finished / len(batch.jobs),
+            text=f"⏳ {finished}/{len(batch.jobs)} persona(s) générés en arrière-plan : vous pouvez continuer à utiliser l'application"
+        )
+        ready = [f"Cluster {job.key}" for job in batch.completed if job.error is None and job.result[0]]
+        if ready:
+            st.caption(f"Prêts : {', '.join(ready)}")
+        for job in batch.running_jobs():
+            if job.chunks:
+                st.markdown(f"**Cluster {job.key}**")
+                st.markdown(job.partial)
+        if st.button("⏹️ Annuler la génération"):
+            get_job_queue().cancel(batch.id)
+        return
+    
+    if completed:
+        # Lot terminé depuis le dernier passage : rerun complet pour mettre à jour le panneau des personas
+        st.rerun()
+    
+    errors_details = [
+        f"Cluster {job.key}: {job.error or 'résultat vide'}" for job in batch.completed if job.error is not None or not job.result[0]
+    ]
+    cached_count = sum(1 for job in batch.completed if job.error is None and job.result[0] and job.result[1])
+    
+    if errors_details:
+        st.error(f"❌ {len(errors_details)} échec(s) de génération")
+        with st.expander("📋 Détails des erreurs"):
+            for error in errors_details:
+                st.write(f"• {error}")
+    if counts[CANCELLED]:
+        st.warning(f"⏹️ Génération annulée : {counts[CANCELLED]} persona(s) non générés")
+    if not errors_details and not counts[CANCELLED]:
+        st.success("✅ Tous les personas ont été générés!")
+    if cached_count:
+        st.info(f"💾 {cached_count} persona(s) relu(s) depuis le cache (aucun token consommé)")
+
 # TAB 2 - GÉNÉRATION
 with tab2:
     st.subheader("🎯 Générer des Personas")
@@ -438,96 +587,142 @@ with tab2:
     else:
         segments_to_use = segments_data
     
+    # Personas déjà générés (par cette session avant un rafraîchissement, ou par un autre utilisateur) :
+    # seuls ceux dont le prompt est identique avec les segments et le catalogue actuels sont relus
+    restore_key = (
+        st.session_state.segments_file_hash if st.session_state.loaded_segments else None,
+        st.session_state.produits_bancaires_text,
+    )
+    if st.session_state.personas_restored_for != restore_key:
+        def current_prompt(record):
+            segment = find_segment(segments_to_use, record["id"])
+            return create_prompt(segment) if segment is not None else None
+        for segment_id, record in get_persona_store().load(PERSONA_WORKSPACE, current_prompt).items():
+            st.session_state.personas.setdefault(segment_id, record["content"])
+        st.session_state.personas_restored_for = restore_key
+    
     col1, col2 = st.columns([1, 2])
     
     with col1:
         st.write("**Segments disponibles:**")
+        if len(segments_to_use) > MAX_SELECT_OPTIONS:
+            # Trop de segments pour une liste : seuls ceux qui correspondent à la recherche sont proposés
+            segment_search = st.text_input("Rechercher un segment (id ou nom)")
+            segment_options = segments_to_use.search(segment_search)
+            # La sélection en cours reste proposée quand la recherche change
+            segment_options += [s for s in st.session_state.get("segment_selection", []) if s not in segment_options]
+        else:
+            segment_options = [(s.get("id", idx), s.get("name", f"Segment {idx}")) for idx, s in enumerate(segments_to_use)]
         selected_segments = st.multiselect(
             "Sélectionnez les segments à traiter",
-            options=[(s.get("id", idx), s.get("name", f"Segment {idx}")) for idx, s in enumerate(segments_to_use)],
+            options=segment_options,
             format_func=lambda x: f"Cluster {x[0]}: {x[1][:30]}...",
-            default=[(segments_to_use[0].get("id", 0), segments_to_use[0].get("name", "Segment 0"))]
+            default=segment_options[:1],
+            key="segment_selection"
+        )
+        
+        force_regenerate = st.checkbox(
+            "🔄 Forcer la régénération",
+            help="Ignore le cache et rappelle le LLM même si le prompt n'a pas changé"
+        )
+        
+        stream_output = st.checkbox(
+            "⚡ Affichage en streaming",
+            value=True,
+            help="Affiche chaque persona au fil de sa génération (les segments sont alors traités l'un après l'autre)"
         )
         
         if st.button("🚀 Générer les Personas", type="primary"):
             if not selected_segments:
                 st.warning("⚠️ Sélectionnez au moins un segment")
+            elif st.session_state.backend is None:
+                st.error("❌ Veuillez d'abord configurer votre clé API OpenAI dans la barre latérale.")
             else:
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                for idx, (seg_id, _) in enumerate(selected_segments):
-                    segment = next((s for s in segments_to_use if s.get("id", -1) == seg_id), None)
+                # Les prompts sont construits ici (accès à st.session_state), seuls les appels OpenAI partent dans le pool
+                jobs = []
+                job_segments = {}
+                for seg_id, _ in selected_segments:
+                    segment = find_segment(segments_to_use, seg_id)
                     if segment:
-                        status_text.text(f"Génération du Cluster {seg_id}...")
-                        
-                        generate_persona(segment, model_choice)
-                        
-                        progress_bar.progress((idx + 1) / len(selected_segments))
+                        jobs.append((seg_id, create_prompt(segment)))
+                        job_segments[seg_id] = segment
                 
-                st.success("✅ Tous les personas ont été générés!")
-    
-    with col2:
-        if st.session_state.personas:
-            st.write("**Personas générés:**")
-            
-            persona_options = [
-                f"Cluster {k}: {next((s.get('name', 'Unknown') for s in segments_to_use if s.get('id', -1) == k), 'Unknown')[:40]}..."
-                for k in sorted(st.session_state.personas.keys())
-            ]
-            
-            selected_persona = st.selectbox("Afficher le persona de:", persona_options)
-            
-            if selected_persona:
-                persona_id = int(selected_persona.split(":")[0].replace("Cluster ", ""))
+                backend = st.session_state.backend
+                persona_cache = get_persona_cache()
+                persona_store = get_persona_store()
+                model_name = model_choice
                 
-                st.markdown("---")
-                st.markdown('<div class="persona-output">', unsafe_allow_html=True)
-                st.markdown(st.session_state.personas[persona_id])
-                st.markdown('</div>', unsafe_allow_html=True)
+                def generate(payload, job):
+                    # Exécuté dans le pool de get_job_queue(), hors du script : pas d'accès à st.session_state
+                    seg_id, prompt = payload
+                    label = f"Cluster {seg_id}"
+                    if stream_output:
+                        cached = None if force_regenerate else persona_cache.get(model_name, prompt)
+                        if cached is None:
+                            # Texte partiel publié au fil de l'eau, affiché par le suivi du lot ; si une autre
+                            # session génère déjà ce persona, son texte complet arrive d'un bloc (succès du cache)
+                            flight = persona_cache.stream_once(
+                                model_name, prompt, lambda: backend.stream(user_message(prompt), label=label, model=model_name)
+                            )
+                            for chunk in flight:
+                                job.append(chunk)
+                            content, from_cache = job.partial, not flight.leader
+                        else:
+                            content, from_cache = cached, True
+                    else:
+                        content, from_cache = persona_cache.get_or_generate(
+                            model_name, prompt, lambda: backend.complete(user_message(prompt), label=label, model=model_name), force_regenerate
+                        )
+                    if from_cache:
+                        backend.record_cache_hit(user_message(prompt), content, label)
+                    if content:
+                        # Enregistré par le worker : le persona est conservé même si la page a été fermée entre-temps
+                        persona_store.save(
+                            PERSONA_WORKSPACE, job_segments[seg_id], content, prompt_key(model_name, prompt), model_name
+                        )
+                    return content, from_cache
                 
-                col_a, col_b = st.columns(2)
-                
-                with col_a:
-                    st.download_button(
-                        label="📥 Télécharger en TXT",
-                        data=st.session_state.personas[persona_id],
-                        file_name=f"persona_cluster_{persona_id}.txt",
-                        mime="text/plain"
-                    )
-                
-                with col_b:
-                    segment_name = next((s.get("name", "Unknown") for s in segments_to_use if s.get("id", -1) == persona_id), "Unknown")
-                    
-                    # Générer le PDF
-                    pdf_buffer = generate_persona_pdf(persona_id, st.session_state.personas[persona_id], segment_name)
-                    
-                    st.download_button(
-                        label="📥 Télécharger en PDF",
-                        data=pdf_buffer,
-                        file_name=f"persona_cluster_{persona_id}.pdf",
-                        mime="application/pdf"
-                    )
-        else:
-            st.info("💡 Générez des personas pour les voir ici")
+                # max_in_flight appels en parallèle, en streaming aussi : generation_status affiche
+                # le texte partiel de chaque job en cours
+                st.session_state.generation_batch = get_job_queue().submit(
+                    [(seg_id, (seg_id, prompt)) for seg_id, prompt in jobs], generate, max_in_flight
+                )
+                st.session_state.generation_seen = 0
+    
+    with col2:
+        # Rafraîchi chaque seconde tant que le lot de cette session tourne, plus du tout ensuite
+        batch = get_job_queue().batch(st.session_state.generation_batch)
+        fragment(run_every=1 if batch is not None and not batch.done else None)(generation_status)()
+        personas_panel(segments_to_use)
 
 # TAB 3 - CHAT
-with tab3:
+@fragment
+def chat_tab():
+    """
+    Onglet chat en fragment : un message ne réexécute que cette fonction, pas toute la page
+    """
     st.subheader("💬 Assistant Intelligent pour Personas")
     
-    if st.session_state.client is None:
+    if st.session_state.backend is None:
         st.warning("⚠️ Veuillez configurer votre clé API OpenAI d'abord.")
     else:
         if "loaded_segments" in st.session_state and st.session_state.loaded_segments:
             segments_for_chat = st.session_state.loaded_segments
         else:
             segments_for_chat = segments_data
+        if len(segments_for_chat) > MAX_CHAT_SEGMENTS:
+            # Des milliers de segments ne tiennent pas dans le prompt : seuls ceux qui ont un persona y figurent
+            segments_for_chat = segments_for_chat.select(st.session_state.personas)
+        
+        # Le contexte n'est recalculé que pour les segments ou personas modifiés
+        chat_context = st.session_state.chat_context
+        chat_context.set_segments(segments_for_chat)
+        chat_context.set_personas(st.session_state.personas)
         
         st.write("**Personas générés disponibles:**")
         if st.session_state.personas:
-            for persona_id, content in st.session_state.personas.items():
-                segment_name = next((s.get("name", "Unknown") for s in segments_for_chat if s.get("id", -1) == persona_id), "Unknown")
-                st.info(f"✅ Cluster {persona_id}: {segment_name}")
+            for persona_id in st.session_state.personas:
+                st.info(f"✅ Cluster {persona_id}: {chat_context.segment_name(persona_id)}")
         else:
             st.warning("⚠️ Aucun persona généré. Générez d'abord des personas dans l'onglet 'Générer Personas'")
         
@@ -538,62 +733,107 @@ with tab3:
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
         
+        if st.session_state.history_manager.last_error is not None:
+            st.warning(
+                f"⚠️ Résumé des anciens échanges impossible ({st.session_state.history_manager.last_error}) : "
+                "seuls les messages récents qui tiennent dans le budget sont envoyés au modèle."
+            )
+        
         user_input = st.chat_input("Posez votre question...")
         
         if user_input:
-            st.session_state.conversation_history.append({
-                "role": "user",
-                "content": user_input
-            })
+            user_turn = {"role": "user", "content": user_input}
+            st.session_state.conversation_history.append(user_turn)
             
             with st.chat_message("user"):
                 st.markdown(user_input)
             
             try:
-                personas_context = "PERSONAS GÉNÉRÉS:\n"
-                if st.session_state.personas:
-                    for persona_id, content in st.session_state.personas.items():
-                        segment_name = next((s.get("name", "Unknown") for s in segments_for_chat if s.get("id", -1) == persona_id), "Unknown")
-                        personas_context += f"\n--- Cluster {persona_id}: {segment_name} ---\n{content[:2000]}...\n"
-                else:
-                    personas_context += "Aucun persona généré."
-                
-                segments_context = "\n\nSEGMENTS:\n"
-                for segment in segments_for_chat:
-                    segments_context += f"- ID: {segment.get('id')}, Nom: {segment.get('name')}, Âge: {segment.get('age')}, "
-                    segments_context += f"Produits: {segment.get('nbProducts')}, Revenu H: {segment.get('revenueHommes')}, Revenu F: {segment.get('revenueFemmes')}\n"
-                
                 if st.session_state.produits_bancaires_text:
-                    produits_context = f"\n\nCATALOGUE PRODUITS:\n{st.session_state.produits_bancaires_text[:8000]}"
+                    system_prompt = chat_context.system_prompt(catalogue_context(user_input))
                 else:
-                    produits_context = "\n\nNote: Aucun catalogue produits chargé."
-                
-                system_prompt = f"""Tu es un expert en marketing bancaire et segmentation client de Société Générale Côte d'Ivoire.
-
-{personas_context}
-{segments_context}
-{produits_context}
-
-Utilise ces informations pour répondre aux questions. Recommande des produits spécifiques avec tarifs quand le catalogue est disponible."""
+                    system_prompt = chat_context.system_prompt()
                 
+                # Historique borné : résumé des anciens échanges + derniers messages
+                history_manager = st.session_state.history_manager
+                history_manager.budget_tokens = history_budget
                 messages_with_system = [
-                    {"role": "system", "content": system_prompt}
-                ] + st.session_state.conversation_history
+                    system_message(system_prompt)
+                ] + history_manager.messages_for(st.session_state.conversation_history)
                 
-                response = st.session_state.client.chat.completions.create(
-                    model=model_choice,
-                    max_tokens=2000,
-                    messages=messages_with_system
-                )
-                
-                assistant_message = response.choices[0].message.content
-                st.session_state.conversation_history.append({
-                    "role": "assistant",
-                    "content": assistant_message
-                })
+                stream = st.session_state.backend.stream(messages_with_system, label="Chat", model=model_choice, max_tokens=2000)
+                reply = StreamCollector(stream)
                 
                 with st.chat_message("assistant"):
-                    st.markdown(assistant_message)
+                    st.write_stream(reply)
+                    if not reply.completed:
+                        st.warning(f"⚠️ Réponse interrompue avant la fin ({reply.error}). La question et la réponse partielle ne sont pas gardées dans l'historique, reposez la question.")
+                
+                # La réponse n'entre dans l'historique qu'une fois complète
+                if reply.completed:
+                    st.session_state.conversation_history.append({
+                        "role": "assistant",
+                        "content": reply.text
+                    })
+                    # Résumé des anciens échanges hors du chemin critique, pour la prochaine question
+                    history_manager.compact(st.session_state.conversation_history, st.session_state.backend)
             
             except Exception as e:
-                st.error(f"❌ Erreur: {e}")
\ No newline at end of file
+                st.error(f"❌ Erreur: {e}")
+            
+            history = st.session_state.conversation_history
+            if history and history[-1] is user_turn:
+                # Sans réponse complète, la question est retirée : deux messages utilisateur
+                # consécutifs fausseraient l'historique envoyé au LLM aux questions suivantes
+                history.pop()
+
+with tab3:
+    chat_tab()
+
+# Télémétrie des appels LLM (en fin de script pour inclure les appels de ce run)
+with st.sidebar:
+    st.divider()
+    st.header("📈 Télémétrie LLM")
+    telemetry = get_telemetry()
+    stats = telemetry.summary()
+    
+    col_a, col_b = st.columns(2)
+    col_a.metric("Appels", stats["calls"])
+    col_b.metric("Succès cache", stats["cache_hits"])
+    col_a.metric("Tokens prompt", f"{stats['prompt_tokens']:,}".replace(",", " "))
+    col_b.metric("Tokens réponse", f"{stats['completion_tokens']:,}".replace(",", " "))
+    col_a.metric("Latence p50", f"{stats['latency_p50']:.1f} s")
+    col_b.metric("1er token p50", f"{stats['ttft_p50']:.1f} s")
+    st.caption(f"Coût estimé : {stats['cost_usd']:.4f} $ · latence p95 : {stats['latency_p95']:.1f} s · {stats['errors']} erreur(s)")
+    
+    top_labels = telemetry.by_label(top=5)
+    if top_labels:
+        st.write("**Appels les plus coûteux:**")
+        import pandas as pd
+        
+        st.dataframe(pd.DataFrame(top_labels), hide_index=True)
+    
+    scheduler_stats = get_scheduler().metrics()
+    st.caption(
+        f"Ordonnanceur : {scheduler_stats['retries']} nouvelle(s) tentative(s) · {scheduler_stats['rate_limited']} limite(s) 429 · "
+        f"{scheduler_stats['throttle_seconds'] + scheduler_stats['backoff_seconds']:.1f} s d'attente · "
+        f"{scheduler_stats['deadline_exceeded']} échéance(s) dépassée(s)"
+    )
+    job_stats = get_job_queue().metrics()
+    st.caption(
+        f"Générations en arrière-plan : {job_stats['running']} en cours · {job_stats['pending']} en attente · "
+        f"{job_stats['failed']} échec(s) depuis le démarrage"
+    )
+    persona_store = get_persona_store()
+    if persona_store.last_error is not None:
+        st.warning(f"⚠️ Enregistrement des personas impossible : {persona_store.last_error}")
+    if st.button("🗑️ Effacer les personas enregistrés", help="Vide le stockage de cette application, pour toutes les sessions"):
+        persona_store.delete(PERSONA_WORKSPACE)
+        st.session_state.personas = {}
+        st.rerun()
+    
+    st.download_button("📥 Export CSV", telemetry.to_csv(), file_name="llm_telemetry.csv", mime="text/csv")
+    st.download_button(
+        "📥 Export Prometheus", telemetry.to_prometheus() + get_scheduler().to_prometheus(),
+        file_name="llm_metrics.prom", mime="text/plain"
+    )
@@ -1,16 +1,28 @@
 import streamlit as st
-import pandas as pd
 import json
-import io
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT, TA_CENTER
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+import time
 from services.socgenai_models import llm_model, UPLOAD_DIRECTORY
-from langchain.schema import HumanMessage, SystemMessage, AIMessage
+from persona_core.pdf import generate_persona_pdf, persona_pdf_key
+from persona_core.export import personas_zip, merged_personas_pdf
+from persona_core.generation import DEFAULT_MAX_IN_FLIGHT
+from persona_core.jobs import JobQueue, DONE, FAILED, CANCELLED
+from persona_core.cache import PersonaCache, prompt_key
+from persona_core.store import PersonaStore
+from persona_core.backends import LangChainBackend, user_message, system_message
+from persona_core.streaming import StreamCollector
+from persona_core.retrieval import CatalogueIndex, segment_query
+from persona_core.chat_context import ChatContext
+from persona_core.telemetry import InstrumentedBackend, TelemetryRecorder
+from persona_core.scheduler import RequestScheduler, ScheduledBackend
+from persona_core.catalogue import content_hash, parse_excel_catalogue
+from persona_core.segments import (
+    load_segment_csv, find_segment, find_segment_name, SegmentSchemaError,
+    SEGMENTS_PER_PAGE, MAX_SELECT_OPTIONS, PREVIEW_ROWS, MAX_CHAT_SEGMENTS,
+)
+from persona_core.prompts import build_persona_prompt
+
+# Espace de travail de cette application dans le stockage des personas
+PERSONA_WORKSPACE = "app_perso_v3"
 
 # Configuration Streamlit
 st.set_page_config(
@@ -53,17 +65,90 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_telemetry():
+    """
+    Journal des appels LLM (tokens, latences, cache), partagé par toutes les sessions du serveur
+    """
+    return TelemetryRecorder()
+
+@st.cache_resource
+def get_scheduler():
+    """
+    Limites de débit, nouvelles tentatives et échéances des appels LLM, partagées par toutes les sessions
+    """
+    return RequestScheduler()
+
+@st.cache_resource
+def get_persona_store():
+    """
+    Stockage persistant des personas (SQLite WAL, écriture différée), partagé par toutes les sessions
+    """
+    return PersonaStore()
+
+@st.cache_resource
+def get_job_queue():
+    """
+    Pool des générations en arrière-plan, partagé par toutes les sessions : survit aux reruns du script
+    """
+    return JobQueue()
+
 # Initialiser la session
-if "llm" not in st.session_state:
-    st.session_state.llm = None
+if "backend" not in st.session_state:
+    st.session_state.backend = ScheduledBackend(InstrumentedBackend(LangChainBackend(llm_model), get_telemetry()), get_scheduler())
 if "personas" not in st.session_state:
+    # Complété dans l'onglet Génération par les personas enregistrés qui correspondent aux segments et au catalogue
     st.session_state.personas = {}
+if "personas_restored_for" not in st.session_state:
+    st.session_state.personas_restored_for = None
 if "conversation_history" not in st.session_state:
     st.session_state.conversation_history = []
 if "produits_bancaires_text" not in st.session_state:
     st.session_state.produits_bancaires_text = None
 if "loaded_segments" not in st.session_state:
     st.session_state.loaded_segments = None
+if "segments_file_hash" not in st.session_state:
+    st.session_state.segments_file_hash = None
+    st.session_state.segments_load_report = None
+if "catalogue_index" not in st.session_state:
+    st.session_state.catalogue_index = None
+if "pdf_ready" not in st.session_state:
+    st.session_state.pdf_ready = set()
+if "chat_context" not in st.session_state:
+    st.session_state.chat_context = ChatContext()
+if "generation_batch" not in st.session_state:
+    # Lot de générations en arrière-plan de cette session et nombre de ses résultats déjà repris
+    st.session_state.generation_batch = None
+    st.session_state.generation_seen = 0
+
+@st.cache_resource
+def get_persona_cache():
+    """
+    Cache disque des personas, partagé par toutes les sessions du serveur
+    """
+    return PersonaCache()
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_excel_catalogue(file_hash, _data):
+    """
+    Analyse le catalogue Excel une seule fois par contenu de fichier (clé : empreinte SHA-256)
+    """
+    start = time.perf_counter()
+    df_produits, product_records, catalogue_text = parse_excel_catalogue(_data)
+    return df_produits, product_records, catalogue_text, time.perf_counter() - start
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def persona_pdf_bytes(pdf_key, persona_id, _persona_content, segment_name):
+    """
+    PDF d'un persona, rendu une seule fois par clé (contenu, nom du segment, version des styles)
+    """
+    return generate_persona_pdf(persona_id, _persona_content, segment_name).getvalue()
+
+# Reruns partiels : st.fragment (Streamlit >= 1.37), st.experimental_fragment avant, page entière sinon
+# (utilisable en @fragment ou fragment(run_every=...) ; sans fragments, pas de rafraîchissement périodique)
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (
+    lambda func=None, **kwargs: func or (lambda f: f)
+)
 
 # Sidebar - Configuration
 with st.sidebar:
@@ -78,30 +163,29 @@ with st.sidebar:
     
     if uploaded_excel is not None:
         try:
-            # Lire le fichier Excel
-            df_produits = pd.read_excel(uploaded_excel)
+            # Lire le fichier Excel (analysé une seule fois par contenu de fichier, pas à chaque rerun)
+            excel_data = uploaded_excel.getvalue()
+            load_start = time.perf_counter()
+            df_produits, product_records, catalogue_text, parse_seconds = load_excel_catalogue(content_hash(excel_data), excel_data)
+            load_seconds = time.perf_counter() - load_start
             
             st.success(f"✅ Excel chargé ! ({len(df_produits)} produits)")
+            if load_seconds < parse_seconds / 2:
+                st.caption(f"⏱️ Analysé en {parse_seconds:.2f} s au premier chargement, réutilisé depuis le cache ({load_seconds * 1000:.0f} ms)")
+            else:
+                st.caption(f"⏱️ Analysé en {parse_seconds:.2f} s")
             st.info(f"📊 Colonnes détectées: {', '.join(df_produits.columns.tolist())}")
             
             # Aperçu des données
             with st.expander("📊 Aperçu des produits"):
                 st.dataframe(df_produits.head(10), use_container_width=True)
             
-            # Convertir en texte structuré
-            catalogue_text = "CATALOGUE PRODUITS BANCAIRES (DÉTAILLÉ):\n\n"
-            
-            for idx, row in df_produits.iterrows():
-                catalogue_text += f"--- PRODUIT {idx + 1} ---\n"
-                for col in df_produits.columns:
-                    value = str(row[col])
-                    # Nettoyer les valeurs NaN
-                    if value.lower() != 'nan':
-                        catalogue_text += f"{col}: {value}\n"
-                catalogue_text += "\n"
-            
             st.session_state.produits_bancaires_text = catalogue_text
             
+            # Index de recherche reconstruit uniquement si le contenu du catalogue a changé
+            if st.session_state.catalogue_index is None or st.session_state.catalogue_index.source_text != catalogue_text:
+                st.session_state.catalogue_index = CatalogueIndex(catalogue_text, product_records)
+            
         except Exception as e:
             st.error(f"❌ Erreur lors de la lecture du fichier Excel: {e}")
             st.info("Vérifiez que le fichier Excel est valide et contient des données")
@@ -111,12 +195,26 @@ with st.sidebar:
         st.info("✅ Catalogue produits chargé en mémoire")
         if st.button("🗑️ Supprimer le catalogue"):
             st.session_state.produits_bancaires_text = None
+            st.session_state.catalogue_index = None
             st.rerun()
     else:
         st.warning("⚠️ Aucun catalogue chargé")
         st.caption("Uploadez un fichier Excel avec les informations détaillées sur les produits bancaires")
     
     st.divider()
+    
+    # Options
+    st.header("📊 Options")
+    
+    max_in_flight = st.slider(
+        "Générations simultanées",
+        min_value=1,
+        max_value=16,
+        value=DEFAULT_MAX_IN_FLIGHT,
+        help="Nombre maximum d'appels LLM en parallèle lors de la génération par lot"
+    )
+    
+    st.divider()
 
 # Données des segments par défaut
 segments_data = [
@@ -177,231 +275,29 @@ segments_data = [
     }
 ]
 
-def create_prompt(segment):
-    base_info = f"""Génère une description complète et détaillée d'une persona marketing pour un segment bancaire avec les caractéristiques suivantes:
-
-Nom du segment: {segment.get('name', 'N/A')}
-Âge moyen: {segment.get('age', 'N/A')} ans
-Nombre de produits utilisés: {segment.get('nbProducts', 'N/A')}
-Revenu mensuel (Hommes): {segment.get('revenueHommes', 'N/A')}
-Revenu mensuel (Femmes): {segment.get('revenueFemmes', 'N/A')}
-Accessibilité mobile: {segment.get('mobileAccess', 'N/A')}
-Accessibilité email: {segment.get('emailAccess', 'N/A')}
-Caractéristiques principales: {segment.get('characteristics', 'N/A')}"""
-
-    if st.session_state.produits_bancaires_text:
-        produits_info = f"""
-
-CATALOGUE DES PRODUITS BANCAIRES DISPONIBLES:
-{st.session_state.produits_bancaires_text[:10000]}
-
-MÉTHODOLOGIE DE RECOMMANDATION:
-Pour recommander les produits les plus adaptés à ce segment, analyse TOUS les critères suivants:
-
-1. PROFIL DÉMOGRAPHIQUE:
-   - Âge moyen ({segment.get('age', 'N/A')} ans) -> Besoins selon le stade de vie
-   - Revenus hommes/femmes -> Capacité financière ET disparités de genre
-   
-2. COMPORTEMENT BANCAIRE:
-   - Nombre de produits actuels ({segment.get('nbProducts', 'N/A')}) -> Sophistication bancaire
-   - Si faible (< 5) -> Segment sous-bancarisé, besoin de produits simples
-   - Si élevé (> 8) -> Segment mature, besoin de services premium
-   
-3. CONNECTIVITÉ DIGITALE:
-   - Accessibilité mobile ({segment.get('mobileAccess', 'N/A')}) -> Appétence digitale
-   - Accessibilité email ({segment.get('emailAccess', 'N/A')}) -> Canaux de communication préférés
-   - Si > 95% mobile -> Favoriser services digitaux (App mobile, banque en ligne)
-   - Si < 80% mobile -> Favoriser services traditionnels (agence, téléphone)
-   
-4. CARACTÉRISTIQUES SOCIO-PROFESSIONNELLES:
-   - {segment.get('characteristics', 'N/A')}
-   - Identifier: statut professionnel, stabilité, besoins spécifiques
-
-5. LOGIQUE DE RECOMMANDATION PRODUITS (NE PAS SE BASER UNIQUEMENT SUR LE PRIX):
-   - Matcher les produits avec les BESOINS RÉELS basés sur le catalogue détaillé
-   - Considérer les segments cibles mentionnés dans le catalogue
-   - Analyser les caractéristiques produits vs profil segment
-   - Justifier les recommandations avec des détails spécifiques du catalogue
-
-IMPORTANT:
-- NE JAMAIS recommander un produit uniquement parce qu'il est cher ou prestigieux
-- TOUJOURS justifier en se basant sur les BESOINS RÉELS du segment
-- Considérer le RAPPORT QUALITÉ-PRIX et l'ADÉQUATION aux usages
-- Identifier les GAPS (produits manquants malgré le besoin)
-- Référencer les détails spécifiques des produits du catalogue"""
-        
-        recommendation_note = """
-- RECOMMANDATIONS DE PRODUITS BANCAIRES :
-  
-  **A. ANALYSE DES BESOINS**
-  Basée sur l'analyse complète du segment (âge, nombre de produits, revenu, accessibilité digitale, caractéristiques comportementales), identifie les BESOINS PRIORITAIRES de ce segment.
-  
-  **B. PRODUITS RECOMMANDÉS DU CATALOGUE**
-  Pour CHAQUE produit recommandé, justifie en citant:
-   - Les caractéristiques du segment qui le justifient
-   - Le besoin spécifique couvert
-   - L'adéquation avec le profil (âge, revenu, connectivité, etc.)
-   - Le prix exact du catalogue
-   - Pourquoi ce produit correspond vs les alternatives
-   
-   Structure:
-   • Produits Prioritaires (Haute priorité)
-   • Produits Complémentaires (Priorité moyenne)
-   • Produits de Développement (Long terme)"""
-    else:
-        produits_info = ""
-        recommendation_note = """
-- RECOMMANDATIONS DE PRODUITS BANCAIRES :
-  
-  **A. PROPOSITION GÉNÉRALE**
-  Basée sur l'analyse complète du segment (âge, nombre de produits, revenu, accessibilité digitale, caractéristiques comportementales), propose des CATÉGORIES de produits bancaires adaptés. Justifie chaque recommandation par la synthèse des critères de segmentation.
-  
-  Note: Aucun catalogue produits chargé, donc pas de proposition spécifique avec prix."""
-    
-    prompt = base_info + produits_info + """
-
-Fournis une description professionnelle en FRANÇAIS incluant:
-
-1. PROFIL DÉMOGRAPHIQUE DÉTAILLÉ
-2. COMPORTEMENTS ET PATTERNS BANCAIRES
-3. BESOINS ET PRÉFÉRENCES
-4. MOTIVATIONS ET PAIN POINTS
-5. STRATÉGIE MARKETING RECOMMANDÉE""" + recommendation_note + """
-
-7. PROPOSITION DE VALEUR UNIQUE
-
-Format: Utilise des sections claires avec des titres en gras. Rédige tout en FRANÇAIS."""
-    
-    return prompt
-
-
-def generate_persona_pdf(persona_id, persona_content, segment_name):
+def catalogue_index():
     """
-    Génère un PDF formaté pour un persona
+    Index BM25 du catalogue, construit au chargement (reconstruit si le texte a changé)
     """
-    buffer = io.BytesIO()
-    
-    # Créer le document PDF
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=2*cm,
-        leftMargin=2*cm,
-        topMargin=2*cm,
-        bottomMargin=2*cm
-    )
-    
-    # Styles
-    styles = getSampleStyleSheet()
-    
-    # Style personnalisé pour le titre
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor='#d32f2f',
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    # Style pour les sous-titres
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor='#b71c1c',
-        spaceAfter=12,
-        spaceBefore=12
-    )
-    
-    # Style pour le texte normal
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=11,
-        alignment=TA_JUSTIFY,
-        spaceAfter=10
-    )
-    
-    # Contenu du PDF
-    story = []
-    
-    # Titre
-    story.append(Paragraph(f"PERSONA MARKETING", title_style))
-    story.append(Paragraph(f"Cluster {persona_id}: {segment_name}", heading_style))
-    story.append(Spacer(1, 0.5*cm))
-    
-    # Convertir le contenu markdown en paragraphes PDF
-    lines = persona_content.split('\n')
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            story.append(Spacer(1, 0.3*cm))
-            continue
-        
-        # Détection des titres (lignes avec **)
-        if line.startswith('**') and line.endswith('**'):
-            title_text = line.replace('**', '')
-            story.append(Paragraph(title_text, heading_style))
-        elif line.startswith('###'):
-            title_text = line.replace('###', '').strip()
-            story.append(Paragraph(title_text, heading_style))
-        elif line.startswith('##'):
-            title_text = line.replace('##', '').strip()
-            story.append(Paragraph(title_text, heading_style))
-        elif line.startswith('#'):
-            title_text = line.replace('#', '').strip()
-            story.append(Paragraph(title_text, heading_style))
-        elif line.startswith('- ') or line.startswith('• '):
-            # Liste à puces
-            text = line[2:].strip()
-            story.append(Paragraph(f"• {text}", normal_style))
-        else:
-            # Texte normal - nettoyer le markdown basique
-            text = line.replace('**', '')
-            if text:
-                story.append(Paragraph(text, normal_style))
-    
-    # Footer
-    story.append(Spacer(1, 1*cm))
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor='gray',
-        alignment=TA_CENTER
-    )
-    story.append(Paragraph("Généré par le Générateur de Personas Marketing - Société Générale Côte d'Ivoire", footer_style))
-    
-    # Générer le PDF
-    doc.build(story)
-    
-    buffer.seek(0)
-    return buffer
+    index = st.session_state.catalogue_index
+    if index is None or index.source_text != st.session_state.produits_bancaires_text:
+        index = CatalogueIndex.from_text(st.session_state.produits_bancaires_text)
+        st.session_state.catalogue_index = index
+    return index
 
-def generate_persona(segment, model):
+def catalogue_context(query):
     """
-    Génère un persona avec les LLM
+    Produits du catalogue les plus pertinents pour une requête
     """
-    st.session_state.llm = llm_model
-    
-    prompt = create_prompt(segment)
-    
-    try:
-        # Utilisation de invoke avec LangChain
-        messages = [HumanMessage(content=prompt)]
-        response = st.session_state.llm.invoke(messages)
-        
-        # Récupérer le contenu de la réponse
-        persona_content = response
-        
-        st.session_state.personas[segment.get("id", 0)] = persona_content
-        return persona_content
-    
-    except Exception as e:
-        st.error(f"❌ Erreur lors de la génération: {e}")
-        return None
+    return catalogue_index().relevant_products(query)
+
+def create_prompt(segment):
+    if st.session_state.produits_bancaires_text:
+        # Catalogue complet dans le préfixe stable s'il tient dans une sélection, sinon sélection du segment
+        shared_catalogue, catalogue_products = catalogue_index().persona_catalogue(segment_query(segment))
+        return build_persona_prompt(segment, catalogue_products, shared_catalogue)
+    return build_persona_prompt(segment)
+
 
 # Onglets principaux
 tab1, tab2, tab3 = st.tabs(["📋 Segments", "🎯 Générer Personas", "💬 Chat Intelligent"])
@@ -422,15 +318,37 @@ with tab1:
         uploaded_file = st.file_uploader("Chargez un fichier CSV avec vos segments", type="csv")
         
         if uploaded_file is not None:
-            try:
-                df = pd.read_csv(uploaded_file)
-                st.session_state.loaded_segments = df.to_dict('records')
-                st.dataframe(df, use_container_width=True)
-                st.success("✅ Fichier chargé avec succès!")
-                current_segments = st.session_state.loaded_segments
-            except Exception as e:
-                st.error(f"❌ Erreur lors du chargement du CSV: {e}")
+            # Lecture et validation une seule fois par fichier : les reruns réutilisent la table en colonnes
+            file_hash = content_hash(uploaded_file.getvalue())
+            if st.session_state.segments_file_hash != file_hash:
+                load_start = time.perf_counter()
+                try:
+                    st.session_state.loaded_segments, ignored, missing, warnings = load_segment_csv(uploaded_file)
+                    st.session_state.segments_load_report = (time.perf_counter() - load_start, ignored, missing, warnings)
+                except SegmentSchemaError as e:
+                    st.session_state.loaded_segments = None
+                    st.session_state.segments_load_report = e
+                st.session_state.segments_file_hash = file_hash
+            
+            if isinstance(st.session_state.segments_load_report, SegmentSchemaError):
+                st.error(f"❌ Erreur lors du chargement du CSV: {st.session_state.segments_load_report}")
                 current_segments = []
+            else:
+                load_seconds, ignored, missing, warnings = st.session_state.segments_load_report
+                current_segments = st.session_state.loaded_segments
+                # Aperçu limité : le tableau complet serait renvoyé au navigateur à chaque rerun
+                st.dataframe(current_segments.frame.head(PREVIEW_ROWS), use_container_width=True)
+                st.success(
+                    f"✅ {len(current_segments)} segments chargés en {load_seconds:.2f} s "
+                    f"({current_segments.memory_bytes() / 1e6:.1f} Mo en mémoire)"
+                )
+                if missing:
+                    st.caption(f"Colonnes absentes (affichées N/A) : {', '.join(missing)}")
+                if ignored:
+                    st.warning(f"⚠️ Colonnes ignorées : {', '.join(ignored)}")
+                # Valeurs non numériques vidées, lignes sans id écartées : le reste du fichier est chargé
+                for warning in warnings:
+                    st.warning(f"⚠️ {warning}")
         else:
             if st.session_state.loaded_segments:
                 current_segments = st.session_state.loaded_segments
@@ -444,8 +362,14 @@ with tab1:
     if current_segments:
         st.divider()
         st.subheader("Segments à traiter")
+        # Une page de cartes à la fois : le rendu ne dépend pas du nombre de segments
+        page_count = -(-len(current_segments) // SEGMENTS_PER_PAGE)
+        page = 1
+        if page_count > 1:
+            page = st.number_input(f"Page (sur {page_count})", min_value=1, max_value=page_count, value=1)
+        page_start = (page - 1) * SEGMENTS_PER_PAGE
         cols = st.columns(2)
-        for idx, segment in enumerate(current_segments):
+        for idx, segment in enumerate(current_segments[page_start:page_start + SEGMENTS_PER_PAGE], page_start):
             with cols[idx % 2]:
                 st.markdown(f"""
                 <div class="cluster-box">
@@ -459,6 +383,158 @@ with tab1:
                 </div>
                 """, unsafe_allow_html=True)
 
+# Personas générés (colonne de droite de l'onglet 2)
+@fragment
+def personas_panel(segments_to_use):
+    """
+    Affichage, téléchargements et export groupé en fragment : changer de persona ou
+    préparer un PDF ne réexécute que ce panneau
+    """
+    if st.session_state.personas:
+        st.write("**Personas générés:**")
+        
+        # Identifiants en options (entiers ou textes comme "C1") : key=str trie les types mélangés
+        persona_id = st.selectbox(
+            "Afficher le persona de:",
+            sorted(st.session_state.personas.keys(), key=str),
+            format_func=lambda k: f"Cluster {k}: {find_segment_name(segments_to_use, k)[:40]}..."
+        )
+        
+        if persona_id is not None:
+            
+            st.markdown("---")
+            st.markdown('<div class="persona-output">', unsafe_allow_html=True)
+            st.markdown(st.session_state.personas[persona_id])
+            st.markdown('</div>', unsafe_allow_html=True)
+            
+            col_a, col_b = st.columns(2)
+            
+            with col_a:
+                st.download_button(
+                    label="📥 Télécharger en TXT",
+                    data=st.session_state.personas[persona_id],
+                    file_name=f"persona_cluster_{persona_id}.txt",
+                    mime="text/plain"
+                )
+            
+            with col_b:
+                segment_name = find_segment_name(segments_to_use, persona_id)
+                persona_content = st.session_state.personas[persona_id]
+                pdf_key = persona_pdf_key(persona_id, persona_content, segment_name)
+                
+                # Le PDF n'est rendu qu'à la demande, puis relu depuis le cache aux reruns suivants
+                if pdf_key in st.session_state.pdf_ready or st.button("📄 Préparer le PDF", key=f"prepare_pdf_{persona_id}"):
+                    st.session_state.pdf_ready.add(pdf_key)
+                    st.download_button(
+                        label="📥 Télécharger en PDF",
+                        data=persona_pdf_bytes(pdf_key, persona_id, persona_content, segment_name),
+                        file_name=f"persona_cluster_{persona_id}.pdf",
+                        mime="application/pdf"
+                    )
+        
+        # Export groupé : rendu à la demande, gardé en session tant que les personas ne changent pas
+        st.markdown("---")
+        st.write("**Exporter tous les personas:**")
+        export_format = st.radio(
+            "Format d'export",
+            ["ZIP (PDF + TXT)", "PDF unique avec sommaire"],
+            horizontal=True,
+            label_visibility="collapsed"
+        )
+        export_key = (export_format, tuple(sorted(((k, hash(v)) for k, v in st.session_state.personas.items()), key=str)))
+        
+        if st.button(f"📦 Préparer l'export ({len(st.session_state.personas)} personas)", use_container_width=True):
+            export_items = [
+                (k, st.session_state.personas[k], find_segment_name(segments_to_use, k))
+                for k in sorted(st.session_state.personas.keys(), key=str)
+            ]
+            with st.spinner("Rendu des PDF..."):
+                start = time.perf_counter()
+                if export_format.startswith("ZIP"):
+                    export_data = ("personas.zip", personas_zip(export_items), "application/zip")
+                else:
+                    export_data = ("personas.pdf", merged_personas_pdf(export_items), "application/pdf")
+            st.session_state.bulk_export = (export_key, export_data)
+            st.caption(f"⏱️ {len(export_items)} PDF rendus en {time.perf_counter() - start:.1f} s")
+        
+        bulk_export = st.session_state.get("bulk_export")
+        if bulk_export and bulk_export[0] == export_key:
+            file_name, data, mime = bulk_export[1]
+            st.download_button(
+                label=f"📥 Télécharger {file_name}",
+                data=data,
+                file_name=file_name,
+                mime=mime,
+                use_container_width=True
+            )
+    else:
+        st.info("💡 Générez des personas pour les voir ici")
+
+# Suivi du lot de générations en arrière-plan (colonne de droite de l'onglet 2)
+def generation_status():
+    """
+    Reprend les personas terminés par le lot de cette session et affiche sa progression ;
+    exécuté en fragment rafraîchi chaque seconde tant que le lot tourne
+    """
+    batch = get_job_queue().batch(st.session_state.generation_batch)
+    if batch is None:
+        return
+    
+    # Personas terminés depuis le dernier passage, quels que soient les reruns intervenus entre-temps
+    completed = batch.completed[st.session_state.generation_seen:]
+    for job in completed:
+        if job.error is None and job.result[0]:
+            st.session_state.personas[job.key] = job.result[0]
+    st.session_state.generation_seen += len(completed)
+    
+    counts = batch.counts()
+    finished = counts[DONE] + counts[FAILED]
+    if not batch.done:
+        st.progress(
+            finished / len(batch.jobs),
+            text=f"⏳ {finished}/{len(batch.jobs)} persona(s) générés en arrière-plan : vous pouvez continuer à utiliser l'application"
+        )
+        ready = [f"Cluster {job.key}" for job in batch.completed if job.error is None and job.result[0]]
+        if ready:
+            st.caption(f"Prêts : {', '.join(ready)}")
+        for job in batch.running_jobs():
+            if job.chunks:
+                st.markdown(f"**Cluster {job.key}**")
+                st.markdown(job.partial)
+        if st.button("⏹️ Annuler la génération"):
+            get_job_queue().cancel(batch.id)
+        return
+    
+    if completed:
+        # Lot terminé depuis le dernier passage : rerun complet pour mettre à jour le panneau des personas
+        st.rerun()
+    
+    success_count = sum(1 for job in batch.completed if job.error is None and job.result[0])
+    cached_count = sum(1 for job in batch.completed if job.error is None and job.result[0] and job.result[1])
+    errors_details = [
+        f"Cluster {job.key}: {job.error}" if job.error is not None else f"Cluster {job.key}: Échec de génération (résultat vide)"
+        for job in batch.completed if job.error is not None or not job.result[0]
+    ]
+    
+    if success_count > 0:
+        st.success(f"✅ {success_count} persona(s) généré(s) avec succès!")
+    
+    if cached_count > 0:
+        st.info(f"💾 {cached_count} persona(s) relu(s) depuis le cache (aucun token consommé)")
+    
+    if counts[CANCELLED] > 0:
+        st.warning(f"⏹️ Génération annulée : {counts[CANCELLED]} persona(s) non générés")
+    
+    if errors_details:
+        st.error(f"❌ {len(errors_details)} échec(s) de génération")
+        
+        with st.expander("📋 Détails des erreurs"):
+            for error in errors_details:
+                st.write(f"• {error}")
+    
+    if success_count == 0 and errors_details:
+        st.warning("⚠️ Aucun persona n'a été généré. Vérifiez les erreurs ci-dessus.")
+
 # TAB 2 - GÉNÉRATION
 with tab2:
     st.subheader("🎯 Générer des Personas")
@@ -468,133 +544,141 @@ with tab2:
     else:
         segments_to_use = segments_data
     
+    # Personas déjà générés (par cette session avant un rafraîchissement, ou par un autre utilisateur) :
+    # seuls ceux dont le prompt est identique avec les segments et le catalogue actuels sont relus
+    restore_key = (
+        st.session_state.segments_file_hash if st.session_state.loaded_segments else None,
+        st.session_state.produits_bancaires_text,
+    )
+    if st.session_state.personas_restored_for != restore_key:
+        def current_prompt(record):
+            segment = find_segment(segments_to_use, record["id"])
+            return create_prompt(segment) if segment is not None else None
+        for segment_id, record in get_persona_store().load(PERSONA_WORKSPACE, current_prompt).items():
+            st.session_state.personas.setdefault(segment_id, record["content"])
+        st.session_state.personas_restored_for = restore_key
+    
     col1, col2 = st.columns([1, 2])
     
     with col1:
         st.write("**Segments disponibles:**")
+        if len(segments_to_use) > MAX_SELECT_OPTIONS:
+            # Trop de segments pour une liste : seuls ceux qui correspondent à la recherche sont proposés
+            segment_search = st.text_input("Rechercher un segment (id ou nom)")
+            segment_options = segments_to_use.search(segment_search)
+            # La sélection en cours reste proposée quand la recherche change
+            segment_options += [s for s in st.session_state.get("segment_selection", []) if s not in segment_options]
+        else:
+            segment_options = [(s.get("id", idx), s.get("name", f"Segment {idx}")) for idx, s in enumerate(segments_to_use)]
         selected_segments = st.multiselect(
             "Sélectionnez les segments à traiter",
-            options=[(s.get("id", idx), s.get("name", f"Segment {idx}")) for idx, s in enumerate(segments_to_use)],
+            options=segment_options,
             format_func=lambda x: f"Cluster {x[0]}: {x[1][:30]}...",
-            default=[(segments_to_use[0].get("id", 0), segments_to_use[0].get("name", "Segment 0"))]
+            default=segment_options[:1],
+            key="segment_selection"
+        )
+        
+        force_regenerate = st.checkbox(
+            "🔄 Forcer la régénération",
+            help="Ignore le cache et rappelle le LLM même si le prompt n'a pas changé"
+        )
+        
+        stream_output = st.checkbox(
+            "⚡ Affichage en streaming",
+            value=True,
+            help="Affiche chaque persona au fil de sa génération (les segments sont alors traités l'un après l'autre)"
         )
         
         if st.button("🚀 Générer les Personas", type="primary"):
             if not selected_segments:
                 st.warning("⚠️ Sélectionnez au moins un segment")
             else:
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                success_count = 0
-                error_count = 0
-                errors_details = []
-                
-                for idx, (seg_id, seg_name) in enumerate(selected_segments):
-                    segment = next((s for s in segments_to_use if s.get("id", -1) == seg_id), None)
+                # Les prompts sont construits ici (accès à st.session_state), seuls les appels LLM partent dans le pool
+                jobs = []
+                job_segments = {}
+                for seg_id, seg_name in selected_segments:
+                    segment = find_segment(segments_to_use, seg_id)
                     
                     if segment:
-                        status_text.text(f"⏳ Génération du Cluster {seg_id}: {seg_name[:30]}...")
-                        
-                        try:
-                            result = generate_persona(segment, llm_model)
-                            
-                            if result:
-                                success_count += 1
-                                status_text.success(f"✅ Cluster {seg_id} généré avec succès!")
-                            else:
-                                error_count += 1
-                                errors_details.append(f"Cluster {seg_id}: Échec de génération (résultat vide)")
-                                status_text.error(f"❌ Échec pour Cluster {seg_id}")
-                        
-                        except Exception as e:
-                            error_count += 1
-                            errors_details.append(f"Cluster {seg_id}: {str(e)}")
-                            status_text.error(f"❌ Erreur pour Cluster {seg_id}: {str(e)}")
+                        jobs.append((seg_id, create_prompt(segment)))
+                        job_segments[seg_id] = segment
                     else:
-                        error_count += 1
-                        errors_details.append(f"Cluster {seg_id}: Segment non trouvé")
-                        status_text.error(f"❌ Cluster {seg_id} non trouvé dans les données")
-                    
-                    progress_bar.progress((idx + 1) / len(selected_segments))
-                
-                # Résumé final
-                status_text.empty()
+                        st.error(f"❌ Cluster {seg_id} non trouvé dans les données")
                 
-                if success_count > 0:
-                    st.success(f"✅ {success_count} persona(s) généré(s) avec succès!")
+                backend = st.session_state.backend
+                persona_cache = get_persona_cache()
+                persona_store = get_persona_store()
+                model_name = backend.model_name
                 
-                if error_count > 0:
-                    st.error(f"❌ {error_count} échec(s) de génération")
-                    
-                    with st.expander("📋 Détails des erreurs"):
-                        for error in errors_details:
-                            st.write(f"• {error}")
+                def generate(payload, job):
+                    # Exécuté dans le pool de get_job_queue(), hors du script : pas d'accès à st.session_state
+                    seg_id, prompt = payload
+                    label = f"Cluster {seg_id}"
+                    if stream_output:
+                        cached = None if force_regenerate else persona_cache.get(model_name, prompt)
+                        if cached is None:
+                            # Texte partiel publié au fil de l'eau, affiché par le suivi du lot ; si une autre
+                            # session génère déjà ce persona, son texte complet arrive d'un bloc (succès du cache)
+                            flight = persona_cache.stream_once(
+                                model_name, prompt, lambda: backend.stream(user_message(prompt), label=label)
+                            )
+                            for chunk in flight:
+                                job.append(chunk)
+                            content, from_cache = job.partial, not flight.leader
+                        else:
+                            content, from_cache = cached, True
+                    else:
+                        content, from_cache = persona_cache.get_or_generate(
+                            model_name, prompt, lambda: backend.complete(user_message(prompt), label=label), force_regenerate
+                        )
+                    if from_cache:
+                        backend.record_cache_hit(user_message(prompt), content, label)
+                    if content:
+                        # Enregistré par le worker : le persona est conservé même si la page a été fermée entre-temps
+                        persona_store.save(
+                            PERSONA_WORKSPACE, job_segments[seg_id], content, prompt_key(model_name, prompt), model_name
+                        )
+                    return content, from_cache
                 
-                if success_count == 0 and error_count > 0:
-                    st.warning("⚠️ Aucun persona n'a été généré. Vérifiez les erreurs ci-dessus.")
+                # max_in_flight appels en parallèle, en streaming aussi : generation_status affiche
+                # le texte partiel de chaque job en cours
+                st.session_state.generation_batch = get_job_queue().submit(
+                    [(seg_id, (seg_id, prompt)) for seg_id, prompt in jobs], generate, max_in_flight
+                )
+                st.session_state.generation_seen = 0
     
     with col2:
-        if st.session_state.personas:
-            st.write("**Personas générés:**")
-            
-            persona_options = [
-                f"Cluster {k}: {next((s.get('name', 'Unknown') for s in segments_to_use if s.get('id', -1) == k), 'Unknown')[:40]}..."
-                for k in sorted(st.session_state.personas.keys())
-            ]
-            
-            selected_persona = st.selectbox("Afficher le persona de:", persona_options)
-            
-            if selected_persona:
-                persona_id = int(selected_persona.split(":")[0].replace("Cluster ", ""))
-                
-                st.markdown("---")
-                st.markdown('<div class="persona-output">', unsafe_allow_html=True)
-                st.markdown(st.session_state.personas[persona_id])
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                col_a, col_b = st.columns(2)
-                
-                with col_a:
-                    st.download_button(
-                        label="📥 Télécharger en TXT",
-                        data=st.session_state.personas[persona_id],
-                        file_name=f"persona_cluster_{persona_id}.txt",
-                        mime="text/plain"
-                    )
-                
-                with col_b:
-                    segment_name = next((s.get("name", "Unknown") for s in segments_to_use if s.get("id", -1) == persona_id), "Unknown")
-                    
-                    # Générer le PDF
-                    pdf_buffer = generate_persona_pdf(persona_id, st.session_state.personas[persona_id], segment_name)
-                    
-                    st.download_button(
-                        label="📥 Télécharger en PDF",
-                        data=pdf_buffer,
-                        file_name=f"persona_cluster_{persona_id}.pdf",
-                        mime="application/pdf"
-                    )
-        else:
-            st.info("💡 Générez des personas pour les voir ici")
+        # Rafraîchi chaque seconde tant que le lot de cette session tourne, plus du tout ensuite
+        batch = get_job_queue().batch(st.session_state.generation_batch)
+        fragment(run_every=1 if batch is not None and not batch.done else None)(generation_status)()
+        personas_panel(segments_to_use)
 
 # TAB 3 - CHAT
-with tab3:
+@fragment
+def chat_tab():
+    """
+    Onglet chat en fragment : un message ne réexécute que cette fonction, pas toute la page
+    """
     st.subheader("💬 Assistant Intelligent pour Personas")
-    
-    st.session_state.llm = llm_model
 
     if "loaded_segments" in st.session_state and st.session_state.loaded_segments:
         segments_for_chat = st.session_state.loaded_segments
     else:
         segments_for_chat = segments_data
+    if len(segments_for_chat) > MAX_CHAT_SEGMENTS:
+        # Des milliers de segments ne tiennent pas dans le prompt : seuls ceux qui ont un persona y figurent
+        segments_for_chat = segments_for_chat.select(st.session_state.personas)
+    
+    # Le contexte n'est recalculé que pour les segments ou personas modifiés
+    chat_context = st.session_state.chat_context
+    chat_context.set_segments(segments_for_chat)
+    chat_context.set_personas(st.session_state.personas)
     
     st.write("**Personas générés disponibles:**")
 
     if st.session_state.personas:
-        for persona_id, content in st.session_state.personas.items():
-            segment_name = next((s.get("name", "Unknown") for s in segments_for_chat if s.get("id", -1) == persona_id), "Unknown")
-            st.info(f"✅ Cluster {persona_id}: {segment_name}")
+        for persona_id in st.session_state.personas:
+            st.info(f"✅ Cluster {persona_id}: {chat_context.segment_name(persona_id)}")
     else:
         st.warning("⚠️ Aucun persona généré. Générez d'abord des personas dans l'onglet 'Générer Personas'")
     
@@ -607,56 +691,93 @@ with tab3:
     
     user_input = st.chat_input("Posez votre question...")
     if user_input:
-    
-        st.session_state.conversation_history.append({
-            "role": "user",
-            "content": user_input
-        })
+        user_turn = {"role": "user", "content": user_input}
+        st.session_state.conversation_history.append(user_turn)
         
         with st.chat_message("user"):
             st.markdown(user_input)
         
         try:
-            personas_context = "PERSONAS GÉNÉRÉS:\n"
-            if st.session_state.personas:
-                for persona_id, content in st.session_state.personas.items():
-                    segment_name = next((s.get("name", "Unknown") for s in segments_for_chat if s.get("id", -1) == persona_id), "Unknown")
-                    personas_context += f"\n--- Cluster {persona_id}: {segment_name} ---\n{content[:2000]}...\n"
-            else:
-                personas_context += "Aucun persona généré."
-            
-            segments_context = "\n\nSEGMENTS:\n"
-            for segment in segments_for_chat:
-                segments_context += f"- ID: {segment.get('id')}, Nom: {segment.get('name')}, Âge: {segment.get('age')}, "
-                segments_context += f"Produits: {segment.get('nbProducts')}, Revenu H: {segment.get('revenueHommes')}, Revenu F: {segment.get('revenueFemmes')}\n"
-            
             if st.session_state.produits_bancaires_text:
-                produits_context = f"\n\nCATALOGUE PRODUITS:\n{st.session_state.produits_bancaires_text[:10000]}"
+                system_prompt = chat_context.system_prompt(catalogue_context(user_input))
             else:
-                produits_context = "\n\nNote: Aucun catalogue produits chargé."
-            
-            system_prompt = f"""Tu es un expert en marketing bancaire et segmentation client de Société Générale Côte d'Ivoire.
-                            {personas_context}
-                            {segments_context}
-                            {produits_context}
-                            Utilise ces informations pour répondre aux questions. 
-                            Recommande des produits spécifiques avec tarifs quand le catalogue est disponible."""
+                system_prompt = chat_context.system_prompt()
 
             messages_with_system = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=user_input)
+                system_message(system_prompt),
+                {"role": "user", "content": user_input}
             ]
 
-            response = st.session_state.llm.invoke(messages_with_system)
-        
-            assistant_message = response
-            st.session_state.conversation_history.append({
-                "role": "assistant",
-                "content": assistant_message
-            })
-                
+            reply = StreamCollector(st.session_state.backend.stream(messages_with_system, label="Chat"))
+            
             with st.chat_message("assistant"):
-                st.markdown(assistant_message)
+                st.write_stream(reply)
+                if not reply.completed:
+                    st.warning(f"⚠️ Réponse interrompue avant la fin ({reply.error}). La question et la réponse partielle ne sont pas gardées dans l'historique, reposez la question.")
+            
+            # La réponse n'entre dans l'historique qu'une fois complète
+            if reply.completed:
+                st.session_state.conversation_history.append({
+                    "role": "assistant",
+                    "content": reply.text
+                })
 
         except Exception as e:
             st.error(f"❌ Erreur: {e}")
+            
+        history = st.session_state.conversation_history
+        if history and history[-1] is user_turn:
+            # Sans réponse complète, la question est retirée : deux messages utilisateur
+            # consécutifs fausseraient l'historique envoyé au LLM aux questions suivantes
+            history.pop()
+
+with tab3:
+    chat_tab()
+
+# Télémétrie des appels LLM (en fin de script pour inclure les appels de ce run)
+with st.sidebar:
+    st.divider()
+    st.header("📈 Télémétrie LLM")
+    telemetry = get_telemetry()
+    stats = telemetry.summary()
+    
+    col_a, col_b = st.columns(2)
+    col_a.metric("Appels", stats["calls"])
+    col_b.metric("Succès cache", stats["cache_hits"])
+    col_a.metric("Tokens prompt", f"{stats['prompt_tokens']:,}".replace(",", " "))
+    col_b.metric("Tokens réponse", f"{stats['completion_tokens']:,}".replace(",", " "))
+    col_a.metric("Latence p50", f"{stats['latency_p50']:.1f} s")
+    col_b.metric("1er token p50", f"{stats['ttft_p50']:.1f} s")
+    st.caption(f"Coût estimé : {stats['cost_usd']:.4f} $ · latence p95 : {stats['latency_p95']:.1f} s · {stats['errors']} erreur(s)")
+    
+    top_labels = telemetry.by_label(top=5)
+    if top_labels:
+        st.write("**Appels les plus coûteux:**")
+        import pandas as pd
+        
+        st.dataframe(pd.DataFrame(top_labels), hide_index=True)
+    
+    scheduler_stats = get_scheduler().metrics()
+    st.caption(
+        f"Ordonnanceur : {scheduler_stats['retries']} nouvelle(s) tentative(s) · {scheduler_stats['rate_limited']} limite(s) 429 · "
+        f"{scheduler_stats['throttle_seconds'] + scheduler_stats['backoff_seconds']:.1f} s d'attente · "
+        f"{scheduler_stats['deadline_exceeded']} échéance(s) dépassée(s)"
+    )
+    job_stats = get_job_queue().metrics()
+    st.caption(
+        f"Générations en arrière-plan : {job_stats['running']} en cours · {job_stats['pending']} en attente · "
+        f"{job_stats['failed']} échec(s) depuis le démarrage"
+    )
+    persona_store = get_persona_store()
+    if persona_store.last_error is not None:
+        st.warning(f"⚠️ Enregistrement des personas impossible : {persona_store.last_error}")
+    if st.button("🗑️ Effacer les personas enregistrés", help="Vide le stockage de cette application, pour toutes les sessions"):
+        persona_store.delete(PERSONA_WORKSPACE)
+        st.session_state.personas = {}
+        st.rerun()
+    
+    st.download_button("📥 Export CSV", telemetry.to_csv(), file_name="llm_telemetry.csv", mime="text/csv")
+    st.download_button(
+        "📥 Export Prometheus", telemetry.to_prometheus() + get_scheduler().to_prometheus(),
+        file_name="llm_metrics.prom", mime="text/plain"
+    )
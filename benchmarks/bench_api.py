@@ -0,0 +1,154 @@
+"""
+Test de charge local du service HTTP (persona_core.api) avec le faux LLM : débit, latences
+p50/p95 et refus 503 selon le nombre de clients simultanés, premier fragment en SSE, et un
+lot complet via /batches.
+
+Usage: python benchmarks/bench_api.py [--clients 1,8,32,128] [--requests 64] [--max-concurrency 16]
+                                     [--max-waiting 64] [--profile gpt-4o-mini] [--time-scale 0.05]
+
+--time-scale compresse les délais du faux backend ; les durées affichées sont mesurées (non remises à l'échelle).
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import synthetic_catalogue, synthetic_segments
+from persona_core.backends import FakeBackend
+from persona_core.cache import PersonaCache
+from persona_core.jobs import JobQueue
+from persona_core.store import PersonaStore
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app, port):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def post(url, body):
+    request = urllib.request.Request(url, json.dumps(body).encode("utf-8"), {"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            data = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        data = e.read()
+        status = e.code
+    return status, time.perf_counter() - start, data
+
+
+def first_chunk(url, body):
+    """
+    Délai avant le premier événement chunk d'une réponse SSE, et durée totale
+    """
+    request = urllib.request.Request(url, json.dumps(body).encode("utf-8"), {"Content-Type": "application/json"})
+    start = time.perf_counter()
+    first = None
+    with urllib.request.urlopen(request, timeout=300) as response:
+        for line in response:
+            if first is None and line.startswith(b"event: chunk"):
+                first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def load(base_url, clients, requests, offset):
+    # Un segment différent par requête : aucun persona servi par le cache
+    segments = synthetic_segments(offset + requests)[offset:]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(lambda s: post(f"{base_url}/personas", {"segment": s}), segments))
+    elapsed = time.perf_counter() - start
+    ok = sorted(latency for status, latency, _ in results if status == 200)
+    rejected = sum(status == 503 for status, _, _ in results)
+    return elapsed, ok, rejected, len(results) - len(ok) - rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", default="1,8,32,128")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--max-waiting", type=int, default=64)
+    parser.add_argument("--profile", default="gpt-4o-mini")
+    parser.add_argument("--time-scale", type=float, default=0.05)
+    args = parser.parse_args()
+
+    try:
+        from persona_core.api import PersonaService, create_app
+    except ImportError as e:
+        print(f"Dépendance du service absente ({e.name}) : benchmark impossible")
+        return 1
+
+    directory = tempfile.TemporaryDirectory()
+    backend = FakeBackend(args.profile, sleep=lambda seconds: time.sleep(seconds * args.time_scale))
+    service = PersonaService(
+        backend,
+        catalogue_index=synthetic_catalogue(),
+        persona_cache=PersonaCache(os.path.join(directory.name, "cache.sqlite3")),
+        store=PersonaStore(os.path.join(directory.name, "store.sqlite3")),
+        job_queue=JobQueue(max_workers=args.max_concurrency),
+    )
+    port = free_port()
+    server, thread = start_server(create_app(service, args.max_concurrency, args.max_waiting), port)
+    base_url = f"http://127.0.0.1:{port}"
+
+    print(f"Service : {args.max_concurrency} appels LLM simultanés, {args.max_waiting} en attente, "
+          f"faux LLM {args.profile} (délais x{args.time_scale:g})")
+    offset = 0
+    for clients in (int(c) for c in args.clients.split(",")):
+        elapsed, ok, rejected, failed = load(base_url, clients, args.requests, offset)
+        offset += args.requests
+        line = f"{clients:4d} client(s) : {len(ok) / elapsed:6.1f} personas/s"
+        if ok:
+            line += f", p50 {statistics.median(ok) * 1000:6.0f} ms, p95 {ok[int(len(ok) * 0.95) - 1 if len(ok) > 1 else 0] * 1000:6.0f} ms"
+        print(line + f", {rejected} refus 503, {failed} erreur(s)")
+
+    segment = synthetic_segments(offset + 1)[offset]
+    first, total = first_chunk(f"{base_url}/personas/stream", {"segment": segment})
+    print(f"SSE : premier fragment après {first * 1000:.0f} ms, persona complet en {total * 1000:.0f} ms")
+
+    segments = synthetic_segments(offset + 1 + args.requests)[offset + 1:]
+    start = time.perf_counter()
+    _, _, data = post(f"{base_url}/batches", {"segments": segments, "max_in_flight": args.max_concurrency})
+    batch_id = json.loads(data)["batch_id"]
+    while True:
+        with urllib.request.urlopen(f"{base_url}/batches/{batch_id}") as response:
+            batch = json.loads(response.read())
+        if batch["done"]:
+            break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    print(f"Lot /batches : {len(batch['personas'])}/{len(segments)} personas en {elapsed:.1f} s "
+          f"({len(batch['personas']) / elapsed:.1f} personas/s), {len(batch['errors'])} erreur(s)")
+
+    server.should_exit = True
+    thread.join()
+    directory.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
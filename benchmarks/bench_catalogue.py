@@ -0,0 +1,79 @@
+"""
+Benchmark de la conversion catalogue Excel -> texte : ancienne boucle iterrows
+contre la sérialisation colonne par colonne de persona_core.catalogue.
+
+Usage: python benchmarks/bench_catalogue.py [--rows 10000] [--cols 30]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persona_core.catalogue import dataframe_to_catalogue_text
+
+
+def legacy_catalogue_text(df_produits):
+    # Reprise à l'identique de l'ancienne boucle de app_perso_v3.py
+    catalogue_text = "CATALOGUE PRODUITS BANCAIRES (DÉTAILLÉ):\n\n"
+    for idx, row in df_produits.iterrows():
+        catalogue_text += f"--- PRODUIT {idx + 1} ---\n"
+        for col in df_produits.columns:
+            value = str(row[col])
+            if value.lower() != 'nan':
+                catalogue_text += f"{col}: {value}\n"
+        catalogue_text += "\n"
+    return catalogue_text
+
+
+def synthetic_catalogue(rows, cols, seed=0):
+    """
+    Catalogue synthétique : colonnes texte et numériques, ~10 % de cellules vides
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+    for c in range(cols):
+        if c % 3 == 0:
+            values = pd.Series([f"Produit {i} option {c}" for i in range(rows)], dtype=object)
+        elif c % 3 == 1:
+            values = pd.Series(rng.integers(1000, 500000, rows).astype(str), dtype=object) + " FCFA"
+        else:
+            values = pd.Series(rng.choice(["Particuliers", "Retraités", "Jeunes actifs", "Premium"], rows), dtype=object)
+        values[rng.random(rows) < 0.1] = np.nan
+        data[f"Colonne {c}"] = values
+    return pd.DataFrame(data)
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--cols", type=int, default=30)
+    args = parser.parse_args()
+
+    df = synthetic_catalogue(args.rows, args.cols)
+
+    legacy_time, legacy_text = timed(legacy_catalogue_text, df, repeat=1)
+    new_time, new_text = timed(dataframe_to_catalogue_text, df)
+
+    print(f"Catalogue synthétique: {args.rows} lignes x {args.cols} colonnes ({len(new_text) / 1e6:.1f} Mo de texte)")
+    print(f"iterrows + concaténation : {legacy_time * 1000:8.1f} ms")
+    print(f"sérialisation vectorisée : {new_time * 1000:8.1f} ms  (x{legacy_time / new_time:.1f})")
+    print(f"sorties identiques       : {legacy_text == new_text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark de l'export groupé des personas : rendu PDF un par un (comme les clics
+successifs sur "Télécharger en PDF") contre persona_core.export (ZIP et PDF fusionné).
+
+Usage: python benchmarks/bench_export.py [--personas 50] [--workers 1,2,4]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persona_core.backends import FakeBackend, user_message
+from persona_core.export import personas_zip, merged_personas_pdf
+from persona_core.pdf import generate_persona_pdf
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--personas", type=int, default=50)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="Tailles de pool à comparer")
+    args = parser.parse_args()
+
+    backend = FakeBackend("gpt-4o-mini", sleep=lambda seconds: None)
+    items = [
+        (i, backend.complete(user_message(f"Persona {i}")), f"Segment synthétique {i}")
+        for i in range(args.personas)
+    ]
+
+    sequential, _ = timed(lambda: [generate_persona_pdf(*item).getvalue() for item in items])
+    print(f"{args.personas} personas, {os.cpu_count()} CPU")
+    print(f"{'rendu un par un':<28}: {sequential:6.2f} s")
+
+    for workers in sorted({int(w) for w in args.workers.split(",")}):
+        zip_time, archive = timed(personas_zip, items, max_workers=workers)
+        merged_time, merged = timed(merged_personas_pdf, items, max_workers=workers)
+        print(f"{f'ZIP, {workers} processus':<28}: {zip_time:6.2f} s  ({len(archive) / 1e6:.1f} Mo)")
+        print(f"{f'PDF fusionné, {workers} processus':<28}: {merged_time:6.2f} s  ({len(merged) / 1e6:.1f} Mo)")
+
+
+if __name__ == "__main__":
+    main()
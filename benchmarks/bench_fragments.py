@@ -0,0 +1,109 @@
+"""
+Temps CPU serveur par interaction (message dans le chat, changement de persona affiché) :
+rerun complet de la page, comme avant les fragments, contre rerun du seul fragment concerné.
+
+Mesuré avec streamlit.testing (AppTest) et le faux backend. AppTest réexécute toujours le
+script entier : le coût d'un rerun partiel est mesuré comme le temps CPU passé dans le
+fragment (st.fragment est enveloppé pour le chronométrer).
+
+Usage: python benchmarks/bench_fragments.py [--app persona_v2.py] [--personas 12] [--history 20]
+                                           [--interactions 10]
+"""
+import argparse
+import collections
+import functools
+import logging
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from persona_core.backends import FakeBackend, user_message
+
+fragment_cpu = collections.defaultdict(float)
+
+
+def instrument_fragments(st):
+    real_fragment = getattr(st, "fragment", None) or st.experimental_fragment
+
+    def timed_fragment(func=None, **options):
+        # Même signature que st.fragment : @fragment ou fragment(run_every=...)(func)
+        if func is None:
+            return lambda f: timed_fragment(f, **options)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                fragment_cpu[func.__name__] += time.thread_time() - start
+        return real_fragment(wrapper, **options)
+
+    st.fragment = timed_fragment
+
+
+def timed_run(element, name):
+    before_fragment = fragment_cpu[name]
+    start = time.process_time()
+    element.run()
+    return time.process_time() - start, fragment_cpu[name] - before_fragment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--app", default="persona_v2.py")
+    parser.add_argument("--personas", type=int, default=12)
+    parser.add_argument("--history", type=int, default=20, help="Messages déjà présents dans le chat")
+    parser.add_argument("--interactions", type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        import streamlit as st
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("Streamlit n'est pas installé : benchmark impossible")
+        return 1
+    # AppTest exécute le script hors du serveur : avertissements sans intérêt ici
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    instrument_fragments(st)
+
+    backend = FakeBackend("instant")
+    app = AppTest.from_file(os.path.join(ROOT, args.app), default_timeout=120)
+    app.session_state["backend"] = backend
+    app.session_state["personas"] = {
+        i: backend.complete(user_message(f"Persona {i}")) for i in range(1, args.personas + 1)
+    }
+    app.session_state["conversation_history"] = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": backend.complete(user_message(f"Message {i}"))[:800]}
+        for i in range(args.history)
+    ]
+    app.run()
+    if app.exception:
+        print(f"Erreur au premier rendu : {app.exception[0].value}")
+        return 1
+
+    results = {"Message dans le chat": [], "Changement de persona": []}
+    for i in range(args.interactions):
+        results["Message dans le chat"].append(
+            timed_run(app.chat_input[0].set_value(f"Quels produits pour le cluster {i % args.personas + 1} ?"), "chat_tab")
+        )
+        selectbox = next(s for s in app.selectbox if s.label == "Afficher le persona de:")
+        results["Changement de persona"].append(
+            timed_run(selectbox.select_index((i + 1) % len(selectbox.options)), "personas_panel")
+        )
+
+    print(f"{args.app} : {args.personas} personas, {args.history} messages d'historique, CPU médian par interaction")
+    for name, samples in results.items():
+        full = statistics.median(s[0] for s in samples)
+        partial = statistics.median(s[1] for s in samples)
+        print(f"{name:<24}: page entière {full * 1000:7.1f} ms, fragment {partial * 1000:7.1f} ms "
+              f"({1 - partial / full:.0%} de moins)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Lot de personas pendant que l'utilisateur interagit avec la page (un rerun toutes les
+--interaction secondes) : génération dans le script (un rerun interrompt la boucle, les
+personas restants sont perdus) contre lot soumis au JobQueue (relu à chaque rerun).
+
+Usage: python benchmarks/bench_jobs.py [--segments 40] [--in-flight 8] [--interaction 2]
+                                      [--profile gpt-4o-mini] [--time-scale 0.05]
+
+--time-scale compresse les délais du faux backend ; les durées affichées sont à l'échelle réelle.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persona_core.backends import FakeBackend, user_message
+from persona_core.generation import generate_concurrently
+from persona_core.jobs import JobQueue
+
+
+def in_script(backend, jobs, in_flight, interaction, scale):
+    """
+    Boucle de résultats du script Streamlit, abandonnée au premier rerun
+    """
+    results = generate_concurrently(jobs, lambda prompt: backend.complete(user_message(prompt)), in_flight)
+    start = time.monotonic()
+    personas = {}
+    for key, content, error in results:
+        if error is None:
+            personas[key] = content
+        if time.monotonic() - start >= interaction * scale:
+            # Rerun : Streamlit interrompt le script, le générateur est fermé et les appels restants annulés
+            break
+    results.close()
+    return len(personas), (time.monotonic() - start) / scale
+
+
+def in_queue(backend, jobs, in_flight, interaction, scale):
+    """
+    Lot dans le pool partagé ; chaque rerun reprend les personas terminés depuis le précédent
+    """
+    queue = JobQueue(max_workers=in_flight)
+    start = time.monotonic()
+    batch = queue.batch(queue.submit(jobs, lambda prompt, job: backend.complete(user_message(prompt)), in_flight))
+    personas = {}
+    seen = 0
+    reruns = 0
+    while True:
+        done = batch.done
+        for job in batch.completed[seen:]:
+            if job.error is None:
+                personas[job.key] = job.result
+            seen += 1
+        if done:
+            break
+        time.sleep(interaction * scale)
+        reruns += 1
+    elapsed = (time.monotonic() - start) / scale
+    queue.shutdown()
+    return len(personas), elapsed, reruns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--segments", type=int, default=40)
+    parser.add_argument("--in-flight", type=int, default=8)
+    parser.add_argument("--interaction", type=float, default=2.0, help="Secondes entre deux interactions")
+    parser.add_argument("--profile", default="gpt-4o-mini")
+    parser.add_argument("--time-scale", type=float, default=0.05)
+    args = parser.parse_args()
+
+    backend = FakeBackend(args.profile, sleep=lambda seconds: time.sleep(seconds * args.time_scale))
+    jobs = [(i, f"Persona du segment {i}") for i in range(args.segments)]
+
+    print(f"{args.segments} personas, {args.in_flight} en parallèle, une interaction toutes les {args.interaction:g} s")
+    generated, elapsed = in_script(backend, jobs, args.in_flight, float("inf"), args.time_scale)
+    print(f"sans interaction : {generated:3d}/{args.segments} personas en {elapsed:5.1f} s, "
+          f"{generated / elapsed * 60:5.1f} personas/min (référence)")
+    generated, elapsed = in_script(backend, jobs, args.in_flight, args.interaction, args.time_scale)
+    print(f"dans le script   : {generated:3d}/{args.segments} personas avant le premier rerun ({elapsed:5.1f} s), "
+          f"{args.segments - generated} perdus")
+    generated, elapsed, reruns = in_queue(backend, jobs, args.in_flight, args.interaction, args.time_scale)
+    print(f"JobQueue         : {generated:3d}/{args.segments} personas en {elapsed:5.1f} s malgré {reruns} rerun(s), "
+          f"{generated / elapsed * 60:5.1f} personas/min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Benchmark du rendu PDF des personas sur un lot de documents : ancienne version
+(feuille de styles recréée et chaînes startswith/replace à chaque appel) contre
+le registre de styles et le convertisseur markdown de persona_core.pdf.
+
+Usage: python benchmarks/bench_pdf.py [--documents 1000]
+"""
+import argparse
+import gc
+import io
+import os
+import sys
+import time
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persona_core.backends import FakeBackend, user_message
+from persona_core.pdf import generate_persona_pdf, markdown_to_flowables, pdf_styles
+
+
+# Reprise à l'identique de l'ancienne fonction generate_persona_pdf
+def legacy_generate_persona_pdf(persona_id, persona_content, segment_name):
+    """
+    Génère un PDF formaté pour un persona
+    """
+    buffer = io.BytesIO()
+    
+    # Créer le document PDF
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=2*cm,
+        leftMargin=2*cm,
+        topMargin=2*cm,
+        bottomMargin=2*cm
+    )
+    
+    # Styles
+    styles = getSampleStyleSheet()
+    
+    # Style personnalisé pour le titre
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor='#d32f2f',
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+    
+    # Style pour les sous-titres
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor='#b71c1c',
+        spaceAfter=12,
+        spaceBefore=12
+    )
+    
+    # Style pour le texte normal
+    normal_style = ParagraphStyle(
+        'CustomNormal',
+        parent=styles['Normal'],
+        fontSize=11,
+        alignment=TA_JUSTIFY,
+        spaceAfter=10
+    )
+    
+    # Contenu du PDF
+    story = []
+    
+    # Titre
+    story.append(Paragraph("PERSONA MARKETING", title_style))
+    story.append(Paragraph(f"Cluster {persona_id}: {segment_name}", heading_style))
+    story.append(Spacer(1, 0.5*cm))
+    
+    # Convertir le contenu markdown en paragraphes PDF
+    lines = persona_content.split('\n')
+    
+    for line in lines:
+        line = line.strip()
+        if not line:
+            story.append(Spacer(1, 0.3*cm))
+            continue
+        
+        # Détection des titres (lignes avec **)
+        if line.startswith('**') and line.endswith('**'):
+            title_text = line.replace('**', '')
+            story.append(Paragraph(title_text, heading_style))
+        elif line.startswith('###'):
+            title_text = line.replace('###', '').strip()
+            story.append(Paragraph(title_text, heading_style))
+        elif line.startswith('##'):
+            title_text = line.replace('##', '').strip()
+            story.append(Paragraph(title_text, heading_style))
+        elif line.startswith('#'):
+            title_text = line.replace('#', '').strip()
+            story.append(Paragraph(title_text, heading_style))
+        elif line.startswith('- ') or line.startswith('• '):
+            # Liste à puces
+            text = line[2:].strip()
+            story.append(Paragraph(f"• {text}", normal_style))
+        else:
+            # Texte normal - nettoyer le markdown basique
+            text = line.replace('**', '')
+            if text:
+                story.append(Paragraph(text, normal_style))
+    
+    # Footer
+    story.append(Spacer(1, 1*cm))
+    footer_style = ParagraphStyle(
+        'Footer',
+        parent=styles['Normal'],
+        fontSize=9,
+        textColor='gray',
+        alignment=TA_CENTER
+    )
+    story.append(Paragraph("Généré par le Générateur de Personas Marketing - Société Générale Côte d'Ivoire", footer_style))
+    
+    # Générer le PDF
+    doc.build(story)
+    
+    buffer.seek(0)
+    return buffer
+
+
+def cpu_time(totals, name, fn, *args):
+    # Ramasse-miettes vidé hors mesure : sinon la version mesurée après l'autre paie ses déchets
+    gc.collect()
+    start = time.process_time()
+    result = fn(*args)
+    totals[name] = totals.get(name, 0.0) + time.process_time() - start
+    return result
+
+
+def legacy_story(persona_content):
+    # Partie "styles + analyse du markdown" de l'ancienne fonction, sans doc.build
+    styles = getSampleStyleSheet()
+    heading_style = ParagraphStyle('CustomHeading', parent=styles['Heading2'], fontSize=16,
+                                   textColor='#b71c1c', spaceAfter=12, spaceBefore=12)
+    normal_style = ParagraphStyle('CustomNormal', parent=styles['Normal'], fontSize=11,
+                                  alignment=TA_JUSTIFY, spaceAfter=10)
+    story = []
+    for line in persona_content.split('\n'):
+        line = line.strip()
+        if not line:
+            story.append(Spacer(1, 0.3*cm))
+        elif line.startswith('**') and line.endswith('**'):
+            story.append(Paragraph(line.replace('**', ''), heading_style))
+        elif line.startswith('###'):
+            story.append(Paragraph(line.replace('###', '').strip(), heading_style))
+        elif line.startswith('##'):
+            story.append(Paragraph(line.replace('##', '').strip(), heading_style))
+        elif line.startswith('#'):
+            story.append(Paragraph(line.replace('#', '').strip(), heading_style))
+        elif line.startswith('- ') or line.startswith('• '):
+            story.append(Paragraph(f"• {line[2:].strip()}", normal_style))
+        else:
+            story.append(Paragraph(line.replace('**', ''), normal_style))
+    return story
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=1000)
+    args = parser.parse_args()
+
+    backend = FakeBackend("gpt-4o-mini", sleep=lambda seconds: None)
+    # 50 contenus distincts réutilisés : la génération du texte ne fait pas partie de la mesure
+    contents = [backend.complete(user_message(f"Persona {i}")) for i in range(50)]
+    items = [(i, contents[i % len(contents)], f"Segment synthétique {i}") for i in range(args.documents)]
+    pdf_styles()
+
+    # Mesures entrelacées document par document, dans un ordre alterné : la dérive de la
+    # machine et les effets de cache touchent les deux versions
+    totals = {}
+    versions = [
+        ("legacy", legacy_story, legacy_generate_persona_pdf),
+        ("new", markdown_to_flowables, generate_persona_pdf),
+    ]
+    for index, (persona_id, content, segment_name) in enumerate(items):
+        for name, story, generate in versions if index % 2 else versions[::-1]:
+            cpu_time(totals, f"{name}_story", story, content)
+            cpu_time(totals, f"{name}_total", generate, persona_id, content, segment_name)
+
+    n = args.documents
+    ms = {name: total / n * 1000 for name, total in totals.items()}
+    print(f"{n} documents ({sum(len(c) for c in contents) // len(contents)} caractères en moyenne), temps CPU par PDF :")
+    print(f"{'':<20}{'ancien':>10}{'nouveau':>10}")
+    print(f"{'styles + markdown':<20}{ms['legacy_story']:>8.2f}ms{ms['new_story']:>8.2f}ms")
+    print(f"{'PDF complet':<20}{ms['legacy_total']:>8.2f}ms{ms['new_total']:>8.2f}ms"
+          f"  ({(ms['new_total'] / ms['legacy_total'] - 1) * 100:+.0f} %)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark hors ligne du pipeline complet (sélection catalogue -> prompt -> LLM -> PDF)
+avec le faux backend de persona_core.backends, qui rejoue un profil de latence.
+
+Usage: python benchmarks/bench_pipeline.py [--segments 40] [--profile gpt-4o-mini] [--in-flight 1,4,8,16]
+                                          [--time-scale 0.05]
+
+--time-scale compresse les délais du profil (0.05 : un appel de 12 s dure 0,6 s) ;
+les durées affichées sont ramenées à l'échelle réelle.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persona_core.backends import FakeBackend, LATENCY_PROFILES, user_message
+from persona_core.generation import generate_concurrently
+from persona_core.pdf import generate_persona_pdf
+from persona_core.prompts import build_persona_prompt
+from persona_core.retrieval import CatalogueIndex, segment_query
+
+
+def synthetic_segments(count):
+    return [
+        {
+            "id": i,
+            "name": f"Segment synthétique {i}",
+            "age": 25 + (i * 7) % 45,
+            "nbProducts": 1 + (i * 3) % 14,
+            "revenueHommes": f"{(i % 4) * 100000} - {(i % 4 + 1) * 100000} FCFA",
+            "revenueFemmes": f"{(i % 3) * 100000} - {(i % 3 + 1) * 100000} FCFA",
+            "mobileAccess": f"{80 + i % 20}%",
+            "emailAccess": f"{50 + i % 40}%",
+            "characteristics": ["Retraités", "Jeunes actifs", "Fonctionnaires", "Commerçants"][i % 4],
+        }
+        for i in range(count)
+    ]
+
+
+def synthetic_catalogue(products=500):
+    cibles = ["retraités épargne", "jeunes étudiants", "premium gold", "mobile banking", "crédit immobilier"]
+    records = [
+        f"--- PRODUIT {i + 1} ---\nNom: Produit {i}\nCible: {cibles[i % len(cibles)]}\nTarif: {1000 + 250 * i} FCFA/mois"
+        for i in range(products)
+    ]
+    return CatalogueIndex("", records)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(backend, jobs, max_in_flight):
+    latencies = {}
+
+    def worker(prompt):
+        start = time.perf_counter()
+        stream = backend.stream(user_message(prompt))
+        first = next(stream)
+        ttft = time.perf_counter() - start
+        content = first + "".join(stream)
+        return content, ttft, time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = {}
+    for key, result, error in generate_concurrently(jobs, worker, max_in_flight):
+        if error is not None:
+            raise error
+        content, ttft, latency = result
+        results[key] = content
+        latencies[key] = (ttft, latency)
+    return time.perf_counter() - start, results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--segments", type=int, default=40)
+    parser.add_argument("--profile", default="gpt-4o-mini", choices=sorted(LATENCY_PROFILES))
+    parser.add_argument("--in-flight", default="1,4,8,16", help="Valeurs de concurrence à comparer")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-scale", type=float, default=0.05, help="Facteur appliqué aux délais simulés")
+    args = parser.parse_args()
+
+    segments = synthetic_segments(args.segments)
+    index = synthetic_catalogue()
+
+    start = time.perf_counter()
+    jobs = [(s["id"], build_persona_prompt(s, index.relevant_products(segment_query(s)))) for s in segments]
+    prompt_seconds = time.perf_counter() - start
+
+    scale = args.time_scale
+    backend = FakeBackend(args.profile, seed=args.seed, sleep=lambda seconds: time.sleep(seconds * scale))
+    print(f"{args.segments} segments, profil {args.profile}: {LATENCY_PROFILES[args.profile]}")
+    print(f"Construction des prompts : {prompt_seconds * 1000:.1f} ms "
+          f"({statistics.mean(len(p) for _, p in jobs):.0f} caractères en moyenne)")
+    print()
+    print(f"{'in-flight':>9} {'total (s)':>10} {'personas/s':>11} {'TTFT p50':>9} {'TTFT p95':>9} {'lat. p50':>9} {'lat. p95':>9}")
+
+    reference = None
+    for max_in_flight in [int(v) for v in args.in_flight.split(",")]:
+        wall, results, latencies = run(backend, jobs, max_in_flight)
+        wall /= scale
+        latencies = {key: (ttft / scale, total / scale) for key, (ttft, total) in latencies.items()}
+        if reference is None:
+            reference = results
+        assert results == reference, "le faux backend doit être déterministe"
+
+        ttfts = [t for t, _ in latencies.values()]
+        totals = [t for _, t in latencies.values()]
+        print(f"{max_in_flight:>9} {wall:>10.2f} {len(results) / wall:>11.2f} "
+              f"{percentile(ttfts, 50):>9.2f} {percentile(ttfts, 95):>9.2f} "
+              f"{percentile(totals, 50):>9.2f} {percentile(totals, 95):>9.2f}")
+
+    start = time.perf_counter()
+    for segment in segments:
+        generate_persona_pdf(segment["id"], reference[segment["id"]], segment["name"])
+    pdf_seconds = time.perf_counter() - start
+    print()
+    print(f"Rendu PDF : {pdf_seconds / len(segments) * 1000:.1f} ms par persona")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Part des tokens de prompt qu'un fournisseur peut servir depuis son cache de préfixe, pour un
+lot de personas et une conversation : ancienne disposition (données du segment ou catalogue de
+la question en tête / au milieu) contre préfixe stable puis données variables, et pour un petit
+catalogue (qui tient en entier dans une sélection) catalogue complet dans le préfixe.
+
+Usage: python benchmarks/bench_prompt_prefix.py [--segments 40] [--turns 10] [--min-prefix 1024]
+                                               [--small-catalogue 12]
+
+--min-prefix : taille minimale d'un préfixe mis en cache (1024 tokens chez OpenAI et Anthropic).
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import synthetic_catalogue, synthetic_segments
+from persona_core.backends import FakeBackend, user_message
+from persona_core.chat_context import ChatContext, CHAT_INSTRUCTIONS
+from persona_core.prompts import build_persona_prompt, persona_instructions, segment_data
+from persona_core.retrieval import segment_query
+from persona_core.tokens import count_tokens
+
+# Tokens lus depuis le cache facturés à 50 % (OpenAI ; 10 % chez Anthropic)
+CACHED_INPUT_PRICE = 0.5
+
+
+def common_prefix_tokens(texts):
+    """
+    Tokens du plus long préfixe commun au premier texte et à chacun des suivants (moyenne)
+    """
+    first = texts[0]
+    shared = []
+    for text in texts[1:]:
+        n = 0
+        limit = min(len(first), len(text))
+        while n < limit and first[n] == text[n]:
+            n += 1
+        shared.append(count_tokens(first[:n]))
+    return sum(shared) / len(shared) if shared else 0
+
+
+def report(name, texts, min_prefix):
+    total = sum(count_tokens(t) for t in texts) / len(texts)
+    shared = common_prefix_tokens(texts)
+    cached = shared if shared >= min_prefix else 0
+    billed = (total - cached) + cached * CACHED_INPUT_PRICE
+    print(f"{name:<34}: {total:7.0f} tokens/appel, préfixe commun {shared:6.0f} "
+          f"({shared / total:4.0%}), cache {'oui' if cached else 'non'}, coût d'entrée {billed / total:4.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--segments", type=int, default=40)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--min-prefix", type=int, default=1024)
+    parser.add_argument("--small-catalogue", type=int, default=12, help="Produits du petit catalogue")
+    args = parser.parse_args()
+
+    segments = synthetic_segments(args.segments)
+    index = synthetic_catalogue()
+    products = {s["id"]: index.relevant_products(segment_query(s)) for s in segments}
+
+    print(f"Lot de {args.segments} personas")
+    report("données du segment en tête", [
+        segment_data(s, products[s["id"]]) + "\n\n" + persona_instructions(True) for s in segments
+    ], args.min_prefix)
+    report("instructions puis segment", [build_persona_prompt(s, products[s["id"]]) for s in segments], args.min_prefix)
+
+    small = synthetic_catalogue(args.small_catalogue)
+    print(f"\nLot de {args.segments} personas, catalogue de {args.small_catalogue} produits")
+    report("sélection après le segment", [
+        build_persona_prompt(s, small.relevant_products(segment_query(s))) for s in segments
+    ], args.min_prefix)
+    report("catalogue complet en préfixe", [
+        build_persona_prompt(s, *reversed(small.persona_catalogue(segment_query(s)))) for s in segments
+    ], args.min_prefix)
+
+    backend = FakeBackend("instant")
+    personas = {s["id"]: backend.complete(user_message(f"Persona {s['id']}")) for s in segments[:8]}
+    context = ChatContext(segments)
+    context.set_personas(personas)
+    themes = ["retraités épargne", "jeunes étudiants", "premium gold", "mobile banking", "crédit immobilier"]
+    questions = [f"Quels produits {themes[i % len(themes)]} pour le segment {i} ?" for i in range(args.turns)]
+    selections = [index.relevant_products(q) for q in questions]
+
+    print(f"\nConversation de {args.turns} questions, {len(personas)} personas")
+    # Avant : consignes après le catalogue de la question (personas et segments étaient déjà en tête)
+    old_prefix = context.prefix().replace(f"\n{CHAT_INSTRUCTIONS}", "")
+    report("catalogue puis consignes", [
+        f"{old_prefix}\n\nCATALOGUE PRODUITS (sélection pertinente pour la question):\n{selection}\n\n{CHAT_INSTRUCTIONS}"
+        for selection in selections
+    ], args.min_prefix)
+    report("préfixe stable puis catalogue", [context.system_prompt(selection) for selection in selections], args.min_prefix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Lot de personas face à un fournisseur qui limite le débit (429 au-delà de --provider-rpm
+requêtes par minute) : appels directs contre RequestScheduler (seaux à jetons + backoff).
+
+Usage: python benchmarks/bench_ratelimit.py [--segments 60] [--in-flight 16] [--provider-rpm 30]
+                                           [--time-scale 0.01]
+
+--time-scale compresse le temps (horloge et délais) ; les durées affichées sont à l'échelle réelle.
+"""
+import argparse
+import collections
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persona_core.backends import FakeBackend, user_message
+from persona_core.generation import generate_concurrently
+from persona_core.scheduler import RequestScheduler, ScheduledBackend
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class RateLimitedFake(FakeBackend):
+    """
+    Faux fournisseur : refuse (429) toute requête au-delà de rpm sur une fenêtre glissante d'une minute
+    """
+
+    def __init__(self, rpm, clock, **kwargs):
+        super().__init__(**kwargs)
+        self.rpm = rpm
+        self.clock = clock
+        self.accepted = collections.deque()
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def complete(self, messages, **options):
+        with self.lock:
+            now = self.clock()
+            while self.accepted and now - self.accepted[0] >= 60:
+                self.accepted.popleft()
+            if len(self.accepted) >= self.rpm:
+                self.rejected += 1
+                raise RateLimitError("Rate limit reached")
+            self.accepted.append(now)
+        return super().complete(messages, **options)
+
+
+def run(backend, segments, in_flight):
+    jobs = [(i, f"Persona du segment {i}") for i in range(segments)]
+    results = list(generate_concurrently(jobs, lambda prompt: backend.complete(user_message(prompt)), in_flight))
+    return sum(error is None for _, _, error in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--segments", type=int, default=60)
+    parser.add_argument("--in-flight", type=int, default=16)
+    parser.add_argument("--provider-rpm", type=int, default=30)
+    parser.add_argument("--profile", default="gpt-4o-mini")
+    parser.add_argument("--time-scale", type=float, default=0.01)
+    args = parser.parse_args()
+
+    start = time.monotonic()
+
+    def clock():
+        # Temps simulé, à l'échelle réelle
+        return (time.monotonic() - start) / args.time_scale
+
+    def sleep(seconds):
+        time.sleep(seconds * args.time_scale)
+
+    print(f"{args.segments} personas, {args.in_flight} en parallèle, fournisseur limité à {args.provider_rpm} req/min")
+    for name in ("direct", "ordonnanceur"):
+        provider = RateLimitedFake(args.provider_rpm, clock, profile=args.profile, sleep=sleep)
+        if name == "direct":
+            backend = provider
+        else:
+            # Limite configurée un peu sous celle du fournisseur ; les 429 restants sont absorbés par le backoff
+            scheduler = RequestScheduler(int(args.provider_rpm * 0.95), 10 ** 9, clock=clock, sleep=sleep,
+                                         deadline=3600, seed=0)
+            # Seau vide au départ : pas de rafale d'une minute de débit contre un fournisseur déjà sollicité
+            scheduler.requests.adjust(scheduler.requests.capacity)
+            backend = ScheduledBackend(provider, scheduler)
+
+        t0 = clock()
+        succeeded = run(backend, args.segments, args.in_flight)
+        elapsed = clock() - t0
+        print(f"{name:<13}: {succeeded}/{args.segments} réussis, {provider.rejected} réponse(s) 429, "
+              f"{elapsed:6.0f} s, {succeeded / elapsed * 60:5.1f} personas/min")
+        if name != "direct":
+            print(f"{'':<13}  {scheduler.metrics()}")
+
+
+if __name__ == "__main__":
+    main()
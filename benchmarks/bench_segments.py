@@ -0,0 +1,96 @@
+"""
+Onglet Segments avec un gros CSV : lecture complète en liste de dictionnaires (pd.read_csv
+puis to_dict) contre lecture par blocs dans une SegmentTable en colonnes. Mesure le
+chargement, la mémoire retenue, le rendu des cartes, les options de sélection et la
+recherche d'un segment par id.
+
+Usage: python benchmarks/bench_segments.py [--rows 100000] [--lookups 20]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persona_core.segments import load_segment_csv, SEGMENTS_PER_PAGE, MAX_SELECT_OPTIONS
+
+REVENUES = ["< 1 000 €", "1 000 - 2 000 €", "2 000 - 3 500 €", "> 3 500 €"]
+ACCESS = ["Faible", "Moyen", "Élevé"]
+
+
+def synthetic_csv(rows):
+    lines = ["id,name,age,nbProducts,revenueHommes,revenueFemmes,mobileAccess,emailAccess,characteristics,commentaire"]
+    for i in range(rows):
+        lines.append(
+            f"{i},Micro-segment {i} ({REVENUES[i % 4]}),{25 + i % 50},{1 + i % 7},{REVENUES[i % 4]},{REVENUES[(i + 1) % 4]},"
+            f"{ACCESS[i % 3]},{ACCESS[(i + 1) % 3]},Profil {i % 12},note libre {i}"
+        )
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def card(idx, segment):
+    # Même texte que la carte HTML de l'onglet Segments
+    return (
+        f"CLUSTER {segment.get('id', idx)}: {segment.get('name', 'Sans nom')} "
+        f"{segment.get('age', 'N/A')} {segment.get('nbProducts', 'N/A')} {segment.get('revenueHommes', 'N/A')} "
+        f"{segment.get('revenueFemmes', 'N/A')} {segment.get('mobileAccess', 'N/A')} {segment.get('emailAccess', 'N/A')}"
+    )
+
+
+def measure(load, data):
+    """
+    Durée de chargement, puis mémoire retenue par le résultat (tracemalloc, second chargement)
+    """
+    start = time.perf_counter()
+    load(io.BytesIO(data))
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    segments = load(io.BytesIO(data))
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return segments, elapsed, retained, peak
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=20, help="Recherches par id (libellés des personas générés)")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    data = synthetic_csv(args.rows)
+    ids = [args.rows - 1 - i * (args.rows // max(1, args.lookups)) for i in range(args.lookups)]
+    print(f"CSV de {args.rows} segments ({len(data) / 1e6:.1f} Mo)")
+
+    records, elapsed, retained, peak = measure(lambda f: pd.read_csv(f).to_dict("records"), data)
+    _, render = timed(lambda: [card(idx, s) for idx, s in enumerate(records)])
+    _, options = timed(lambda: [(s.get("id", idx), s.get("name", f"Segment {idx}")) for idx, s in enumerate(records)])
+    _, lookup = timed(lambda: [next((s for s in records if s.get("id", -1) == i), None) for i in ids])
+    print(f"liste de dicts : chargement {elapsed:5.2f} s, mémoire {retained / 1e6:6.1f} Mo (pic {peak / 1e6:6.1f} Mo), "
+          f"{len(records)} cartes {render * 1000:7.1f} ms, {len(records)} options {options * 1000:6.1f} ms, "
+          f"{args.lookups} recherches par id {lookup * 1000:7.1f} ms")
+    records = None
+
+    (table, _, _, _), elapsed, retained, peak = measure(load_segment_csv, data)
+    _, render = timed(lambda: [card(idx, s) for idx, s in enumerate(table[:SEGMENTS_PER_PAGE])])
+    segment_options, options = timed(lambda: table.search(""))
+    _, search = timed(lambda: table.search("Micro-segment 9999"))
+    _, lookup = timed(lambda: [table.get(i) for i in ids])
+    print(f"SegmentTable   : chargement {elapsed:5.2f} s, mémoire {retained / 1e6:6.1f} Mo (pic {peak / 1e6:6.1f} Mo), "
+          f"{SEGMENTS_PER_PAGE} cartes {render * 1000:7.1f} ms, {len(segment_options)} options {options * 1000:6.1f} ms, "
+          f"{args.lookups} recherches par id {lookup * 1000:7.1f} ms (recherche par nom {search * 1000:.1f} ms, "
+          f"au plus {MAX_SELECT_OPTIONS} options)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Sessions simultanées qui demandent les mêmes personas : nombre d'appels LLM avec le
+cache partagé (PersonaCache + SingleFlight), comme N analystes ouvrant l'application
+en même temps sur les segments par défaut.
+
+Usage: python benchmarks/bench_shared.py [--sessions 8] [--segments 6] [--time-scale 0.05] [--stream]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persona_core.backends import FakeBackend, user_message
+from persona_core.cache import PersonaCache
+from persona_core.generation import generate_concurrently
+from persona_core.telemetry import InstrumentedBackend, TelemetryRecorder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--segments", type=int, default=6)
+    parser.add_argument("--profile", default="gpt-4o-mini")
+    parser.add_argument("--time-scale", type=float, default=0.05)
+    parser.add_argument("--stream", action="store_true", help="Génération séquentielle en streaming (stream_once)")
+    args = parser.parse_args()
+
+    telemetry = TelemetryRecorder()
+    backend = InstrumentedBackend(
+        FakeBackend(args.profile, sleep=lambda seconds: time.sleep(seconds * args.time_scale)), telemetry
+    )
+    cache = PersonaCache(os.path.join(tempfile.mkdtemp(), "personas.sqlite3"))
+    prompts = [(i, f"Persona du segment par défaut {i}") for i in range(args.segments)]
+    start_barrier = threading.Barrier(args.sessions)
+    results = [None] * args.sessions
+
+    def session(index):
+        def worker(job):
+            _, prompt = job
+            return cache.get_or_generate(backend.model_name, prompt, lambda: backend.complete(user_message(prompt)))
+
+        start_barrier.wait()
+        if args.stream:
+            results[index] = {
+                seg_id: "".join(cache.stream_once(backend.model_name, prompt, lambda: backend.stream(user_message(prompt))))
+                for seg_id, prompt in prompts
+            }
+        else:
+            results[index] = {
+                seg_id: result[0] for seg_id, result, _ in generate_concurrently([(i, (i, p)) for i, p in prompts], worker, 4)
+            }
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(args.sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    identical = all(result == results[0] for result in results)
+    print(f"{args.sessions} sessions x {args.segments} segments ({'streaming' if args.stream else 'parallèle'})")
+    print(f"appels LLM     : {len(telemetry.records())} (sans partage : {args.sessions * args.segments})")
+    print(f"appels groupés : {cache.flights.joined}")
+    print(f"résultats identiques entre sessions : {identical}")
+    print(f"durée          : {elapsed / args.time_scale:.1f} s (échelle réelle)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Démarrage à froid des applications Streamlit : temps des imports de tête de chaque script
+et mémoire du processus, mesurés dans un interpréteur neuf ; premier rendu complet via
+streamlit.testing (AppTest) si Streamlit est installé. --baseline compare avec une autre
+révision git de l'arbre.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--baseline HEAD~1] [--apps app_claude.py,persona_v2.py]
+"""
+import argparse
+import ast
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = ("app_claude.py", "app_perso_v3.py", "persona_v2.py", "chat_persona_v1.py")
+HEAVY_MODULES = ("streamlit", "pandas", "reportlab", "PyPDF2", "tiktoken", "openai", "langchain_openai", "langchain")
+
+# Exécuté dans un interpréteur neuf : imports de tête du script, un par un
+# (les dépendances absentes de cet environnement sont ignorées et signalées)
+IMPORT_PROBE = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+missing = []
+for statement in {statements!r}:
+    try:
+        exec(statement, {{}})
+    except ImportError as e:
+        missing.append(e.name or statement)
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+    "missing": sorted(set(missing)),
+}}))
+"""
+
+RENDER_PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({path!r}, default_timeout=120)
+app.run()
+print(json.dumps({{"seconds": time.perf_counter() - start, "exceptions": len(app.exception)}}))
+"""
+
+
+def top_level_imports(path):
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def probe(code, cwd):
+    output = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(root, app, runs, render):
+    path = os.path.join(root, app)
+    code = IMPORT_PROBE.format(root=root, statements=top_level_imports(path), heavy=HEAVY_MODULES)
+    samples = [probe(code, root) for _ in range(runs)]
+    result = {
+        "imports": statistics.median(s["seconds"] for s in samples),
+        "rss_mb": statistics.median(s["rss_mb"] for s in samples),
+        "loaded": samples[0]["loaded"],
+        "missing": samples[0]["missing"],
+    }
+    if render:
+        renders = [probe(RENDER_PROBE.format(root=root, path=path), root) for _ in range(runs)]
+        result["render"] = statistics.median(r["seconds"] for r in renders)
+    return result
+
+
+def export_revision(revision, directory):
+    archive = subprocess.run(["git", "archive", revision], cwd=ROOT, capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", directory], input=archive, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", help="Révision git de référence (ex. HEAD~1)")
+    parser.add_argument("--apps", default=",".join(APPS))
+    args = parser.parse_args()
+
+    render = importlib.util.find_spec("streamlit") is not None
+    if not render:
+        print("Streamlit non installé : seul le coût des imports est mesuré, pas le premier rendu\n")
+
+    trees = [("actuel", ROOT)]
+    baseline_dir = None
+    if args.baseline:
+        baseline_dir = tempfile.TemporaryDirectory()
+        export_revision(args.baseline, baseline_dir.name)
+        trees.insert(0, (args.baseline, baseline_dir.name))
+
+    for app in args.apps.split(","):
+        print(app)
+        for name, root in trees:
+            result = measure(root, app, args.runs, render)
+            line = f"  {name:<10}: imports {result['imports'] * 1000:7.1f} ms, {result['rss_mb']:6.1f} Mo"
+            if render:
+                line += f", premier rendu {result['render']:5.2f} s"
+            print(line + f"  [{', '.join(result['loaded']) or '-'}]")
+        if result["missing"]:
+            print(f"  (absents ici : {', '.join(result['missing'])})")
+
+    if baseline_dir is not None:
+        baseline_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+"""
+Briques communes aux applications Streamlit du Générateur de Personas Marketing
+"""
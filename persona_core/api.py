@@ -0,0 +1,617 @@
+"""
+Service HTTP/JSON de génération des personas et de chat, pour les outils CRM et de campagne.
+
+Lancement :
+    python -m persona_core.api --backend openai --segments segments.csv --catalogue catalogue.xlsx --port 8000
+    python -m persona_core.api --backend fake      (faux LLM local, pour les tests de charge)
+
+Endpoints :
+    GET  /health                      état du service et occupation
+    GET  /segments                    segments chargés au démarrage
+    POST /personas                    {"segment": {...}} ou {"segment_id": 3}, "force": false -> persona
+    POST /personas/stream             idem, texte en Server-Sent Events (chunk, puis done ou error)
+    POST /batches                     {"segments": [...] ou "segment_ids": [...]} -> 202 {"batch_id": ...}
+    GET  /batches/{batch_id}          progression du lot et personas terminés
+    GET  /personas/{segment_id}       dernier persona généré pour ce segment
+    GET  /personas/{segment_id}/pdf   le même en PDF
+    POST /chat                        {"messages": [...], "stream": false} -> réponse (ou SSE)
+    GET  /metrics                     compteurs au format texte Prometheus
+
+Un seul backend (un seul client et donc un seul pool de connexions vers le fournisseur),
+un seul ordonnanceur, le cache et le stockage des personas sont partagés par toutes les
+requêtes. Au-delà de max_concurrency requêtes en cours et max_waiting en attente, le
+service répond 503 avec Retry-After plutôt que d'accumuler les requêtes. Les lots sont
+suivis par un JobQueue, mais chacune de leurs générations prend un créneau du même
+limiteur : au plus max_concurrency appels LLM au total, requêtes et lots confondus.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from persona_core.backends import create_backend, user_message, system_message
+from persona_core.cache import PersonaCache, prompt_key
+from persona_core.chat_context import ChatContext
+from persona_core.generation import DEFAULT_MAX_IN_FLIGHT
+from persona_core.history import ChatHistoryManager
+from persona_core.jobs import JobQueue, DONE, FAILED
+from persona_core.pdf import generate_persona_pdf
+from persona_core.prompts import build_persona_prompt
+from persona_core.retrieval import segment_query
+from persona_core.scheduler import (
+    RequestScheduler, ScheduledBackend, DeadlineExceeded, DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE
+)
+from persona_core.store import PersonaStore
+from persona_core.telemetry import InstrumentedBackend, TelemetryRecorder
+
+# Espace de travail du service dans le stockage des personas
+API_WORKSPACE = "api"
+# Appels LLM simultanés (threads du service) et requêtes en attente d'un créneau
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("PERSONA_API_MAX_CONCURRENCY", "16"))
+DEFAULT_MAX_WAITING = int(os.environ.get("PERSONA_API_MAX_WAITING", "64"))
+# Délai suggéré au client quand le service est saturé (en-tête Retry-After, en secondes)
+RETRY_AFTER_SECONDS = 1
+MAX_BATCH_SEGMENTS = 1000
+
+
+class RequestError(Exception):
+    """
+    Requête invalide (400) ou ressource inconnue (404)
+    """
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Overloaded(Exception):
+    """
+    Plus aucun créneau d'appel LLM ni place en attente
+    """
+
+
+class ConcurrencyLimiter:
+    """
+    Sémaphore asyncio avec une file d'attente bornée : au-delà, les requêtes sont refusées
+    tout de suite au lieu d'attendre indéfiniment
+    """
+
+    def __init__(self, limit, max_waiting):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    def check(self):
+        """
+        Lève Overloaded si une nouvelle requête n'a aucune chance d'obtenir un créneau
+        """
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise Overloaded()
+
+    @asynccontextmanager
+    async def slot(self, reject=True):
+        """
+        Créneau d'appel LLM. reject=False (générations des lots) : attend sans jamais être
+        refusé, et n'occupe pas la file d'attente bornée des requêtes HTTP
+        """
+        if reject:
+            self.check()
+            self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            if reject:
+                self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+
+def _json_ready(segment):
+    # Segments lus par pandas : scalaires numpy et NaN -> valeurs JSON
+    plain = {}
+    for key, value in segment.items():
+        value = value.item() if hasattr(value, "item") else value
+        plain[key] = None if isinstance(value, float) and value != value else value
+    return plain
+
+
+def positive_int(body, name, default=None):
+    """
+    Champ entier strictement positif d'une requête (default s'il est absent)
+    """
+    value = body.get(name, default)
+    if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 1):
+        raise RequestError(f"{name}: entier positif attendu")
+    return value
+
+
+def boolean(body, name, default=False):
+    """
+    Champ booléen JSON d'une requête (default s'il est absent) : "false" ou 0 sont refusés
+    """
+    value = body.get(name)
+    if value is None:
+        return default
+    if not isinstance(value, bool):
+        raise RequestError(f"{name}: booléen attendu (true ou false)")
+    return value
+
+
+def validate_history(history):
+    """
+    Vérifie l'historique envoyé au chat : liste non vide de messages user/assistant
+    """
+    if not isinstance(history, list) or not history or not all(
+        isinstance(m, dict) and m.get("role") in ("user", "assistant") and isinstance(m.get("content"), str)
+        for m in history
+    ):
+        raise RequestError("messages: liste non vide de {role: user|assistant, content: texte}")
+
+
+def _segment_id(text):
+    # Les ids sont stockés en JSON : "3" -> 3, "abc" -> "abc"
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+class PersonaService:
+    """
+    Génération, lots, PDF et chat, sans dépendance HTTP. Les méthodes sont bloquantes :
+    le serveur les exécute dans ses threads.
+    """
+
+    def __init__(self, backend, segments=(), catalogue_index=None, persona_cache=None, store=None, job_queue=None,
+                 workspace=API_WORKSPACE):
+        self.backend = backend
+        self.model = backend.model_name
+        self.catalogue_index = catalogue_index
+        self.persona_cache = persona_cache
+        self.store = store
+        self.job_queue = job_queue if job_queue is not None else JobQueue()
+        self.workspace = workspace
+        self.segments = {segment["id"]: segment for segment in map(_json_ready, segments)}
+        self.personas = {}
+        self._lock = threading.Lock()
+        self._chat_context = ChatContext()
+        self._chat_segments = None
+        if store is not None:
+            # Un persona enregistré n'est repris que si son prompt est inchangé (segment chargé au
+            # démarrage, ou à défaut segment enregistré avec lui, et catalogue actuel)
+            def current_prompt(record):
+                return self.prompt(self.segments.get(record["id"], record["segment"]))
+
+            for segment_id, record in store.load(workspace, current_prompt).items():
+                self.personas[segment_id] = record["content"]
+                self.segments.setdefault(segment_id, record["segment"])
+
+    def segment(self, body):
+        """
+        Segment d'une requête : décrit en entier ("segment") ou chargé au démarrage ("segment_id")
+        """
+        if isinstance(body.get("segment"), dict):
+            segment = body["segment"]
+            if not isinstance(segment.get("id"), (int, str)):
+                raise RequestError("segment: champ 'id' (entier ou texte) requis")
+            return segment
+        if "segment_id" in body:
+            if not isinstance(body["segment_id"], (int, str)):
+                raise RequestError("segment_id: entier ou texte attendu")
+            segment = self.segments.get(body["segment_id"])
+            if segment is None:
+                raise RequestError(f"Segment inconnu: {body['segment_id']}", 404)
+            return segment
+        raise RequestError("Champ 'segment' ou 'segment_id' requis")
+
+    def prompt(self, segment):
+        if self.catalogue_index is None:
+            return build_persona_prompt(segment)
+        shared, products = self.catalogue_index.persona_catalogue(segment_query(segment))
+        return build_persona_prompt(segment, products, shared)
+
+    def generate(self, segment, force=False):
+        """
+        Persona d'un segment (relu depuis le cache si le prompt n'a pas changé)
+        """
+        prompt = self.prompt(segment)
+        label = f"Cluster {segment['id']}"
+        if self.persona_cache is None:
+            content, from_cache = self.backend.complete(user_message(prompt), label=label), False
+        else:
+            content, from_cache = self.persona_cache.get_or_generate(
+                self.model, prompt, lambda: self.backend.complete(user_message(prompt), label=label), force
+            )
+        if from_cache:
+            self.backend.record_cache_hit(user_message(prompt), content, label)
+        return self._remember(segment, prompt, content, from_cache)
+
+    def stream(self, segment, force=False):
+        """
+        Générateur : fragments du persona, puis l'enregistrement complet (dict) en dernier élément
+        """
+        prompt = self.prompt(segment)
+        label = f"Cluster {segment['id']}"
+        cached = None
+        if self.persona_cache is not None and not force:
+            cached = self.persona_cache.get(self.model, prompt)
+        if cached is not None:
+            self.backend.record_cache_hit(user_message(prompt), cached, label)
+            yield cached
+            yield self._remember(segment, prompt, cached, True)
+            return
+
+        def open_stream():
+            return self.backend.stream(user_message(prompt), label=label)
+
+        chunks = []
+        if self.persona_cache is None:
+            stream = open_stream()
+        else:
+            # Si le même persona est déjà en cours de génération, son texte complet arrive d'un bloc
+            stream = self.persona_cache.stream_once(self.model, prompt, open_stream)
+        for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+        content = "".join(chunks)
+        from_cache = getattr(stream, "leader", True) is False
+        if from_cache:
+            self.backend.record_cache_hit(user_message(prompt), content, label)
+        yield self._remember(segment, prompt, content, from_cache)
+
+    def _remember(self, segment, prompt, content, from_cache):
+        prompt_hash = prompt_key(self.model, prompt)
+        if content:
+            with self._lock:
+                self.personas[segment["id"]] = content
+                self.segments.setdefault(segment["id"], segment)
+            if self.store is not None:
+                self.store.save(self.workspace, segment, content, prompt_hash, self.model)
+        return {
+            "id": segment["id"],
+            "name": segment.get("name"),
+            "model": self.model,
+            "prompt_hash": prompt_hash,
+            "from_cache": from_cache,
+            "content": content,
+        }
+
+    def submit_batch(self, segments, force=False, max_in_flight=DEFAULT_MAX_IN_FLIGHT, generate=None):
+        """
+        Lot généré en arrière-plan par le JobQueue ; retourne son identifiant.
+        generate(segment, force) remplace self.generate (le serveur y ajoute son créneau d'appel).
+        """
+        generate = generate or self.generate
+        return self.job_queue.submit(
+            [(segment["id"], segment) for segment in segments],
+            lambda segment, job: generate(segment, force),
+            max_in_flight
+        )
+
+    def batch_status(self, batch_id):
+        batch = self.job_queue.batch(batch_id)
+        if batch is None:
+            raise RequestError(f"Lot inconnu: {batch_id}", 404)
+        return {
+            "batch_id": batch.id,
+            "done": batch.done,
+            "counts": batch.counts(),
+            "personas": [job.result for job in list(batch.completed) if job.status == DONE],
+            "errors": [{"id": job.key, "error": str(job.error)} for job in list(batch.completed) if job.status == FAILED],
+        }
+
+    def persona(self, segment_id):
+        with self._lock:
+            content = self.personas.get(segment_id)
+            segment = self.segments.get(segment_id, {"id": segment_id})
+        if content is None:
+            raise RequestError(f"Aucun persona pour le segment {segment_id}", 404)
+        return segment, content
+
+    def pdf(self, segment_id):
+        segment, content = self.persona(segment_id)
+        return generate_persona_pdf(segment_id, content, segment.get("name", "Unknown")).getvalue()
+
+    def chat_messages(self, history, history_budget=None):
+        """
+        Prompt système (personas et segments connus du service) suivi de l'historique fourni,
+        borné en tokens ; la dernière question sert à choisir les produits du catalogue
+        """
+        validate_history(history)
+        with self._lock:
+            if self._chat_segments is None or len(self._chat_segments) != len(self.segments):
+                # Nouvelle liste seulement si des segments sont apparus : le contexte n'est pas reconstruit à chaque question
+                self._chat_segments = list(self.segments.values())
+            self._chat_context.set_segments(self._chat_segments)
+            self._chat_context.set_personas(dict(self.personas))
+            question = history[-1]["content"]
+            products = self.catalogue_index.relevant_products(question) if self.catalogue_index else None
+            system_content = self._chat_context.system_prompt(products)
+        manager = ChatHistoryManager() if history_budget is None else ChatHistoryManager(budget_tokens=history_budget)
+        return [system_message(system_content)] + manager.messages_for(history)
+
+    def chat(self, history, history_budget=None):
+        return self.backend.complete(self.chat_messages(history, history_budget), label="Chat API")
+
+    def chat_stream(self, history, history_budget=None):
+        return self.backend.stream(self.chat_messages(history, history_budget), label="Chat API")
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _error_response(error):
+    if isinstance(error, RequestError):
+        return JSONResponse({"error": str(error)}, status_code=error.status_code)
+    if isinstance(error, Overloaded):
+        return JSONResponse({"error": "Service saturé, réessayez plus tard"}, status_code=503,
+                            headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    if isinstance(error, DeadlineExceeded):
+        return JSONResponse({"error": str(error)}, status_code=504)
+    return JSONResponse({"error": f"Erreur du fournisseur LLM: {error}"}, status_code=502)
+
+
+def create_app(service, max_concurrency=DEFAULT_MAX_CONCURRENCY, max_waiting=DEFAULT_MAX_WAITING, metrics=None):
+    """
+    Application ASGI (Starlette) autour d'un PersonaService.
+    metrics : fonction sans argument retournant des compteurs Prometheus supplémentaires.
+    """
+    limiter = ConcurrencyLimiter(max_concurrency, max_waiting)
+    # Autant de threads que de créneaux : un appel LLM bloquant n'occupe jamais la boucle asyncio
+    executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="persona-api")
+
+    async def run(fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(fn, *args))
+
+    async def limited(fn, *args):
+        async with limiter.slot():
+            return await run(fn, *args)
+
+    async def queued(fn, *args):
+        async with limiter.slot(reject=False):
+            return await run(fn, *args)
+
+    async def read_json(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            raise RequestError("Corps JSON invalide")
+        if not isinstance(body, dict):
+            raise RequestError("Le corps doit être un objet JSON")
+        return body
+
+    def endpoint(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            try:
+                return await handler(request)
+            except Exception as e:
+                return _error_response(e)
+        return wrapper
+
+    def sse_response(make_iterator, on_item):
+        """
+        Réponse SSE : le générateur bloquant est parcouru dans les threads du service, sous un créneau
+        """
+        limiter.check()
+
+        async def events():
+            try:
+                async with limiter.slot():
+                    iterator = await run(make_iterator)
+                    sentinel = object()
+                    try:
+                        while True:
+                            item = await run(next, iterator, sentinel)
+                            if item is sentinel:
+                                break
+                            yield on_item(item)
+                    finally:
+                        # Client parti : ferme le flux (le fournisseur arrête de générer)
+                        close = getattr(iterator, "close", None)
+                        if close is not None:
+                            await run(close)
+            except Overloaded:
+                yield _sse("error", {"error": "Service saturé, réessayez plus tard"})
+            except Exception as e:
+                yield _sse("error", {"error": str(e)})
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    @endpoint
+    async def health(request):
+        return JSONResponse({
+            "status": "ok",
+            "model": service.model,
+            "segments": len(service.segments),
+            "personas": len(service.personas),
+            "active": limiter.active,
+            "waiting": limiter.waiting,
+            "rejected": limiter.rejected,
+        })
+
+    @endpoint
+    async def list_segments(request):
+        return JSONResponse(list(service.segments.values()))
+
+    @endpoint
+    async def create_persona(request):
+        body = await read_json(request)
+        segment = service.segment(body)
+        return JSONResponse(await limited(service.generate, segment, boolean(body, "force")))
+
+    @endpoint
+    async def stream_persona(request):
+        body = await read_json(request)
+        segment = service.segment(body)
+        force = boolean(body, "force")
+        return sse_response(
+            lambda: service.stream(segment, force),
+            lambda item: _sse("done", item) if isinstance(item, dict) else _sse("chunk", {"text": item})
+        )
+
+    @endpoint
+    async def create_batch(request):
+        body = await read_json(request)
+        field = "segment_ids" if "segment_ids" in body else "segments"
+        items = body.get(field) or []
+        if not isinstance(items, list):
+            raise RequestError(f"{field}: liste attendue")
+        if field == "segment_ids":
+            segments = [service.segment({"segment_id": segment_id}) for segment_id in items]
+        else:
+            segments = [service.segment({"segment": segment}) for segment in items]
+        if not segments or len(segments) > MAX_BATCH_SEGMENTS:
+            raise RequestError(f"Entre 1 et {MAX_BATCH_SEGMENTS} segments par lot")
+        max_in_flight = min(positive_int(body, "max_in_flight", DEFAULT_MAX_IN_FLIGHT), max_concurrency)
+        force = boolean(body, "force")
+        loop = asyncio.get_running_loop()
+
+        def generate(segment, force):
+            # Thread du JobQueue : la génération attend un créneau du limiteur, comme les requêtes
+            return asyncio.run_coroutine_threadsafe(queued(service.generate, segment, force), loop).result()
+
+        batch_id = service.submit_batch(segments, force, max_in_flight, generate)
+        return JSONResponse({"batch_id": batch_id, "status_url": f"/batches/{batch_id}"}, status_code=202)
+
+    @endpoint
+    async def get_batch(request):
+        return JSONResponse(service.batch_status(request.path_params["batch_id"]))
+
+    @endpoint
+    async def get_persona(request):
+        segment_id = _segment_id(request.path_params["segment_id"])
+        segment, content = service.persona(segment_id)
+        return JSONResponse({"id": segment_id, "name": segment.get("name"), "content": content})
+
+    @endpoint
+    async def get_persona_pdf(request):
+        segment_id = _segment_id(request.path_params["segment_id"])
+        data = await run(service.pdf, segment_id)
+        return Response(data, media_type="application/pdf", headers={
+            "Content-Disposition": f'attachment; filename="persona_cluster_{segment_id}.pdf"'
+        })
+
+    @endpoint
+    async def chat(request):
+        body = await read_json(request)
+        history = body.get("messages")
+        history_budget = positive_int(body, "history_budget")
+        validate_history(history)
+        if boolean(body, "stream"):
+            return sse_response(
+                lambda: service.chat_stream(history, history_budget),
+                lambda text: _sse("chunk", {"text": text})
+            )
+        return JSONResponse({"role": "assistant", "content": await limited(service.chat, history, history_budget)})
+
+    @endpoint
+    async def prometheus(request):
+        text = (
+            "# HELP persona_api_active_requests Appels LLM en cours.\n"
+            "# TYPE persona_api_active_requests gauge\n"
+            f"persona_api_active_requests {limiter.active}\n"
+            "# HELP persona_api_waiting_requests Requêtes en attente d'un créneau.\n"
+            "# TYPE persona_api_waiting_requests gauge\n"
+            f"persona_api_waiting_requests {limiter.waiting}\n"
+            "# HELP persona_api_rejected_total Requêtes refusées (503) faute de créneau.\n"
+            "# TYPE persona_api_rejected_total counter\n"
+            f"persona_api_rejected_total {limiter.rejected}\n"
+        )
+        if metrics is not None:
+            text += metrics()
+        return Response(text, media_type="text/plain; version=0.0.4")
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        # Jobs des lots pas encore démarrés annulés ; ceux qui attendent un créneau échouent avec l'exécuteur
+        service.job_queue.shutdown(wait=False)
+        executor.shutdown(wait=False, cancel_futures=True)
+        if service.store is not None:
+            service.store.flush(timeout=5)
+
+    app = Starlette(routes=[
+        Route("/health", health),
+        Route("/segments", list_segments),
+        Route("/personas", create_persona, methods=["POST"]),
+        Route("/personas/stream", stream_persona, methods=["POST"]),
+        Route("/personas/{segment_id}", get_persona),
+        Route("/personas/{segment_id}/pdf", get_persona_pdf),
+        Route("/batches", create_batch, methods=["POST"]),
+        Route("/batches/{batch_id}", get_batch),
+        Route("/chat", chat, methods=["POST"]),
+        Route("/metrics", prometheus),
+    ], lifespan=lifespan)
+    app.state.service = service
+    app.state.limiter = limiter
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m persona_core.api",
+        description="Service HTTP de génération des personas et de chat."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--backend",
+        choices=["socgenai", "openai", "langchain-openai", "fake"],
+        default="socgenai",
+        help="Client LLM à utiliser (fake : backend local sans réseau)"
+    )
+    parser.add_argument("--model", default="gpt-4o-mini", help="Modèle OpenAI, ou profil de latence du backend fake")
+    parser.add_argument("--segments", help="CSV des segments disponibles par segment_id")
+    parser.add_argument("--catalogue", help="Catalogue produits (.xlsx, .xls ou .pdf)")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY, help="Appels LLM simultanés")
+    parser.add_argument("--max-waiting", type=int, default=DEFAULT_MAX_WAITING, help="Requêtes en attente avant refus (503)")
+    parser.add_argument("--rpm", type=int, default=DEFAULT_REQUESTS_PER_MINUTE, help="Limite de requêtes par minute du fournisseur")
+    parser.add_argument("--tpm", type=int, default=DEFAULT_TOKENS_PER_MINUTE, help="Limite de tokens par minute du fournisseur")
+    parser.add_argument("--no-cache", action="store_true", help="N'utilise pas le cache disque des personas")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import uvicorn
+
+    from persona_core.cli import load_catalogue_index, load_segments
+
+    args = parse_args(argv)
+    telemetry = TelemetryRecorder()
+    scheduler = RequestScheduler(args.rpm, args.tpm)
+    backend = ScheduledBackend(InstrumentedBackend(
+        create_backend(args.backend, model=args.model, api_key=os.environ.get("OPENAI_API_KEY")), telemetry
+    ), scheduler)
+    service = PersonaService(
+        backend,
+        segments=load_segments(args.segments) if args.segments else (),
+        catalogue_index=load_catalogue_index(args.catalogue) if args.catalogue else None,
+        persona_cache=None if args.no_cache else PersonaCache(),
+        store=PersonaStore(),
+        job_queue=JobQueue(max_workers=args.max_concurrency),
+    )
+    app = create_app(service, args.max_concurrency, args.max_waiting,
+                     metrics=lambda: telemetry.to_prometheus() + scheduler.to_prometheus())
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
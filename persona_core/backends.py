@@ -0,0 +1,267 @@
+"""
+Couche d'accès aux LLM : une interface commune pour les clients utilisés par les
+applications (services.socgenai_models, LangChain ChatOpenAI, openai.OpenAI) et un
+faux backend local, déterministe, pour les benchmarks hors ligne.
+
+Les messages sont des dictionnaires {"role": "system" | "user" | "assistant", "content": str},
+avec éventuellement "cache_prefix" : longueur du début de content identique d'un appel à
+l'autre (instructions, catalogue), que les adaptateurs peuvent marquer pour le cache de
+prompt du fournisseur (cache_control).
+"""
+import hashlib
+import os
+import random
+import time
+from dataclasses import dataclass
+
+from persona_core.prompts import prefix_length
+from persona_core.streaming import iter_text
+
+DEFAULT_MAX_TOKENS = 2500
+# Marquage explicite du préfixe pour le cache de prompt (passerelles compatibles Anthropic) ;
+# le cache automatique d'OpenAI n'en a pas besoin, seul l'ordre préfixe puis données compte
+DEFAULT_CACHE_CONTROL = os.environ.get("LLM_PROMPT_CACHE_CONTROL", "") == "1"
+CACHE_CONTROL = {"type": "ephemeral"}
+# Options d'appel transmises par bind() aux modèles ChatOpenAI (paramètres de leur requête)
+OPENAI_BIND_OPTIONS = ("timeout", "max_tokens")
+
+
+def wire_content(message, cache_control=False):
+    """
+    Contenu à envoyer : le texte, ou deux blocs dont le premier (préfixe) porte cache_control
+    """
+    content = message["content"]
+    split = message.get("cache_prefix")
+    if not cache_control or not split:
+        return content
+    blocks = [{"type": "text", "text": content[:split], "cache_control": dict(CACHE_CONTROL)}]
+    if content[split:]:
+        blocks.append({"type": "text", "text": content[split:]})
+    return blocks
+
+
+class LLMBackend:
+    """
+    Interface commune : complete() retourne le texte complet, stream() le produit fragment par fragment
+    """
+
+    model_name = "unknown"
+
+    def complete(self, messages, **options):
+        raise NotImplementedError
+
+    def stream(self, messages, **options):
+        yield self.complete(messages, **options)
+
+    def record_cache_hit(self, messages, content, label=None):
+        """
+        Signale une réponse servie par le cache (enregistrée par InstrumentedBackend)
+        """
+
+
+class LangChainBackend(LLMBackend):
+    """
+    Adaptateur pour un modèle LangChain : ChatOpenAI (réponse .content) ou
+    llm_model de services.socgenai_models (réponse texte).
+    bind_options : options d'appel que le modèle accepte via bind() ; par défaut
+    OPENAI_BIND_OPTIONS pour ChatOpenAI, aucune pour les autres modèles
+    """
+
+    def __init__(self, llm, cache_control=DEFAULT_CACHE_CONTROL, bind_options=None):
+        from persona_core.cache import describe_model
+
+        self.llm = llm
+        self.model_name = describe_model(llm)
+        self.cache_control = cache_control
+        if bind_options is None:
+            # Par nom de classe : langchain_openai n'est pas importé pour les autres modèles
+            is_openai = any(cls.__name__ in ("ChatOpenAI", "BaseChatOpenAI") for cls in type(llm).__mro__)
+            bind_options = OPENAI_BIND_OPTIONS if is_openai else ()
+        self.bind_options = tuple(bind_options)
+
+    def _to_langchain(self, messages):
+        from langchain.schema import HumanMessage, SystemMessage, AIMessage
+
+        classes = {"system": SystemMessage, "user": HumanMessage, "assistant": AIMessage}
+        return [classes[m["role"]](content=wire_content(m, self.cache_control)) for m in messages]
+
+    def _bound(self, options):
+        # Temps restant avant l'échéance (RequestScheduler) et longueur maximale, transmis à
+        # chaque appel comme dans OpenAIBackend si le modèle les accepte ; bind() les passe à
+        # la requête du fournisseur
+        kwargs = {key: options[key] for key in self.bind_options if options.get(key)}
+        if kwargs and hasattr(self.llm, "bind"):
+            return self.llm.bind(**kwargs)
+        return self.llm
+
+    def complete(self, messages, **options):
+        response = self._bound(options).invoke(self._to_langchain(messages))
+        return getattr(response, "content", response)
+
+    def stream(self, messages, **options):
+        return iter_text(self._bound(options).stream(self._to_langchain(messages)))
+
+
+class OpenAIBackend(LLMBackend):
+    """
+    Adaptateur pour le client openai.OpenAI (réponse choices[0].message.content)
+    """
+
+    def __init__(self, client, model="gpt-4o-mini", max_tokens=DEFAULT_MAX_TOKENS, cache_control=DEFAULT_CACHE_CONTROL):
+        self.client = client
+        self.model_name = model
+        self.max_tokens = max_tokens
+        self.cache_control = cache_control
+
+    def _request(self, messages, options):
+        request = {
+            "model": options.get("model") or self.model_name,
+            "max_tokens": options.get("max_tokens") or self.max_tokens,
+            # L'API n'accepte que role et content
+            "messages": [{"role": m["role"], "content": wire_content(m, self.cache_control)} for m in messages],
+        }
+        if options.get("timeout"):
+            # Temps restant avant l'échéance de l'appel (RequestScheduler)
+            request["timeout"] = options["timeout"]
+        return request
+
+    def complete(self, messages, **options):
+        response = self.client.chat.completions.create(**self._request(messages, options))
+        return response.choices[0].message.content
+
+    def stream(self, messages, **options):
+        return iter_text(self.client.chat.completions.create(stream=True, **self._request(messages, options)))
+
+
+@dataclass(frozen=True)
+class LatencyProfile:
+    """
+    Profil de latence rejoué par FakeBackend
+    """
+    time_to_first_token: float = 0.8
+    tokens_per_second: float = 50.0
+    completion_tokens: int = 600
+    jitter: float = 0.1
+
+
+# Profils approximatifs observés en production, plus un profil instantané pour les tests
+LATENCY_PROFILES = {
+    "gpt-4o-mini": LatencyProfile(time_to_first_token=0.6, tokens_per_second=80.0, completion_tokens=900),
+    "gpt-4o": LatencyProfile(time_to_first_token=0.9, tokens_per_second=45.0, completion_tokens=900),
+    "socgenai": LatencyProfile(time_to_first_token=1.5, tokens_per_second=30.0, completion_tokens=900),
+    "instant": LatencyProfile(time_to_first_token=0.0, tokens_per_second=0.0, completion_tokens=300, jitter=0.0),
+}
+
+_FAKE_SECTIONS = [
+    "PROFIL DÉMOGRAPHIQUE DÉTAILLÉ",
+    "COMPORTEMENTS ET PATTERNS BANCAIRES",
+    "BESOINS ET PRÉFÉRENCES",
+    "MOTIVATIONS ET PAIN POINTS",
+    "STRATÉGIE MARKETING RECOMMANDÉE",
+    "RECOMMANDATIONS DE PRODUITS BANCAIRES",
+    "PROPOSITION DE VALEUR UNIQUE",
+]
+_FAKE_WORDS = (
+    "client segment épargne crédit mobile agence carte compte revenu fidélité conseil "
+    "digital famille retraite package assurance besoin usage canal offre priorité"
+).split()
+
+
+class FakeBackend(LLMBackend):
+    """
+    Backend local sans réseau : rejoue un profil de latence (délai avant premier token,
+    débit de tokens) et produit un texte déterministe dérivé du prompt.
+    """
+
+    def __init__(self, profile="gpt-4o-mini", seed=0, sleep=time.sleep):
+        self.profile = LATENCY_PROFILES[profile] if isinstance(profile, str) else profile
+        self.model_name = f"fake-{profile}" if isinstance(profile, str) else "fake"
+        self.seed = seed
+        self._sleep = sleep
+
+    def _rng(self, messages):
+        digest = hashlib.sha256(str(self.seed).encode("utf-8"))
+        for message in messages:
+            digest.update(message["role"].encode("utf-8"))
+            digest.update(message["content"].encode("utf-8"))
+        return random.Random(digest.digest())
+
+    def _tokens(self, rng):
+        tokens = []
+        per_section = max(1, self.profile.completion_tokens // len(_FAKE_SECTIONS))
+        for title in _FAKE_SECTIONS:
+            tokens.append(f"**{title}**\n")
+            for i in range(per_section - 1):
+                word = rng.choice(_FAKE_WORDS)
+                tokens.append(f"- {word}" if i % 12 == 0 else f" {word}")
+                if i % 12 == 11:
+                    tokens.append("\n")
+            tokens.append("\n\n")
+        return tokens
+
+    def _delay(self, rng, base):
+        if base <= 0:
+            return 0.0
+        return max(0.0, base * (1 + rng.uniform(-self.profile.jitter, self.profile.jitter)))
+
+    def stream(self, messages, **options):
+        rng = self._rng(messages)
+        tokens = self._tokens(rng)
+        self._sleep(self._delay(rng, self.profile.time_to_first_token))
+
+        per_token = 1 / self.profile.tokens_per_second if self.profile.tokens_per_second else 0.0
+        # Les tokens sont émis par paquets pour ne pas mesurer la précision de time.sleep
+        batch = 8
+        for i in range(0, len(tokens), batch):
+            if i:
+                self._sleep(self._delay(rng, per_token * batch))
+            yield "".join(tokens[i:i + batch])
+
+    def complete(self, messages, **options):
+        return "".join(self.stream(messages, **options))
+
+
+def create_backend(name, model=None, api_key=None, profile=None, cache_control=DEFAULT_CACHE_CONTROL):
+    """
+    Construit un backend par nom : "socgenai", "langchain-openai", "openai" ou "fake"
+    """
+    if name == "socgenai":
+        from services.socgenai_models import llm_model
+        return LangChainBackend(llm_model, cache_control)
+
+    # max_retries=0 : les relances sont faites par RequestScheduler, qui doit voir chaque 429
+    if name == "langchain-openai":
+        from langchain_openai import ChatOpenAI
+        llm = ChatOpenAI(api_key=api_key, model=model or "gpt-4o-mini", temperature=0.7, max_retries=0)
+        return LangChainBackend(llm, cache_control)
+
+    if name == "openai":
+        from openai import OpenAI
+        return OpenAIBackend(OpenAI(api_key=api_key, max_retries=0), model or "gpt-4o-mini", cache_control=cache_control)
+
+    if name == "fake":
+        return FakeBackend(profile or (model if model in LATENCY_PROFILES else "gpt-4o-mini"))
+
+    raise ValueError(f"Backend LLM inconnu: {name}")
+
+
+def _message(role, content):
+    message = {"role": role, "content": content}
+    split = prefix_length(content)
+    if split:
+        message["cache_prefix"] = split
+    return message
+
+
+def user_message(prompt):
+    """
+    Liste de messages pour un prompt unique
+    """
+    return [_message("user", prompt)]
+
+
+def system_message(content):
+    """
+    Message système ; le préfixe stable d'un prompts.Prompt est marqué pour le cache de prompt
+    """
+    return _message("system", content)
@@ -0,0 +1,277 @@
+import hashlib
+import os
+from concurrent.futures import Future
+from contextlib import contextmanager
+import sqlite3
+import threading
+import time
+
+# Emplacement par défaut du cache disque (surchargeable par variable d'environnement)
+DEFAULT_CACHE_PATH = os.environ.get(
+    "PERSONA_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "chatbot_persona", "personas.sqlite3")
+)
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+
+def prompt_key(model, prompt):
+    """
+    Clé de cache : empreinte SHA-256 du nom de modèle et du prompt exact
+    """
+    digest = hashlib.sha256()
+    digest.update(str(model).encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def describe_model(llm):
+    """
+    Nom du modèle d'un client LLM (LangChain ou autre), utilisé dans la clé de cache
+    """
+    for attr in ("model_name", "model", "model_id"):
+        value = getattr(llm, attr, None)
+        if isinstance(value, str) and value:
+            return value
+    return type(llm).__name__
+
+
+class SingleFlight:
+    """
+    Regroupe les générations identiques en cours : le premier appelant d'une clé fait
+    l'appel LLM, les suivants (autres sessions, autres threads) attendent son résultat.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        # Nombre d'appels LLM évités depuis le démarrage
+        self.joined = 0
+
+    def acquire(self, key):
+        """
+        Retourne (future, leader). Le leader doit ensuite appeler release() ; les autres attendent future.result()
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.joined += 1
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def release(self, key, future, result=None, error=None):
+        """
+        Publie le résultat (ou l'erreur) du leader aux appelants en attente
+        """
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn):
+        """
+        Retourne (résultat, leader) : fn() n'est exécutée que par le leader
+        """
+        future, leader = self.acquire(key)
+        if not leader:
+            return future.result(), False
+        try:
+            result = fn()
+        except Exception as e:
+            self.release(key, future, error=e)
+            raise
+        self.release(key, future, result)
+        return result, True
+
+    def in_flight(self):
+        """
+        Nombre de générations en cours
+        """
+        with self._lock:
+            return len(self._calls)
+
+
+class FlightStream:
+    """
+    Fragments retournés par PersonaCache.stream_once. Dès le premier fragment, leader vaut
+    True si cet appelant fait l'appel LLM, False s'il reçoit le texte d'une génération
+    identique déjà en cours ailleurs (à compter comme un succès du cache).
+    """
+
+    def __init__(self, cache, model, prompt, stream):
+        self.leader = None
+        self._chunks = cache._stream_once(model, prompt, stream, self)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._chunks)
+
+    def close(self):
+        self._chunks.close()
+
+
+class PersonaCache:
+    """
+    Cache persistant (SQLite) des personas générés, indexé par empreinte modèle + prompt.
+    Les entrées expirent après ttl_seconds et les moins récemment utilisées sont
+    évincées dès que la taille totale dépasse max_bytes. Les générations identiques
+    simultanées ne font qu'un appel LLM (SingleFlight).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.flights = SingleFlight()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS personas (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_personas_last_access ON personas(last_access)")
+
+    @contextmanager
+    def _connect(self):
+        # Une connexion par opération : le cache est utilisé depuis les threads de génération
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, model, prompt):
+        """
+        Retourne le persona en cache pour ce modèle et ce prompt, ou None
+        """
+        key = prompt_key(model, prompt)
+        now = time.time()
+
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT content, created_at FROM personas WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            content, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM personas WHERE key = ?", (key,))
+                return None
+
+            conn.execute("UPDATE personas SET last_access = ? WHERE key = ?", (now, key))
+            return content
+
+    def put(self, model, prompt, content):
+        """
+        Enregistre un persona puis applique l'expiration et l'éviction LRU
+        """
+        key = prompt_key(model, prompt)
+        now = time.time()
+
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO personas (key, model, content, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, str(model), content, len(content.encode("utf-8")), now, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        if self.ttl_seconds:
+            conn.execute("DELETE FROM personas WHERE created_at < ?", (now - self.ttl_seconds,))
+
+        if not self.max_bytes:
+            return
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM personas").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        stale_keys = []
+        for key, size in conn.execute("SELECT key, size FROM personas ORDER BY last_access ASC"):
+            if total <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM personas WHERE key = ?", stale_keys)
+
+    def get_or_generate(self, model, prompt, generate, force=False):
+        """
+        Retourne (contenu, depuis_le_cache). Appelle generate() si le prompt n'est
+        pas en cache ou si force est vrai, puis met le résultat en cache. Si la même
+        génération est déjà en cours, attend son résultat (compté comme venant du cache).
+        """
+        if not force:
+            cached = self.get(model, prompt)
+            if cached is not None:
+                return cached, True
+
+        def generate_and_store():
+            # Un leader a pu terminer entre la lecture du cache et la prise de la clé
+            if not force:
+                cached = self.get(model, prompt)
+                if cached is not None:
+                    return cached, True
+            content = generate()
+            if content:
+                self.put(model, prompt, content)
+            return content, False
+
+        (content, from_cache), leader = self.flights.do(prompt_key(model, prompt), generate_and_store)
+        return content, from_cache or not leader
+
+    def stream_once(self, model, prompt, stream):
+        """
+        FlightStream : fragments de stream(), puis mise en cache du texte complet. Si la même
+        génération est déjà en cours ailleurs, produit son texte complet en un seul fragment
+        (et leader vaut False).
+        """
+        return FlightStream(self, model, prompt, stream)
+
+    def _stream_once(self, model, prompt, stream, flight):
+        key = prompt_key(model, prompt)
+        future, flight.leader = self.flights.acquire(key)
+        if not flight.leader:
+            yield future.result()
+            return
+
+        chunks = []
+        try:
+            for chunk in stream():
+                chunks.append(chunk)
+                yield chunk
+        except BaseException as e:
+            # GeneratorExit (affichage interrompu) : les appelants en attente reçoivent une erreur explicite
+            self.flights.release(key, future, error=e if isinstance(e, Exception) else RuntimeError("Génération interrompue"))
+            raise
+
+        content = "".join(chunks)
+        try:
+            if content:
+                self.put(model, prompt, content)
+        finally:
+            self.flights.release(key, future, content)
+
+    def clear(self):
+        """
+        Vide entièrement le cache
+        """
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM personas")
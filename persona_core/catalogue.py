@@ -0,0 +1,68 @@
+import hashlib
+import io
+
+from persona_core.pdf_extract import extract_pdf_text
+
+CATALOGUE_HEADER = "CATALOGUE PRODUITS BANCAIRES (DÉTAILLÉ):\n\n"
+
+
+def dataframe_to_records(df):
+    """
+    Convertit le catalogue Excel en une fiche texte par produit :
+    "--- PRODUIT n ---" suivi d'une ligne "colonne: valeur" par cellule renseignée.
+    Le travail est fait colonne par colonne (opérations pandas vectorisées),
+    les cellules vides (NaN) sont écartées comme dans l'ancienne boucle iterrows.
+    """
+    if df.empty:
+        return []
+
+    cells = []
+    for col in df.columns:
+        column = df[col]
+        values = column.astype(str)
+        keep = column.notna() & (values.str.lower() != "nan")
+        line = ("\n" + str(col) + ": ") + values
+        cells.append(line.where(keep, "").tolist())
+
+    headers = [f"--- PRODUIT {n} ---" for n in range(1, len(df) + 1)]
+    return [header + "".join(row) for header, row in zip(headers, zip(*cells))]
+
+
+def records_to_catalogue_text(records):
+    """
+    Assemble les fiches produits au format texte attendu par les prompts
+    """
+    return CATALOGUE_HEADER + "".join(record + "\n\n" for record in records)
+
+
+def dataframe_to_catalogue_text(df):
+    """
+    Texte structuré du catalogue complet (équivalent de l'ancienne boucle iterrows)
+    """
+    return records_to_catalogue_text(dataframe_to_records(df))
+
+
+def content_hash(data):
+    """
+    Empreinte SHA-256 du contenu d'un fichier chargé, utilisée comme clé de cache
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def parse_excel_catalogue(data):
+    """
+    Lit un catalogue Excel (octets du fichier) et retourne (dataframe, fiches produits, texte)
+    """
+    import pandas as pd
+
+    df_produits = pd.read_excel(io.BytesIO(data))
+    records = dataframe_to_records(df_produits)
+    return df_produits, records, records_to_catalogue_text(records)
+
+
+def parse_pdf_catalogue(data):
+    """
+    Extrait le texte d'un catalogue PDF (octets du fichier).
+    Retourne (texte, nombre de pages, nombre de pages réextraites hors cache).
+    """
+    return extract_pdf_text(data)
@@ -0,0 +1,112 @@
+"""
+Contexte du chat (personas, segments) gardé en session et reconstruit seulement
+quand les données changent, au lieu d'être reconcaténé à chaque message.
+"""
+from persona_core.prompts import Prompt
+
+CHAT_HEADER = "Tu es un expert en marketing bancaire et segmentation client de Société Générale Côte d'Ivoire."
+CHAT_INSTRUCTIONS = (
+    "Utilise les informations ci-dessous (personas, segments, catalogue) pour répondre aux questions. "
+    "Recommande des produits spécifiques avec tarifs quand le catalogue est disponible."
+)
+PERSONA_EXCERPT_CHARS = 2000
+
+
+class ChatContext:
+    """
+    Blocs du prompt système du chat, avec un index id -> segment précalculé.
+
+    set_segments() et set_persona() invalident uniquement la partie concernée ;
+    system_prompt() ne fait qu'assembler des chaînes déjà prêtes. Les consignes, les
+    personas et les segments forment le préfixe, identique d'une question à l'autre ;
+    seule la sélection du catalogue, propre à la question, vient après.
+    """
+
+    def __init__(self, segments=()):
+        self._segments = None
+        self._segments_by_id = {}
+        self._segments_block = ""
+        self._persona_blocks = {}
+        self._personas_block = None
+        self._prefix = None
+        self.set_segments(segments)
+
+    def set_segments(self, segments):
+        """
+        Change la liste des segments (sans effet si c'est déjà la liste courante)
+        """
+        if segments is self._segments:
+            return
+        self._segments = segments
+        self._segments_by_id = {}
+        lines = []
+        for segment in segments:
+            # Le premier segment d'un id l'emporte, comme l'ancienne recherche next(...)
+            self._segments_by_id.setdefault(segment.get("id", -1), segment)
+            lines.append(
+                f"- ID: {segment.get('id')}, Nom: {segment.get('name')}, Âge: {segment.get('age')}, "
+                f"Produits: {segment.get('nbProducts')}, Revenu H: {segment.get('revenueHommes')}, "
+                f"Revenu F: {segment.get('revenueFemmes')}\n"
+            )
+        self._segments_block = "\n\nSEGMENTS:\n" + "".join(lines)
+        # Les noms des personas viennent des segments
+        self._persona_blocks = {
+            persona_id: (content, self._persona_block(persona_id, content))
+            for persona_id, (content, _) in self._persona_blocks.items()
+        }
+        self._personas_block = None
+        self._prefix = None
+
+    def set_persona(self, persona_id, content):
+        """
+        Ajoute ou remplace un persona généré
+        """
+        previous = self._persona_blocks.get(persona_id)
+        if previous is not None and previous[0] is content:
+            return
+        self._persona_blocks[persona_id] = (content, self._persona_block(persona_id, content))
+        self._personas_block = None
+        self._prefix = None
+
+    def set_personas(self, personas):
+        """
+        Remplace tous les personas (dictionnaire id -> contenu)
+        """
+        for persona_id in set(self._persona_blocks) - set(personas):
+            del self._persona_blocks[persona_id]
+            self._personas_block = None
+            self._prefix = None
+        for persona_id, content in personas.items():
+            self.set_persona(persona_id, content)
+
+    def segment_name(self, persona_id):
+        segment = self._segments_by_id.get(persona_id)
+        return segment.get("name", "Unknown") if segment is not None else "Unknown"
+
+    def _persona_block(self, persona_id, content):
+        return f"\n--- Cluster {persona_id}: {self.segment_name(persona_id)} ---\n{content[:PERSONA_EXCERPT_CHARS]}...\n"
+
+    def prefix(self):
+        """
+        Partie du prompt système indépendante de la question (préfixe stable pour le cache de prompt)
+        """
+        if self._prefix is None:
+            if self._personas_block is None:
+                if self._persona_blocks:
+                    self._personas_block = "PERSONAS GÉNÉRÉS:\n" + "".join(
+                        block for _, block in self._persona_blocks.values()
+                    )
+                else:
+                    self._personas_block = "PERSONAS GÉNÉRÉS:\nAucun persona généré."
+            self._prefix = f"{CHAT_HEADER}\n{CHAT_INSTRUCTIONS}\n\n{self._personas_block}\n{self._segments_block}"
+        return self._prefix
+
+    def system_prompt(self, catalogue_products=None):
+        """
+        Prompt système complet ; catalogue_products est la sélection du catalogue pour la question
+        """
+        if catalogue_products:
+            produits_context = f"CATALOGUE PRODUITS (sélection pertinente pour la question):\n{catalogue_products}"
+        else:
+            produits_context = "Note: Aucun catalogue produits chargé."
+        return Prompt(self.prefix(), produits_context)
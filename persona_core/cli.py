@@ -0,0 +1,256 @@
+"""
+Génération des personas en ligne de commande, sans interface Streamlit.
+
+Exemple (planificateur de lots) :
+    python -m persona_core.cli --segments segments.csv --catalogue catalogue.xlsx --output-dir sortie/
+
+Les personas déjà présents dans le dossier de sortie pour le même prompt et le même
+modèle sont conservés : relancer la commande après une interruption reprend le travail
+là où il s'était arrêté.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+import zipfile
+
+from persona_core.backends import create_backend, user_message
+from persona_core.cache import PersonaCache, prompt_key
+from persona_core.catalogue import parse_excel_catalogue, parse_pdf_catalogue
+from persona_core.generation import generate_concurrently, DEFAULT_MAX_IN_FLIGHT
+from persona_core.pdf import generate_persona_pdf
+from persona_core.prompts import build_persona_prompt
+from persona_core.retrieval import CatalogueIndex, segment_query
+from persona_core.scheduler import (
+    RequestScheduler, ScheduledBackend, DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE, DEFAULT_MAX_RETRIES,
+    DEFAULT_DEADLINE
+)
+from persona_core.segments import load_segment_csv, SegmentSchemaError
+from persona_core.telemetry import InstrumentedBackend, TelemetryRecorder
+
+OUTPUT_FORMATS = ("txt", "pdf", "json")
+
+
+def load_segments(path):
+    """
+    Lit le CSV des segments (une ligne par segment, colonnes id et name obligatoires)
+    """
+    try:
+        table, _, _, warnings = load_segment_csv(path)
+    except SegmentSchemaError as e:
+        raise SegmentSchemaError(f"{path}: {e}")
+    for warning in warnings:
+        print(f"{path}: {warning}", file=sys.stderr)
+    return list(table)
+
+
+def catalogue_errors():
+    """
+    Erreurs d'un catalogue illisible : fichier absent, Excel corrompu (zip invalide,
+    ValueError de pandas) ou PDF corrompu (erreurs PyPDF2)
+    """
+    from PyPDF2.errors import PyPdfError
+
+    return OSError, ValueError, zipfile.BadZipFile, PyPdfError
+
+
+def load_catalogue_index(path):
+    """
+    Construit l'index de recherche du catalogue produits (Excel ou PDF)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if path.lower().endswith(".pdf"):
+        pdf_text, _, _ = parse_pdf_catalogue(data)
+        return CatalogueIndex.from_text(pdf_text)
+
+    _, records, catalogue_text = parse_excel_catalogue(data)
+    return CatalogueIndex(catalogue_text, records)
+
+
+def _write_atomic(path, data):
+    mode = "wb" if isinstance(data, bytes) else "w"
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, mode, **({} if mode == "wb" else {"encoding": "utf-8"})) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def is_done(output_dir, segment_id, prompt_hash, formats):
+    """
+    Vrai si le persona a déjà été écrit pour ce prompt (reprise d'un lot interrompu)
+    """
+    json_path = os.path.join(output_dir, f"persona_cluster_{segment_id}.json")
+    try:
+        with open(json_path, encoding="utf-8") as f:
+            previous = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return False
+
+    if previous.get("prompt_hash") != prompt_hash:
+        return False
+    return all(
+        os.path.exists(os.path.join(output_dir, f"persona_cluster_{segment_id}.{fmt}"))
+        for fmt in formats
+    )
+
+
+def write_outputs(output_dir, segment, content, model, prompt_hash, formats):
+    """
+    Écrit le persona aux formats demandés. Le JSON est écrit en dernier : il marque
+    le segment comme terminé pour la reprise.
+    """
+    segment_id = segment.get("id")
+    base = os.path.join(output_dir, f"persona_cluster_{segment_id}")
+
+    if "txt" in formats:
+        _write_atomic(f"{base}.txt", content)
+    if "pdf" in formats:
+        pdf_buffer = generate_persona_pdf(segment_id, content, segment.get("name", "Unknown"))
+        _write_atomic(f"{base}.pdf", pdf_buffer.getvalue())
+
+    record = {
+        "id": segment_id,
+        "name": segment.get("name"),
+        "model": model,
+        "prompt_hash": prompt_hash,
+        "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "segment": segment,
+        "content": content,
+    }
+    _write_atomic(f"{base}.json", json.dumps(record, ensure_ascii=False, indent=2, default=str))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m persona_core.cli",
+        description="Génère les personas marketing de tous les segments d'un CSV."
+    )
+    parser.add_argument("--segments", required=True, help="CSV des segments (colonnes id, name, age, ...)")
+    parser.add_argument("--catalogue", help="Catalogue produits (.xlsx, .xls ou .pdf)")
+    parser.add_argument("--output-dir", required=True, help="Dossier de sortie des personas")
+    parser.add_argument(
+        "--backend",
+        choices=["socgenai", "openai", "langchain-openai", "fake"],
+        default="socgenai",
+        help="Client LLM à utiliser (fake : backend local sans réseau)"
+    )
+    parser.add_argument("--model", default="gpt-4o-mini", help="Modèle OpenAI, ou profil de latence du backend fake")
+    parser.add_argument("--formats", default="txt,pdf,json", help="Formats de sortie parmi txt,pdf,json")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT, help="Appels LLM simultanés")
+    parser.add_argument("--rpm", type=int, default=DEFAULT_REQUESTS_PER_MINUTE, help="Limite de requêtes par minute du fournisseur")
+    parser.add_argument("--tpm", type=int, default=DEFAULT_TOKENS_PER_MINUTE, help="Limite de tokens par minute du fournisseur")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES, help="Nouvelles tentatives sur erreur transitoire")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE, help="Échéance par appel LLM, en secondes")
+    parser.add_argument("--force", action="store_true", help="Régénère tout, sans reprise ni cache")
+    parser.add_argument("--no-cache", action="store_true", help="N'utilise pas le cache disque des personas")
+    parser.add_argument("--telemetry-csv", help="Écrit le détail des appels LLM (tokens, latences, cache) en CSV")
+    parser.add_argument("--metrics", help="Écrit les métriques au format texte Prometheus (textfile collector)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    formats = [fmt.strip() for fmt in args.formats.split(",") if fmt.strip()]
+    unknown = set(formats) - set(OUTPUT_FORMATS)
+    if unknown:
+        print(f"Formats inconnus: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+    if "json" not in formats:
+        # Le JSON sert de marqueur de reprise
+        formats.append("json")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    try:
+        segments = load_segments(args.segments)
+    except (SegmentSchemaError, OSError) as e:
+        print(f"Segments: {e}", file=sys.stderr)
+        return 2
+    try:
+        catalogue_index = load_catalogue_index(args.catalogue) if args.catalogue else None
+    except catalogue_errors() as e:
+        print(f"Catalogue {args.catalogue}: {e}", file=sys.stderr)
+        return 2
+    telemetry = TelemetryRecorder()
+    scheduler = RequestScheduler(args.rpm, args.tpm, max_retries=args.max_retries, deadline=args.deadline)
+    backend = ScheduledBackend(InstrumentedBackend(create_backend(args.backend, model=args.model), telemetry), scheduler)
+    model = backend.model_name
+
+    jobs = []
+    skipped = 0
+    segments_by_id = {}
+    for segment in segments:
+        shared, products = catalogue_index.persona_catalogue(segment_query(segment)) if catalogue_index else (None, None)
+        prompt = build_persona_prompt(segment, products, shared)
+        prompt_hash = prompt_key(model, prompt)
+
+        if not args.force and is_done(args.output_dir, segment["id"], prompt_hash, formats):
+            skipped += 1
+            continue
+
+        segments_by_id[segment["id"]] = (segment, prompt_hash)
+        jobs.append((segment["id"], (segment["id"], prompt)))
+
+    print(f"{len(segments)} segment(s), {skipped} déjà généré(s), {len(jobs)} à générer", file=sys.stderr)
+
+    persona_cache = None if args.no_cache else PersonaCache()
+
+    def worker(job):
+        segment_id, prompt = job
+        label = f"Cluster {segment_id}"
+        if persona_cache is None:
+            return backend.complete(user_message(prompt), label=label)
+        content, from_cache = persona_cache.get_or_generate(
+            model, prompt, lambda: backend.complete(user_message(prompt), label=label), args.force
+        )
+        if from_cache:
+            backend.record_cache_hit(user_message(prompt), content, label)
+        return content
+
+    start = time.perf_counter()
+    failures = 0
+    for done, (segment_id, content, error) in enumerate(generate_concurrently(jobs, worker, args.max_in_flight), start=1):
+        segment, prompt_hash = segments_by_id[segment_id]
+        if error is None and not content:
+            error = "résultat vide"
+        if error is None:
+            try:
+                write_outputs(args.output_dir, segment, content, model, prompt_hash, formats)
+            except Exception as e:
+                # Disque plein, rendu PDF impossible... : le segment échoue, le lot continue
+                error = f"écriture impossible: {e}"
+        if error is None:
+            print(f"[{done}/{len(jobs)}] Cluster {segment_id} généré", file=sys.stderr)
+        else:
+            failures += 1
+            print(f"[{done}/{len(jobs)}] Cluster {segment_id} en échec: {error}", file=sys.stderr)
+
+    print(f"Terminé en {time.perf_counter() - start:.1f} s, {failures} échec(s)", file=sys.stderr)
+
+    stats = telemetry.summary()
+    print(
+        f"{stats['calls']} appel(s) LLM dont {stats['cache_hits']} depuis le cache, "
+        f"{stats['prompt_tokens']} tokens envoyés, {stats['completion_tokens']} reçus, "
+        f"coût estimé {stats['cost_usd']:.4f} $, latence p50 {stats['latency_p50']:.1f} s",
+        file=sys.stderr
+    )
+    scheduler_stats = scheduler.metrics()
+    print(
+        f"{scheduler_stats['retries']} nouvelle(s) tentative(s), {scheduler_stats['rate_limited']} limite(s) 429, "
+        f"{scheduler_stats['throttle_seconds'] + scheduler_stats['backoff_seconds']:.1f} s d'attente",
+        file=sys.stderr
+    )
+    if args.telemetry_csv:
+        _write_atomic(args.telemetry_csv, telemetry.to_csv())
+    if args.metrics:
+        _write_atomic(args.metrics, telemetry.to_prometheus() + scheduler.to_prometheus())
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Export groupé des personas : rendu des PDF dans un pool de processus, puis une archive
+ZIP ou un PDF unique avec sommaire.
+"""
+import io
+import os
+import zipfile
+
+from persona_core.pdf import generate_persona_pdf, generate_toc_pdf
+
+# En dessous, le démarrage du pool (~1,5 s : processus "spawn" et import de reportlab dans
+# chacun) coûte plus que le rendu lui-même (~30 ms par persona) : rendu dans le processus
+MIN_PERSONAS_FOR_POOL = 50
+PERSONAS_PER_TASK = 4
+
+
+def _render_batch(items):
+    """
+    Tâche du pool : rend une liste de (persona_id, contenu, nom du segment)
+    """
+    return [
+        (persona_id, generate_persona_pdf(persona_id, content, segment_name).getvalue())
+        for persona_id, content, segment_name in items
+    ]
+
+
+def render_persona_pdfs(items, max_workers=None):
+    """
+    Rend les PDF de plusieurs personas. items : liste de (persona_id, contenu, nom du segment).
+    Produit les couples (persona_id, octets du PDF) dans l'ordre de items.
+    """
+    items = list(items)
+    workers = min(max_workers or os.cpu_count() or 1, -(-len(items) // PERSONAS_PER_TASK))
+    if len(items) < MIN_PERSONAS_FOR_POOL or workers <= 1:
+        for item in items:
+            yield from _render_batch([item])
+        return
+
+    # Importés seulement pour un export assez gros pour justifier un pool
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    batches = [items[i:i + PERSONAS_PER_TASK] for i in range(0, len(items), PERSONAS_PER_TASK)]
+    # "spawn" : pas de fork d'un serveur Streamlit multi-thread
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # map() rend les lots dans l'ordre : chacun est écrit dès qu'il est prêt
+        for batch_result in pool.map(_render_batch, batches):
+            yield from batch_result
+
+
+def personas_zip(items, include_txt=True, max_workers=None):
+    """
+    Archive ZIP des personas (PDF, et TXT si include_txt), retournée en octets
+    """
+    items = list(items)
+    contents = {persona_id: content for persona_id, content, _ in items}
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for persona_id, pdf_bytes in render_persona_pdfs(items, max_workers):
+            # Les PDF sont déjà compressés : stockés tels quels
+            archive.writestr(f"persona_cluster_{persona_id}.pdf", pdf_bytes, compress_type=zipfile.ZIP_STORED)
+            if include_txt:
+                archive.writestr(
+                    f"persona_cluster_{persona_id}.txt", contents[persona_id], compress_type=zipfile.ZIP_DEFLATED
+                )
+    return buffer.getvalue()
+
+
+def merged_personas_pdf(items, max_workers=None):
+    """
+    PDF unique : sommaire (avec numéros de page) puis chaque persona, et un signet par persona
+    """
+    from PyPDF2 import PdfReader, PdfWriter
+
+    items = list(items)
+    names = {persona_id: segment_name for persona_id, _, segment_name in items}
+    readers = [(persona_id, PdfReader(io.BytesIO(pdf_bytes))) for persona_id, pdf_bytes in render_persona_pdfs(items, max_workers)]
+
+    # Le sommaire décale les numéros de page : on le reconstruit tant que sa longueur change
+    toc_pages = 1
+    while True:
+        entries = []
+        page = toc_pages + 1
+        for persona_id, reader in readers:
+            entries.append((persona_id, names[persona_id], page))
+            page += len(reader.pages)
+        toc = PdfReader(io.BytesIO(generate_toc_pdf(entries).getvalue()))
+        if len(toc.pages) == toc_pages:
+            break
+        toc_pages = len(toc.pages)
+
+    writer = PdfWriter()
+    for toc_page in toc.pages:
+        writer.add_page(toc_page)
+    for (persona_id, reader), (_, segment_name, first_page) in zip(readers, entries):
+        for pdf_page in reader.pages:
+            writer.add_page(pdf_page)
+        writer.add_outline_item(f"Cluster {persona_id}: {segment_name}", first_page - 1)
+
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
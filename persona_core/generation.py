@@ -0,0 +1,31 @@
+"""
+Génération par lot dans le thread appelant. Les applications Streamlit passent par
+persona_core.jobs (lots en arrière-plan qui survivent aux reruns) et n'utilisent plus que
+DEFAULT_MAX_IN_FLIGHT ; generate_concurrently sert à la CLI (persona_core.cli) et aux benchmarks.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Nombre d'appels LLM simultanés par défaut pour la génération par lot
+DEFAULT_MAX_IN_FLIGHT = 4
+
+
+def generate_concurrently(jobs, worker, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """
+    Exécute worker(payload) pour chaque couple (clé, payload) de jobs avec au plus
+    max_in_flight appels simultanés.
+
+    Produit des triplets (clé, résultat, erreur) au fur et à mesure que les appels
+    se terminent : le thread appelant garde la main pour afficher la progression.
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, int(max_in_flight)))
+    try:
+        futures = {executor.submit(worker, payload): key for key, payload in jobs}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                yield key, future.result(), None
+            except Exception as e:
+                yield key, None, e
+    finally:
+        # Si l'appelant abandonne le générateur, ne pas bloquer sur les appels restants
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,145 @@
+"""
+Historique du chat borné en tokens : les derniers échanges sont envoyés tels quels,
+les plus anciens sont repliés dans un résumé glissant calculé en arrière-plan.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from persona_core.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+# Budget de l'historique envoyé au LLM (résumé + messages récents), en tokens
+DEFAULT_HISTORY_BUDGET = 4000
+# Nombre de messages récents jamais résumés
+DEFAULT_KEEP_RECENT = 6
+# Le résumé est lancé avant d'atteindre le budget pour être prêt quand il le sera
+COMPACT_THRESHOLD = 0.75
+
+SUMMARY_INSTRUCTIONS = """Tu résumes une conversation entre un analyste marketing et un assistant \
+expert en personas bancaires de Société Générale Côte d'Ivoire.
+Intègre le résumé précédent et les nouveaux échanges en un seul résumé factuel : questions posées,
+personas et segments discutés, produits recommandés, décisions et points en suspens.
+Réponds uniquement par le résumé, en {max_words} mots maximum."""
+
+# Partagé par toutes les sessions : le résumé ne bloque jamais le script Streamlit
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+
+
+def _message_tokens(message):
+    # Quelques tokens de structure par message (rôle, séparateurs)
+    return estimate_tokens(message["content"]) + 4
+
+
+class ChatHistoryManager:
+    """
+    Construit les messages d'historique à envoyer au LLM dans un budget de tokens.
+
+    L'historique complet (st.session_state.conversation_history) reste intact pour
+    l'affichage ; le gestionnaire retient seulement combien de messages sont déjà
+    couverts par le résumé.
+    """
+
+    def __init__(self, budget_tokens=DEFAULT_HISTORY_BUDGET, keep_recent=DEFAULT_KEEP_RECENT):
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.summary = ""
+        self.summarized_count = 0
+        self.last_error = None
+        self._pending = None
+        self._lock = threading.Lock()
+
+    @property
+    def summary_budget(self):
+        return self.budget_tokens // 4
+
+    def _state(self, history):
+        with self._lock:
+            if self.summarized_count > len(history):
+                # Historique effacé ou remplacé : on repart de zéro
+                self.summary, self.summarized_count = "", 0
+            return self.summary, self.summarized_count
+
+    def messages_for(self, history):
+        """
+        Messages à placer après le prompt système : résumé éventuel puis échanges récents,
+        du plus récent au plus ancien tant que le budget le permet (le dernier est toujours gardé)
+        """
+        summary, summarized_count = self._state(history)
+        recent = [m for m in history[summarized_count:] if m["role"] in ("user", "assistant")]
+
+        summary_message = None
+        remaining = self.budget_tokens
+        if summary:
+            summary_message = {"role": "system", "content": f"Résumé de la conversation précédente :\n{summary}"}
+            remaining -= _message_tokens(summary_message)
+
+        kept = []
+        for message in reversed(recent):
+            cost = _message_tokens(message)
+            if kept and cost > remaining:
+                break
+            kept.append({"role": message["role"], "content": message["content"]})
+            remaining -= cost
+        kept.reverse()
+
+        # Question restée sans réponse (réponse interrompue) : fusionnée avec la suivante
+        merged = []
+        for message in kept:
+            if merged and merged[-1]["role"] == message["role"]:
+                merged[-1]["content"] += "\n\n" + message["content"]
+            else:
+                merged.append(message)
+
+        return ([summary_message] if summary_message else []) + merged
+
+    def compact(self, history, backend):
+        """
+        Lance en arrière-plan le repli des anciens messages dans le résumé si la partie
+        non résumée approche du budget. Retourne le Future, ou None si rien à faire.
+        """
+        with self._lock:
+            if self._pending is not None and not self._pending.done():
+                return None
+        summary, summarized_count = self._state(history)
+
+        unsummarized = history[summarized_count:]
+        if sum(_message_tokens(m) for m in unsummarized) + estimate_tokens(summary) <= self.budget_tokens * COMPACT_THRESHOLD:
+            return None
+
+        fold_until = len(history) - self.keep_recent
+        if fold_until <= summarized_count:
+            return None
+
+        # Copie : le thread de résumé ne touche ni à st.session_state ni à la liste de la session
+        to_fold = [dict(m) for m in history[summarized_count:fold_until] if m["role"] in ("user", "assistant")]
+        future = _summary_executor.submit(self._summarize, backend, summary, to_fold, self.summary_budget)
+
+        def apply(done):
+            with self._lock:
+                try:
+                    new_summary = done.result()
+                except Exception as e:
+                    self.last_error = e
+                    return
+                # Ignore un résultat devenu obsolète (historique effacé entre-temps)
+                if self.summarized_count == summarized_count:
+                    self.summary = new_summary
+                    self.summarized_count = fold_until
+                    self.last_error = None
+
+        with self._lock:
+            self._pending = future
+        future.add_done_callback(apply)
+        return future
+
+    @staticmethod
+    def _summarize(backend, previous_summary, messages, max_tokens):
+        transcript = "\n".join(
+            f"{'Analyste' if m['role'] == 'user' else 'Assistant'}: {m['content']}" for m in messages
+        )
+        content = f"RÉSUMÉ PRÉCÉDENT:\n{previous_summary or '(aucun)'}\n\nNOUVEAUX ÉCHANGES:\n{transcript}"
+        summary = backend.complete([
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS.format(max_words=max_tokens * 3 // 4)},
+            {"role": "user", "content": content},
+        ], max_tokens=max_tokens, label="Résumé de l'historique")
+        # Le résumé reste dans son budget même si le modèle déborde
+        return summary.strip()[:max_tokens * CHARS_PER_TOKEN]
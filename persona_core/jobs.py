@@ -0,0 +1,186 @@
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Threads du pool partagé par toutes les sessions du serveur (le débit vers le fournisseur
+# reste limité par l'ordonnanceur, chaque lot par son propre max_in_flight)
+DEFAULT_JOB_WORKERS = int(os.environ.get("PERSONA_JOB_WORKERS", "16"))
+# Lots terminés conservés en mémoire pour les sessions qui n'ont pas encore relu leurs résultats
+DEFAULT_KEEP_BATCHES = 64
+
+PENDING = "en attente"
+RUNNING = "en cours"
+DONE = "terminé"
+FAILED = "échec"
+CANCELLED = "annulé"
+
+
+class Job:
+    """
+    Une génération d'un lot : état, résultat ou erreur, texte partiel si le worker diffuse en streaming
+    """
+
+    def __init__(self, key, payload):
+        self.key = key
+        self.payload = payload
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.chunks = []
+        self.started_at = None
+        self.finished_at = None
+
+    def append(self, chunk):
+        """
+        Ajoute un fragment du texte en cours de génération (appelé depuis le worker)
+        """
+        self.chunks.append(chunk)
+
+    @property
+    def partial(self):
+        return "".join(self.chunks)
+
+
+class JobBatch:
+    """
+    Lot de jobs soumis ensemble ; au plus max_in_flight d'entre eux s'exécutent à la fois.
+    completed liste les jobs terminés (succès ou échec) dans l'ordre de fin : une session
+    relit les nouveaux résultats à partir du nombre qu'elle a déjà traités.
+    """
+
+    def __init__(self, batch_id, jobs, worker, max_in_flight):
+        self.id = batch_id
+        self.jobs = OrderedDict((key, Job(key, payload)) for key, payload in jobs)
+        self.worker = worker
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.pending = deque(self.jobs.values())
+        self.running = 0
+        self.completed = []
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.finished_at is not None
+
+    def counts(self):
+        """
+        Nombre de jobs par état
+        """
+        counts = dict.fromkeys((PENDING, RUNNING, DONE, FAILED, CANCELLED), 0)
+        for job in list(self.jobs.values()):
+            counts[job.status] += 1
+        return counts
+
+    def running_jobs(self):
+        return [job for job in list(self.jobs.values()) if job.status == RUNNING]
+
+
+class JobQueue:
+    """
+    Pool de threads qui exécute les lots de générations hors du script Streamlit : un rerun
+    (clic, changement d'onglet) ou la fermeture de la page n'interrompt pas les jobs en cours.
+    Destiné à être partagé par toutes les sessions (st.cache_resource).
+    """
+
+    def __init__(self, max_workers=DEFAULT_JOB_WORKERS, keep_batches=DEFAULT_KEEP_BATCHES):
+        self.keep_batches = keep_batches
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="persona-job")
+        self._lock = threading.Lock()
+        self._batches = OrderedDict()
+        self._ids = itertools.count(1)
+        self._metrics = {"batches": 0, "jobs": 0, "done": 0, "failed": 0, "cancelled": 0}
+
+    def submit(self, jobs, worker, max_in_flight=1):
+        """
+        Soumet un lot de couples (clé, payload) et retourne son identifiant.
+        worker(payload, job) s'exécute dans le pool : il ne doit pas accéder à st.session_state,
+        il peut publier son texte partiel avec job.append().
+        """
+        with self._lock:
+            batch = JobBatch(str(next(self._ids)), jobs, worker, max_in_flight)
+            self._batches[batch.id] = batch
+            self._metrics["batches"] += 1
+            self._metrics["jobs"] += len(batch.jobs)
+            self._evict()
+            self._start_next(batch)
+        return batch.id
+
+    def batch(self, batch_id):
+        """
+        Lot correspondant à l'identifiant, ou None s'il a été évincé
+        """
+        with self._lock:
+            return self._batches.get(batch_id)
+
+    def cancel(self, batch_id):
+        """
+        Annule les jobs pas encore démarrés ; ceux en cours vont à leur terme
+        """
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                return 0
+            cancelled = len(batch.pending)
+            for job in batch.pending:
+                job.status = CANCELLED
+            batch.pending.clear()
+            self._metrics["cancelled"] += cancelled
+            self._start_next(batch)
+            return cancelled
+
+    def metrics(self):
+        """
+        Compteurs cumulés (lots, jobs, terminés, échecs, annulés) et jobs en cours ou en attente
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["running"] = sum(batch.running for batch in self._batches.values())
+            metrics["pending"] = sum(len(batch.pending) for batch in self._batches.values())
+            return metrics
+
+    def shutdown(self, wait=True):
+        """
+        Annule les jobs en attente et arrête le pool
+        """
+        for batch_id in list(self._batches):
+            self.cancel(batch_id)
+        self._executor.shutdown(wait=wait)
+
+    def _start_next(self, batch):
+        # Appelé sous verrou : démarre des jobs du lot jusqu'à sa limite de parallélisme
+        while batch.pending and batch.running < batch.max_in_flight:
+            job = batch.pending.popleft()
+            batch.running += 1
+            self._executor.submit(self._run, batch, job)
+        if not batch.pending and batch.running == 0 and batch.finished_at is None:
+            batch.finished_at = time.time()
+
+    def _run(self, batch, job):
+        job.started_at = time.time()
+        job.status = RUNNING
+        try:
+            result = batch.worker(job.payload, job)
+        except Exception as e:
+            job.error = e
+            status = FAILED
+        else:
+            job.result = result
+            status = DONE
+
+        with self._lock:
+            job.finished_at = time.time()
+            job.status = status
+            batch.completed.append(job)
+            batch.running -= 1
+            self._metrics["done" if status == DONE else "failed"] += 1
+            self._start_next(batch)
+
+    def _evict(self):
+        # Appelé sous verrou : oublie les lots terminés les plus anciens au-delà de keep_batches
+        finished = [batch_id for batch_id, batch in self._batches.items() if batch.done]
+        for batch_id in finished[:max(0, len(self._batches) - self.keep_batches)]:
+            del self._batches[batch_id]
@@ -0,0 +1,267 @@
+"""
+Rendu PDF des personas. reportlab n'est importé qu'au premier rendu : les applications
+importent ce module (clé de cache des PDF) sans payer ce chargement au démarrage.
+"""
+import hashlib
+import io
+import re
+from functools import lru_cache
+from html import escape as _html_escape
+
+# À incrémenter à chaque changement de mise en page : invalide les PDF mis en cache
+STYLE_VERSION = 3
+
+FOOTER_TEXT = "Généré par le Générateur de Personas Marketing - Société Générale Côte d'Ivoire"
+
+# Puce par niveau d'imbrication (au-delà du dernier, alignées sur lui) ; glyphes des polices standard PDF
+BULLET_SYMBOLS = ("•", "–", "·")
+LIST_INDENT = 16
+
+
+def persona_pdf_key(persona_id, persona_content, segment_name):
+    """
+    Clé de cache du PDF d'un persona : contenu, nom du segment et version des styles
+    """
+    digest = hashlib.sha256()
+    for part in (str(STYLE_VERSION), str(persona_id), segment_name or "", persona_content):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def pdf_styles():
+    """
+    Registre des styles, construit une seule fois par processus (les styles ne sont jamais modifiés)
+    """
+    from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER, TA_LEFT
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    base = getSampleStyleSheet()
+    styles = {
+        "title": ParagraphStyle(
+            'CustomTitle',
+            parent=base['Heading1'],
+            fontSize=24,
+            textColor='#d32f2f',
+            spaceAfter=30,
+            alignment=TA_CENTER
+        ),
+        "heading": ParagraphStyle(
+            'CustomHeading',
+            parent=base['Heading2'],
+            fontSize=16,
+            textColor='#b71c1c',
+            spaceAfter=12,
+            spaceBefore=12
+        ),
+        "normal": ParagraphStyle(
+            'CustomNormal',
+            parent=base['Normal'],
+            fontSize=11,
+            alignment=TA_JUSTIFY,
+            spaceAfter=10
+        ),
+        "footer": ParagraphStyle(
+            'Footer',
+            parent=base['Normal'],
+            fontSize=9,
+            textColor='gray',
+            alignment=TA_CENTER
+        ),
+        "toc_entry": ParagraphStyle(
+            'TocEntry',
+            parent=base['Normal'],
+            fontSize=11
+        ),
+    }
+    # Listes : la puce fait partie du texte, retrait par niveau d'imbrication, alignées à gauche.
+    # Ni retrait négatif sous la puce ni justification : deux déplacements du curseur et un
+    # espacement des mots de plus par ligne dans le flux PDF ; bulletText coûte une seconde
+    # analyse de balisage par élément (mesuré avec bench_pdf)
+    for depth in range(len(BULLET_SYMBOLS)):
+        for kind in ("bullet", "number"):
+            styles[f"{kind}_{depth}"] = ParagraphStyle(
+                f'Custom{kind.title()}{depth}',
+                parent=styles["normal"],
+                alignment=TA_LEFT,
+                leftIndent=LIST_INDENT * depth,
+                spaceAfter=4
+            )
+    return styles
+
+
+def escape(text):
+    # Comme xml.sax.saxutils.escape (&, <, >), dont l'import charge urllib au démarrage
+    return _html_escape(text, quote=False)
+
+
+# Marqueurs de début de ligne : puce ("- texte") et élément numéroté ("1. texte", "2) texte")
+BULLET_MARKERS = "-*+•"
+_NUMBER_RE = re.compile(r"(\d{1,3})[.)][ \t]+")
+# Ligne entièrement en gras : titre de section dans les réponses du LLM
+_BOLD_LINE_RE = re.compile(r"\*\*([^*]+)\*\*:?")
+_INLINE_RE = re.compile(
+    r"\*\*\*(?P<bold_italic>[^*\s](?:[^*]*[^*\s])?)\*\*\*|___(?P<bold_italic2>[^_\s](?:[^_]*[^_\s])?)___"
+    r"|\*\*(?P<bold>.+?)\*\*|__(?P<bold2>.+?)__"
+    r"|(?<![\w*])\*(?P<italic>[^*\s](?:[^*]*[^*\s])?)\*(?![\w*])"
+    r"|(?<!\w)_(?P<italic2>[^_\s](?:[^_]*[^_\s])?)_(?!\w)"
+    r"|`(?P<code>[^`]+)`"
+)
+_MARKUP_CHARS_RE = re.compile(r"[*_`]")
+# Texte à convertir avant reportlab : markdown en ligne ou caractères à échapper
+_NEEDS_MARKUP_RE = re.compile(r"[*_`&<>]")
+
+
+def _inline_markup(text):
+    """
+    Gras, italique et code en ligne convertis en balises reportlab ; le reste est échappé
+    """
+    if not _MARKUP_CHARS_RE.search(text):
+        return escape(text)
+    parts = []
+    position = 0
+    for match in _INLINE_RE.finditer(text):
+        parts.append(escape(text[position:match.start()]))
+        if match.group("bold_italic") is not None or match.group("bold_italic2") is not None:
+            parts.append(f"<b><i>{escape(match.group('bold_italic') or match.group('bold_italic2'))}</i></b>")
+        elif match.group("bold") is not None or match.group("bold2") is not None:
+            parts.append(f"<b>{_inline_markup(match.group('bold') or match.group('bold2'))}</b>")
+        elif match.group("code") is not None:
+            parts.append(f'<font face="Courier">{escape(match.group("code"))}</font>')
+        else:
+            parts.append(f"<i>{escape(match.group('italic') or match.group('italic2'))}</i>")
+        position = match.end()
+    parts.append(escape(text[position:]))
+    return "".join(parts)
+
+
+def _list_depth(line, text):
+    # Niveau d'imbrication d'un élément de liste : 2 espaces (ou une tabulation) par niveau
+    if len(line) == len(text):
+        return 0
+    indent = line[:len(line) - len(text)]
+    return min(len(indent.expandtabs(4)) // 2, len(BULLET_SYMBOLS) - 1)
+
+
+def markdown_to_flowables(markdown_text, styles=None):
+    """
+    Convertit le markdown d'un persona en flowables reportlab, en une passe sur les lignes.
+    La ligne est classée par son premier caractère ; les lignes sans markdown en ligne ni
+    caractère à échapper (la grande majorité) sont passées telles quelles à Paragraph.
+    """
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, Spacer
+
+    styles = styles or pdf_styles()
+    heading_style, normal_style = styles["heading"], styles["normal"]
+    bullet_styles = [styles[f"bullet_{depth}"] for depth in range(len(BULLET_SYMBOLS))]
+    number_styles = [styles[f"number_{depth}"] for depth in range(len(BULLET_SYMBOLS))]
+
+    story = []
+    for raw_line in markdown_text.split("\n"):
+        line = raw_line.rstrip()
+        text = line.lstrip(" \t")
+        if not text:
+            story.append(Spacer(1, 0.3*cm))
+            continue
+
+        first = text[0]
+        number = _NUMBER_RE.match(text) if first.isdigit() else None
+        if first == "#":
+            text, style = text.strip("# \t"), heading_style
+        elif first in BULLET_MARKERS and text[1:2] in (" ", "\t"):
+            depth = _list_depth(line, text)
+            text = BULLET_SYMBOLS[depth] + " " + text[2:].lstrip(" \t")
+            style = bullet_styles[depth]
+        elif number:
+            depth = _list_depth(line, text)
+            text = f"{number.group(1)}. {text[number.end():]}"
+            style = number_styles[depth]
+        elif first == "*" and _BOLD_LINE_RE.fullmatch(text):
+            text, style = text.rstrip(":").strip("*"), heading_style
+        else:
+            style = normal_style
+
+        if _NEEDS_MARKUP_RE.search(text):
+            text = _inline_markup(text)
+        story.append(Paragraph(text, style))
+    return story
+
+
+def _document(buffer):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate
+
+    return SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=2*cm,
+        leftMargin=2*cm,
+        topMargin=2*cm,
+        bottomMargin=2*cm
+    )
+
+
+def generate_persona_pdf(persona_id, persona_content, segment_name):
+    """
+    Génère un PDF formaté pour un persona
+    """
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, Spacer
+
+    buffer = io.BytesIO()
+    doc = _document(buffer)
+    styles = pdf_styles()
+
+    # Titre
+    story = [
+        Paragraph("PERSONA MARKETING", styles["title"]),
+        Paragraph(escape(f"Cluster {persona_id}: {segment_name}"), styles["heading"]),
+        Spacer(1, 0.5*cm),
+    ]
+
+    # Contenu markdown du persona
+    story.extend(markdown_to_flowables(persona_content, styles))
+
+    # Footer
+    story.append(Spacer(1, 1*cm))
+    story.append(Paragraph(FOOTER_TEXT, styles["footer"]))
+
+    doc.build(story)
+
+    buffer.seek(0)
+    return buffer
+
+
+def generate_toc_pdf(entries):
+    """
+    Génère le sommaire d'un export groupé : entries est une liste de (persona_id, nom du segment, page)
+    """
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, Table, TableStyle
+
+    buffer = io.BytesIO()
+    doc = _document(buffer)
+    styles = pdf_styles()
+
+    rows = [
+        [Paragraph(escape(f"Cluster {persona_id}: {segment_name}"), styles["toc_entry"]), str(page)]
+        for persona_id, segment_name, page in entries
+    ]
+    table = Table(rows, colWidths=[doc.width - 2*cm, 2*cm])
+    table.setStyle(TableStyle([
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LINEBELOW', (0, 0), (-1, -1), 0.25, '#e0e0e0'),
+    ]))
+
+    story = [
+        Paragraph("PERSONAS MARKETING - SOMMAIRE", styles["title"]),
+        table,
+    ]
+    doc.build(story)
+
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,206 @@
+import hashlib
+import io
+import os
+import time
+
+from persona_core.cache import DEFAULT_TTL_SECONDS, DEFAULT_MAX_BYTES
+
+# Cache disque du texte extrait, une entrée par page (clé : empreinte du contenu de la page)
+DEFAULT_PAGE_CACHE_DIR = os.environ.get(
+    "PERSONA_PAGE_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "chatbot_persona", "pdf_pages")
+)
+
+# En dessous de ce nombre de pages à extraire, le démarrage d'un pool coûte plus qu'il ne rapporte
+MIN_PAGES_FOR_POOL = 24
+PAGES_PER_TASK = 8
+
+
+def _extractor_version():
+    import PyPDF2
+    return f"PyPDF2-{PyPDF2.__version__}"
+
+
+def _object_digest(obj, memo, pending=()):
+    """
+    Empreinte du contenu d'un objet PDF : références indirectes résolues, dictionnaires
+    triés, données décodées des flux. memo garde l'empreinte des objets indirects déjà
+    vus (polices et images partagées par plusieurs pages ne sont lues qu'une fois).
+    """
+    from PyPDF2.generic import IndirectObject
+
+    if isinstance(obj, IndirectObject):
+        ref = (obj.idnum, obj.generation)
+        if ref in pending:
+            # Cycle (ressources d'un formulaire qui se référencent) : déjà couvert par l'ancêtre
+            return b"cycle"
+        if ref not in memo:
+            memo[ref] = _object_digest(obj.get_object(), memo, pending + (ref,))
+        return memo[ref]
+
+    digest = hashlib.sha256()
+    if isinstance(obj, dict):
+        digest.update(b"dict")
+        for name, value in sorted(obj.items()):
+            digest.update(str(name).encode("utf-8"))
+            digest.update(_object_digest(value, memo, pending))
+        if hasattr(obj, "get_data"):
+            digest.update(b"stream")
+            digest.update(obj.get_data())
+    elif isinstance(obj, list):
+        digest.update(b"array")
+        for value in obj:
+            digest.update(_object_digest(value, memo, pending))
+    else:
+        digest.update(f"{type(obj).__name__}:{obj!r}".encode("utf-8"))
+    return digest.digest()
+
+
+def page_fingerprint(page, salt="", memo=None):
+    """
+    Empreinte d'une page : flux de contenu, ressources complètes (polices, encodages,
+    XObjects et leurs flux) et dimensions. Deux pages d'empreinte identique donnent le
+    même texte extrait.
+    """
+    memo = {} if memo is None else memo
+    digest = hashlib.sha256(salt.encode("utf-8"))
+
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+
+    resources = page.get("/Resources")
+    if resources is not None:
+        digest.update(_object_digest(resources, memo))
+
+    digest.update(repr([float(v) for v in page.mediabox]).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PageTextCache:
+    """
+    Cache fichier du texte des pages, partagé entre processus (un fichier par empreinte).
+    Comme PersonaCache : les pages non relues depuis max_age_seconds sont supprimées et
+    les moins récemment utilisées sont évincées au-delà de max_bytes (voir prune).
+    """
+
+    def __init__(self, directory=DEFAULT_PAGE_CACHE_DIR, max_age_seconds=DEFAULT_TTL_SECONDS,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.txt")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            # La date de modification sert de date de dernier accès pour l'éviction
+            os.utime(path)
+        except OSError:
+            pass
+        return text
+
+    def put(self, key, text):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Écriture atomique : un autre processus ne lit jamais un fichier partiel
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def prune(self, now=None):
+        """
+        Supprime les fichiers expirés puis les moins récemment utilisés tant que le
+        répertoire dépasse max_bytes. Retourne le nombre de fichiers supprimés.
+        """
+        now = time.time() if now is None else now
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            expired = self.max_age_seconds and now - mtime > self.max_age_seconds
+            if not expired and (not self.max_bytes or total <= self.max_bytes):
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        return removed
+
+
+def _extract_pages(data, page_numbers):
+    """
+    Tâche du pool : relit le PDF et extrait le texte des pages demandées
+    """
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return [(n, reader.pages[n].extract_text() or "") for n in page_numbers]
+
+
+def extract_pdf_text(data, max_workers=None, cache=None, pages_per_task=PAGES_PER_TASK):
+    """
+    Extrait le texte d'un PDF page par page.
+    Seules les pages absentes du cache sont extraites, réparties sur un pool de
+    processus pour les gros documents, puis réassemblées dans l'ordre des pages.
+    Retourne (texte, nombre de pages, nombre de pages réellement extraites).
+    """
+    import PyPDF2
+
+    cache = cache or PageTextCache()
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    salt = _extractor_version()
+
+    memo = {}
+    keys = [page_fingerprint(page, salt, memo) for page in reader.pages]
+    texts = [cache.get(key) for key in keys]
+    missing = [n for n, text in enumerate(texts) if text is None]
+
+    workers = max_workers or os.cpu_count() or 1
+    if len(missing) < MIN_PAGES_FOR_POOL or workers <= 1:
+        extracted = [(n, reader.pages[n].extract_text() or "") for n in missing]
+    else:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Chaque tâche relit le PDF : des lots assez gros amortissent ce coût
+        batch_size = max(pages_per_task, -(-len(missing) // (workers * 4)))
+        batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+        workers = min(workers, len(batches))
+        # "spawn" : pas de fork d'un serveur Streamlit multi-thread
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            extracted = [
+                item
+                for batch_result in pool.map(_extract_pages, [data] * len(batches), batches)
+                for item in batch_result
+            ]
+
+    for n, text in extracted:
+        texts[n] = text
+        cache.put(keys[n], text)
+    if extracted:
+        # Un seul parcours du répertoire par document, et seulement s'il a grossi
+        cache.prune()
+
+    pdf_text = "".join(text + "\n" for text in texts)
+    return pdf_text, len(texts), len(missing)
@@ -0,0 +1,162 @@
+from functools import lru_cache
+
+# Sépare les instructions, identiques pour tous les segments (préfixe stable que le fournisseur
+# peut mettre en cache), des données propres au segment placées en fin de prompt
+PREFIX_SEPARATOR = "\n\n---\n\n"
+
+
+class Prompt(str):
+    """
+    Texte d'un prompt (préfixe stable, séparateur, partie variable) qui garde la longueur de son
+    préfixe : elle est fixée à la construction, pas retrouvée en cherchant le séparateur, que
+    les personas rédigés par le LLM ou le catalogue contiennent souvent eux-mêmes
+    """
+
+    def __new__(cls, stable, variable):
+        prompt = super().__new__(cls, stable + PREFIX_SEPARATOR + variable)
+        prompt.stable_length = len(stable) + len(PREFIX_SEPARATOR)
+        return prompt
+
+    def __getnewargs__(self):
+        # pickle (pools de processus) : reconstruit le prompt à partir de ses deux parties
+        return str(self[:self.stable_length - len(PREFIX_SEPARATOR)]), str(self[self.stable_length:])
+
+
+def segment_data(segment, catalogue_products=None):
+    """
+    Partie variable d'un prompt de persona : caractéristiques du segment et sélection du catalogue
+    """
+    data = f"""DONNÉES DU SEGMENT:
+Nom du segment: {segment.get('name', 'N/A')}
+Âge moyen: {segment.get('age', 'N/A')} ans
+Nombre de produits utilisés: {segment.get('nbProducts', 'N/A')}
+Revenu mensuel (Hommes): {segment.get('revenueHommes', 'N/A')}
+Revenu mensuel (Femmes): {segment.get('revenueFemmes', 'N/A')}
+Accessibilité mobile: {segment.get('mobileAccess', 'N/A')}
+Accessibilité email: {segment.get('emailAccess', 'N/A')}
+Caractéristiques principales: {segment.get('characteristics', 'N/A')}"""
+    if catalogue_products:
+        data += f"""
+
+CATALOGUE DES PRODUITS BANCAIRES DISPONIBLES (sélection pour ce segment):
+{catalogue_products}"""
+    return data
+
+
+def assemble_prompt(instructions, segment, catalogue_products=None, shared_catalogue=None):
+    """
+    Instructions communes, puis données du segment. shared_catalogue : catalogue complet, le même
+    pour tous les segments, placé dans le préfixe stable (à la place de catalogue_products)
+    """
+    stable = instructions
+    if shared_catalogue:
+        stable += f"""
+
+CATALOGUE DES PRODUITS BANCAIRES DISPONIBLES (catalogue complet, commun à tous les segments):
+{shared_catalogue}"""
+    return Prompt(stable, segment_data(segment, catalogue_products))
+
+
+def prefix_length(text):
+    """
+    Longueur du préfixe stable d'un Prompt (0 pour un texte quelconque)
+    """
+    return getattr(text, "stable_length", 0)
+
+
+@lru_cache(maxsize=2)
+def persona_instructions(with_catalogue):
+    """
+    Instructions de génération d'un persona, sans aucune donnée de segment
+    """
+    intro = "Génère une description complète et détaillée d'une persona marketing pour le segment bancaire décrit dans les DONNÉES DU SEGMENT en fin de message."
+
+    if with_catalogue:
+        produits_info = """
+
+MÉTHODOLOGIE DE RECOMMANDATION:
+Pour recommander les produits les plus adaptés à ce segment, analyse TOUS les critères suivants:
+
+1. PROFIL DÉMOGRAPHIQUE:
+   - Âge moyen -> Besoins selon le stade de vie
+   - Revenus hommes/femmes -> Capacité financière ET disparités de genre
+
+2. COMPORTEMENT BANCAIRE:
+   - Nombre de produits actuels -> Sophistication bancaire
+   - Si faible (< 5) -> Segment sous-bancarisé, besoin de produits simples
+   - Si élevé (> 8) -> Segment mature, besoin de services premium
+
+3. CONNECTIVITÉ DIGITALE:
+   - Accessibilité mobile -> Appétence digitale
+   - Accessibilité email -> Canaux de communication préférés
+   - Si > 95% mobile -> Favoriser services digitaux (App mobile, banque en ligne)
+   - Si < 80% mobile -> Favoriser services traditionnels (agence, téléphone)
+
+4. CARACTÉRISTIQUES SOCIO-PROFESSIONNELLES:
+   - Caractéristiques principales du segment
+   - Identifier: statut professionnel, stabilité, besoins spécifiques
+
+5. LOGIQUE DE RECOMMANDATION PRODUITS (NE PAS SE BASER UNIQUEMENT SUR LE PRIX):
+   - Matcher les produits avec les BESOINS RÉELS basés sur le catalogue détaillé
+   - Considérer les segments cibles mentionnés dans le catalogue
+   - Analyser les caractéristiques produits vs profil segment
+   - Justifier les recommandations avec des détails spécifiques du catalogue
+
+IMPORTANT:
+- NE JAMAIS recommander un produit uniquement parce qu'il est cher ou prestigieux
+- TOUJOURS justifier en se basant sur les BESOINS RÉELS du segment
+- Considérer le RAPPORT QUALITÉ-PRIX et l'ADÉQUATION aux usages
+- Identifier les GAPS (produits manquants malgré le besoin)
+- Référencer les détails spécifiques des produits du catalogue"""
+
+        recommendation_note = """
+- RECOMMANDATIONS DE PRODUITS BANCAIRES :
+
+  **A. ANALYSE DES BESOINS**
+  Basée sur l'analyse complète du segment (âge, nombre de produits, revenu, accessibilité digitale, caractéristiques comportementales), identifie les BESOINS PRIORITAIRES de ce segment.
+
+  **B. PRODUITS RECOMMANDÉS DU CATALOGUE**
+  Pour CHAQUE produit recommandé, justifie en citant:
+   - Les caractéristiques du segment qui le justifient
+   - Le besoin spécifique couvert
+   - L'adéquation avec le profil (âge, revenu, connectivité, etc.)
+   - Le prix exact du catalogue
+   - Pourquoi ce produit correspond vs les alternatives
+
+   Structure:
+   • Produits Prioritaires (Haute priorité)
+   • Produits Complémentaires (Priorité moyenne)
+   • Produits de Développement (Long terme)"""
+    else:
+        produits_info = ""
+        recommendation_note = """
+- RECOMMANDATIONS DE PRODUITS BANCAIRES :
+
+  **A. PROPOSITION GÉNÉRALE**
+  Basée sur l'analyse complète du segment (âge, nombre de produits, revenu, accessibilité digitale, caractéristiques comportementales), propose des CATÉGORIES de produits bancaires adaptés. Justifie chaque recommandation par la synthèse des critères de segmentation.
+
+  Note: Aucun catalogue produits chargé, donc pas de proposition spécifique avec prix."""
+
+    return intro + produits_info + """
+
+Fournis une description professionnelle en FRANÇAIS incluant:
+
+1. PROFIL DÉMOGRAPHIQUE DÉTAILLÉ
+2. COMPORTEMENTS ET PATTERNS BANCAIRES
+3. BESOINS ET PRÉFÉRENCES
+4. MOTIVATIONS ET PAIN POINTS
+5. STRATÉGIE MARKETING RECOMMANDÉE""" + recommendation_note + """
+
+7. PROPOSITION DE VALEUR UNIQUE
+
+Format: Utilise des sections claires avec des titres en gras. Rédige tout en FRANÇAIS."""
+
+
+def build_persona_prompt(segment, catalogue_products=None, shared_catalogue=None):
+    """
+    Prompt de génération d'un persona pour un segment.
+    catalogue_products : extrait du catalogue déjà sélectionné pour ce segment, ou None sans catalogue ;
+    shared_catalogue : catalogue complet commun à tous les segments (voir CatalogueIndex.persona_catalogue).
+    """
+    with_catalogue = bool(catalogue_products or shared_catalogue)
+    return assemble_prompt(persona_instructions(with_catalogue), segment, catalogue_products, shared_catalogue)
@@ -0,0 +1,207 @@
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+# Nombre de produits injectés par défaut dans un prompt et budget de caractères associé
+DEFAULT_TOP_K = 12
+DEFAULT_MAX_CHARS = 10000
+
+# Taille cible des extraits quand le catalogue n'est pas découpé en produits (PDF)
+CHUNK_CHARS = 800
+
+PRODUCT_MARKER = re.compile(r"^--- PRODUIT \d+ ---$", re.MULTILINE)
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "le", "la", "les", "de", "des", "du", "un", "une", "et", "ou", "en", "au", "aux",
+    "a", "pour", "par", "sur", "dans", "avec", "sans", "que", "qui", "quoi", "est",
+    "sont", "ce", "ces", "cet", "cette", "se", "sa", "son", "ses", "leur", "leurs",
+    "il", "elle", "ils", "elles", "nous", "vous", "je", "tu", "on", "ne", "pas",
+    "plus", "moins", "tres", "quel", "quelle", "quels", "quelles", "comment", "n",
+    "l", "d", "s", "c", "qu", "j", "m", "t", "y", "the", "of", "and", "to", "na",
+}
+
+
+def tokenize(text):
+    """
+    Découpe un texte en termes normalisés (minuscules, sans accents ni mots vides)
+    """
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    normalized = "".join(c for c in normalized if not unicodedata.combining(c))
+    terms = []
+    for token in TOKEN_PATTERN.findall(normalized):
+        if token in STOPWORDS:
+            continue
+        # Pluriels simples : "retraites" et "retraite" désignent le même besoin
+        if len(token) > 3 and token[-1] in "sx":
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+def split_catalogue(text, chunk_chars=CHUNK_CHARS):
+    """
+    Découpe le texte du catalogue en fiches produits.
+    Le format Excel ("--- PRODUIT n ---") donne une fiche par produit ; le texte d'un
+    PDF est regroupé par paragraphes en extraits d'environ chunk_chars caractères.
+    """
+    markers = list(PRODUCT_MARKER.finditer(text))
+    if markers:
+        bounds = [m.start() for m in markers] + [len(text)]
+        return [text[start:end].strip() for start, end in zip(bounds, bounds[1:]) if text[start:end].strip()]
+
+    chunks = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n|\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 1 > chunk_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class BM25Index:
+    """
+    Index BM25 en mémoire sur une liste de documents texte
+    """
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+
+        self._postings = defaultdict(list)
+        self._lengths = []
+        for doc_id, document in enumerate(documents):
+            counts = Counter(tokenize(document))
+            self._lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self._postings[term].append((doc_id, tf))
+
+        n_docs = len(documents)
+        self._avg_length = (sum(self._lengths) / n_docs) if n_docs else 0.0
+        self._idf = {
+            term: math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def __len__(self):
+        return len(self.documents)
+
+    def search(self, query, k=DEFAULT_TOP_K):
+        """
+        Retourne les k meilleurs (doc_id, score) pour la requête, score décroissant
+        """
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self._postings[term]:
+                norm = 1 - self.b + self.b * self._lengths[doc_id] / (self._avg_length or 1)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:k]
+
+
+class CatalogueIndex:
+    """
+    Index de recherche du catalogue produits, construit une fois au chargement du fichier
+    """
+
+    def __init__(self, source_text, products):
+        self.source_text = source_text
+        self.products = products
+        self._bm25 = BM25Index(products)
+
+    @classmethod
+    def from_text(cls, text):
+        return cls(text, split_catalogue(text))
+
+    def __len__(self):
+        return len(self.products)
+
+    def relevant_products(self, query, k=DEFAULT_TOP_K, max_chars=DEFAULT_MAX_CHARS):
+        """
+        Texte des k produits les plus pertinents pour la requête, dans l'ordre du
+        catalogue et limité à max_chars. Sans correspondance, retombe sur les premiers produits.
+        """
+        ranked = [doc_id for doc_id, _ in self._bm25.search(query, k)]
+        if not ranked:
+            ranked = list(range(min(k, len(self.products))))
+
+        selected = []
+        used = 0
+        for doc_id in ranked:
+            product = self.products[doc_id]
+            if selected and used + len(product) > max_chars:
+                continue
+            selected.append(doc_id)
+            used += len(product) + 2
+
+        header = f"({len(selected)} produits sélectionnés sur {len(self.products)} par pertinence)\n\n"
+        return header + "\n\n".join(self.products[doc_id][:max_chars] for doc_id in sorted(selected))
+
+    def persona_catalogue(self, query, k=DEFAULT_TOP_K, max_chars=DEFAULT_MAX_CHARS):
+        """
+        Catalogue pour le prompt d'un persona : (catalogue complet, None) s'il tient dans une
+        sélection de k produits et max_chars (identique pour tous les segments d'un lot, il va
+        dans le préfixe stable), sinon (None, sélection pour la requête)
+        """
+        if len(self.products) <= k and sum(len(product) + 2 for product in self.products) <= max_chars:
+            return f"({len(self.products)} produits)\n\n" + "\n\n".join(self.products), None
+        return None, self.relevant_products(query, k, max_chars)
+
+
+def _percentage(value):
+    try:
+        return float(str(value).strip().rstrip("%"))
+    except ValueError:
+        return None
+
+
+def segment_query(segment):
+    """
+    Requête de recherche décrivant les besoins d'un segment (attributs + indices de besoins)
+    """
+    terms = [
+        str(segment.get("name", "")),
+        str(segment.get("characteristics", "")),
+        str(segment.get("revenueHommes", "")),
+        str(segment.get("revenueFemmes", "")),
+    ]
+
+    try:
+        age = float(segment.get("age"))
+    except (TypeError, ValueError):
+        age = None
+    if age is not None:
+        if age >= 55:
+            terms.append("retraite retraité épargne pension assurance vie senior")
+        elif age < 30:
+            terms.append("jeune étudiant premier compte carte épargne")
+        else:
+            terms.append("crédit immobilier consommation épargne famille salarié")
+
+    try:
+        nb_products = float(segment.get("nbProducts"))
+    except (TypeError, ValueError):
+        nb_products = None
+    if nb_products is not None:
+        if nb_products < 5:
+            terms.append("compte courant carte package essentiel simple")
+        elif nb_products > 8:
+            terms.append("premium gold platinum gestion patrimoine placement")
+
+    mobile = _percentage(segment.get("mobileAccess"))
+    if mobile is not None and mobile > 95:
+        terms.append("mobile application banque en ligne digital sms")
+
+    return " ".join(terms)
@@ -0,0 +1,294 @@
+"""
+Ordonnanceur placé devant chaque appel LLM : respect des limites du fournisseur
+(requêtes et tokens par minute, par seaux à jetons), nouvelles tentatives avec backoff
+exponentiel et gigue sur les erreurs transitoires (429, 5xx, délais dépassés) et
+échéance par appel. Un seul ordonnanceur est partagé par toutes les sessions : les
+limites du fournisseur s'appliquent à la clé d'API, pas à la session.
+"""
+import os
+import random
+import threading
+import time
+
+from persona_core.backends import LLMBackend
+from persona_core.tokens import TokenCounts
+
+# Limites par défaut (surchargeables par variables d'environnement)
+DEFAULT_REQUESTS_PER_MINUTE = int(os.environ.get("LLM_REQUESTS_PER_MINUTE", 500))
+DEFAULT_TOKENS_PER_MINUTE = int(os.environ.get("LLM_TOKENS_PER_MINUTE", 200000))
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 30.0
+DEFAULT_DEADLINE = 180.0
+# Tokens de réponse réservés avant l'appel ; le seau est corrigé avec le nombre réel ensuite
+EXPECTED_COMPLETION_TOKENS = 1000
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# Exceptions des clients openai / LangChain reconnues par leur nom (pas d'import obligatoire)
+RETRYABLE_ERRORS = {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError",
+                    "ServiceUnavailableError", "Timeout"}
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    L'appel n'a pas abouti avant son échéance (attente des limites et nouvelles tentatives comprises)
+    """
+
+
+def _status_code(error):
+    for source in (error, getattr(error, "response", None)):
+        code = getattr(source, "status_code", None) or getattr(source, "status", None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def is_retryable(error):
+    """
+    Erreur transitoire : limite de débit, erreur serveur, délai ou connexion
+    """
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = _status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+def retry_after(error):
+    """
+    Délai imposé par le fournisseur (en-tête Retry-After), en secondes, ou None
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Seau à jetons rempli à rate_per_minute par minute, de capacité une minute de débit
+    """
+
+    def __init__(self, rate_per_minute, clock=time.monotonic):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        """
+        Débite amount (le solde peut devenir négatif) et retourne l'attente avant de l'utiliser.
+        Les appelants sont ainsi servis dans l'ordre de leurs réservations.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+    def adjust(self, amount):
+        """
+        Débite (ou rend, si négatif) des jetons après coup
+        """
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class RequestScheduler:
+    """
+    Limites requêtes/min et tokens/min, backoff exponentiel avec gigue et échéance par appel
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                 max_retries=DEFAULT_MAX_RETRIES, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY,
+                 deadline=DEFAULT_DEADLINE, clock=time.monotonic, sleep=time.sleep, seed=None):
+        self.requests = TokenBucket(requests_per_minute, clock)
+        self.tokens = TokenBucket(tokens_per_minute, clock)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self._clock = clock
+        self._sleep = sleep
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # Un 429 suspend tous les appels (pas seulement celui qui l'a reçu) jusqu'à cette date
+        self._paused_until = 0.0
+        self._metrics = dict.fromkeys(
+            ("calls", "attempts", "retries", "rate_limited", "failures", "deadline_exceeded"), 0
+        )
+        self._metrics["throttle_seconds"] = 0.0
+        self._metrics["backoff_seconds"] = 0.0
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._metrics[name] += value
+
+    def _remaining(self, deadline):
+        return deadline - self._clock()
+
+    def _wait(self, seconds, deadline, metric):
+        if seconds <= 0:
+            return
+        if seconds > self._remaining(deadline):
+            self._count("deadline_exceeded")
+            raise DeadlineExceeded(f"Échéance de {self.deadline:.0f} s dépassée")
+        self._count(metric, seconds)
+        self._sleep(seconds)
+
+    def _acquire(self, estimated_tokens, deadline):
+        """
+        Attend la levée d'une suspension 429 et la place dans les deux seaux
+        """
+        with self._lock:
+            paused = self._paused_until - self._clock()
+        self._wait(paused, deadline, "throttle_seconds")
+
+        wait = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+        try:
+            self._wait(wait, deadline, "throttle_seconds")
+        except DeadlineExceeded:
+            # Réservation abandonnée : rendue aux appels suivants
+            self.requests.adjust(-1)
+            self.tokens.adjust(-estimated_tokens)
+            raise
+        self._count("attempts")
+
+    def _backoff(self, error, attempt, deadline):
+        """
+        Relève l'erreur si elle est définitive, sinon attend avant la tentative suivante
+        """
+        if attempt >= self.max_retries or not is_retryable(error):
+            self._count("failures")
+            raise error
+
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        # Gigue complète : les appels en échec simultané ne repartent pas ensemble
+        delay = self._random.uniform(delay / 2, delay)
+        if _status_code(error) == 429 or type(error).__name__ == "RateLimitError":
+            self._count("rate_limited")
+            delay = max(delay, retry_after(error) or 0.0)
+            with self._lock:
+                self._paused_until = max(self._paused_until, self._clock() + delay)
+
+        try:
+            self._wait(delay, deadline, "backoff_seconds")
+        except DeadlineExceeded as e:
+            raise e from error
+        self._count("retries")
+
+    def _options(self, options, deadline):
+        # Le client peut ainsi interrompre lui-même une requête qui dépasserait l'échéance
+        return dict(options, timeout=max(0.1, self._remaining(deadline)))
+
+    def _estimate(self, counts, options):
+        return counts.prompt + (options.get("max_tokens") or EXPECTED_COMPLETION_TOKENS)
+
+    def _settle(self, estimated_tokens, counts, content):
+        # Réponse déjà comptée par InstrumentedBackend quand il est dans la chaîne
+        self.tokens.adjust(counts.prompt + counts.completion(content) - estimated_tokens)
+
+    def complete(self, call, messages, options):
+        """
+        Exécute call(messages, **options) (appel complet) sous les limites, avec nouvelles tentatives
+        """
+        self._count("calls")
+        deadline = self._clock() + self.deadline
+        counts = options.get("token_counts") or TokenCounts(messages)
+        estimated = self._estimate(counts, options)
+        attempt = 0
+        while True:
+            self._acquire(estimated, deadline)
+            try:
+                content = call(messages, **self._options(options, deadline))
+            except Exception as e:
+                self._backoff(e, attempt, deadline)
+                attempt += 1
+                continue
+            self._settle(estimated, counts, content)
+            return content
+
+    def stream(self, call, messages, options):
+        """
+        Comme complete() pour un flux : une nouvelle tentative n'est possible qu'avant le premier fragment
+        """
+        self._count("calls")
+        deadline = self._clock() + self.deadline
+        counts = options.get("token_counts") or TokenCounts(messages)
+        estimated = self._estimate(counts, options)
+        attempt = 0
+        while True:
+            self._acquire(estimated, deadline)
+            parts = []
+            try:
+                for text in call(messages, **self._options(options, deadline)):
+                    parts.append(text)
+                    yield text
+            except Exception as e:
+                if parts:
+                    # Du texte a déjà été affiché : le relancer le dupliquerait
+                    self._count("failures")
+                    raise
+                self._backoff(e, attempt, deadline)
+                attempt += 1
+                continue
+            self._settle(estimated, counts, "".join(parts))
+            return
+
+    def metrics(self):
+        """
+        Compteurs cumulés : appels, tentatives, nouvelles tentatives, 429, échecs, échéances, attentes
+        """
+        with self._lock:
+            return dict(self._metrics)
+
+    def to_prometheus(self):
+        """
+        Compteurs au format texte Prometheus
+        """
+        metrics = self.metrics()
+        lines = []
+        for name, help_text in (
+            ("calls", "Appels LLM ordonnancés."),
+            ("attempts", "Tentatives envoyées au fournisseur."),
+            ("retries", "Nouvelles tentatives après une erreur transitoire."),
+            ("rate_limited", "Réponses 429 du fournisseur."),
+            ("failures", "Appels en échec définitif."),
+            ("deadline_exceeded", "Appels abandonnés à leur échéance."),
+            ("throttle_seconds", "Attente cumulée imposée par les limites de débit."),
+            ("backoff_seconds", "Attente cumulée entre les tentatives."),
+        ):
+            metric = f"persona_llm_scheduler_{name}_total"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter", f"{metric} {metrics[name]:g}"]
+        return "\n".join(lines) + "\n"
+
+
+class ScheduledBackend(LLMBackend):
+    """
+    Enveloppe un backend : chaque appel passe par le RequestScheduler partagé
+    """
+
+    def __init__(self, backend, scheduler):
+        self.backend = backend
+        self.scheduler = scheduler
+        self.model_name = backend.model_name
+
+    def _options(self, messages, options):
+        # Tokens du prompt comptés ici une fois, pour l'ordonnanceur et la télémétrie
+        return dict(options, token_counts=TokenCounts(messages, options.get("model") or self.model_name))
+
+    def complete(self, messages, **options):
+        return self.scheduler.complete(self.backend.complete, messages, self._options(messages, options))
+
+    def stream(self, messages, **options):
+        return self.scheduler.stream(self.backend.stream, messages, self._options(messages, options))
+
+    def record_cache_hit(self, messages, content, label=None):
+        self.backend.record_cache_hit(messages, content, label)
@@ -0,0 +1,244 @@
+"""
+Segments clients chargés depuis un CSV : schéma déclaré (colonnes et types), lecture par
+blocs, stockage en colonnes (pandas, catégories pour les valeurs répétées) plutôt qu'en
+liste de dictionnaires, et accès par id, par page ou par recherche sans tout matérialiser.
+"""
+from collections.abc import Sequence
+
+# Colonnes attendues et type de stockage ; id et name sont obligatoires, les autres
+# colonnes absentes s'affichent "N/A" comme avant. Les colonnes inconnues sont ignorées.
+# Les colonnes numériques sont typées par pandas puis converties si besoin : une valeur non
+# numérique ("40 ans") est vidée avec un avertissement, des ids non numériques ("C1") restent du texte.
+SEGMENT_COLUMNS = {
+    "id": "int64",
+    "name": "str",
+    "age": "float64",
+    "nbProducts": "float64",
+    "revenueHommes": "category",
+    "revenueFemmes": "category",
+    "mobileAccess": "category",
+    "emailAccess": "category",
+    "characteristics": "category",
+}
+REQUIRED_COLUMNS = ("id", "name")
+NUMERIC_COLUMNS = ("age", "nbProducts")
+# Lignes lues par bloc : la mémoire de lecture ne dépend pas de la taille du fichier
+CSV_CHUNK_ROWS = 50_000
+# Segments affichés par page dans l'onglet Segments
+SEGMENTS_PER_PAGE = 20
+# Au-delà, la liste de sélection est filtrée par recherche au lieu de tout proposer
+MAX_SELECT_OPTIONS = 500
+# Lignes du CSV montrées dans le tableau d'aperçu
+PREVIEW_ROWS = 1000
+# Au-delà, seuls les segments qui ont un persona entrent dans le prompt système du chat
+MAX_CHAT_SEGMENTS = 200
+
+
+class SegmentSchemaError(ValueError):
+    """
+    CSV de segments non conforme au schéma (colonne manquante, valeur d'un mauvais type)
+    """
+
+
+def _python(value):
+    # Scalaires numpy -> types Python ; 40.0 -> 40 pour garder l'affichage des entiers
+    value = value.item() if hasattr(value, "item") else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _to_numbers(values):
+    import pandas as pd
+
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype("float64"), 0
+    numbers = pd.to_numeric(values, errors="coerce")
+    return numbers, int((numbers.isna() & values.notna()).sum())
+
+
+def _segment_ids(ids):
+    # Ids entiers si toutes les valeurs le sont, sinon texte pour tous (comme pd.read_csv sans types)
+    numbers, invalid = _to_numbers(ids)
+    if not invalid and (numbers % 1 == 0).all():
+        return numbers.astype("int64")
+    return ids.astype("str")
+
+
+def _concat(chunks):
+    import pandas as pd
+    from pandas.api.types import union_categoricals
+
+    if len(chunks) == 1:
+        return chunks[0]
+    columns = {}
+    for name in chunks[0].columns:
+        parts = [chunk[name] for chunk in chunks]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            # Catégories différentes d'un bloc à l'autre : union, sans repasser par des chaînes
+            columns[name] = pd.Series(union_categoricals(parts, ignore_order=True))
+        else:
+            columns[name] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def load_segment_csv(source, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Lit un CSV de segments (chemin ou fichier) par blocs de chunk_rows lignes, avec les
+    types de SEGMENT_COLUMNS. Retourne (SegmentTable, colonnes ignorées, colonnes absentes,
+    avertissements sur les valeurs vidées ou les lignes écartées) ; lève SegmentSchemaError
+    si une colonne obligatoire manque ou si le fichier est illisible.
+    """
+    import pandas as pd
+
+    if hasattr(source, "seek"):
+        # Fichier déposé dans Streamlit : peut avoir déjà été lu lors d'un rerun précédent
+        source.seek(0)
+    try:
+        header = pd.read_csv(source, nrows=0).columns
+    except (ValueError, pd.errors.EmptyDataError) as e:
+        raise SegmentSchemaError(f"CSV illisible: {e}")
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+    missing_required = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing_required:
+        raise SegmentSchemaError(f"Colonne(s) obligatoire(s) manquante(s): {', '.join(missing_required)}")
+    columns = [column for column in SEGMENT_COLUMNS if column in header]
+    ignored = [column for column in header if column not in SEGMENT_COLUMNS]
+    missing = [column for column in SEGMENT_COLUMNS if column not in header]
+
+    # id et colonnes numériques : types déduits par pandas, convertis ensuite sans rejeter le fichier
+    dtypes = {column: SEGMENT_COLUMNS[column] for column in columns if column != "id" and column not in NUMERIC_COLUMNS}
+    invalid = dict.fromkeys(NUMERIC_COLUMNS, 0)
+    chunks = []
+    try:
+        for chunk in pd.read_csv(source, usecols=columns, dtype=dtypes, chunksize=chunk_rows):
+            for column in NUMERIC_COLUMNS:
+                if column in chunk:
+                    chunk[column], count = _to_numbers(chunk[column])
+                    invalid[column] += count
+            chunks.append(chunk)
+    except ValueError as e:
+        first_row = len(chunks) * chunk_rows + 1
+        raise SegmentSchemaError(f"CSV illisible entre les lignes {first_row} et {first_row + chunk_rows - 1}: {e}")
+
+    frame = _concat(chunks) if chunks else None
+    warnings = [
+        f"{column} : {count} valeur(s) non numérique(s) remplacée(s) par N/A" for column, count in invalid.items() if count
+    ]
+    if frame is not None:
+        without_id = frame["id"].isna()
+        if without_id.any():
+            warnings.append(f"{int(without_id.sum())} ligne(s) sans id ignorée(s)")
+            frame = frame[~without_id]
+        frame["id"] = _segment_ids(frame["id"])
+    if frame is None or frame.empty:
+        raise SegmentSchemaError("Aucun segment dans le fichier")
+    return SegmentTable(frame), ignored, missing, warnings
+
+
+class SegmentTable(Sequence):
+    """
+    Segments en colonnes. Se parcourt comme l'ancienne liste de dictionnaires (len, index,
+    tranches, itération), mais get(), search() et select() évitent de construire un
+    dictionnaire par segment. Pour un même id, le premier segment l'emporte.
+    """
+
+    def __init__(self, frame):
+        import pandas as pd
+
+        self.frame = frame.reset_index(drop=True)
+        first = ~self.frame["id"].duplicated()
+        self._ids = pd.Index(self.frame["id"][first].to_numpy())
+        self._rows = self.frame.index[first].to_numpy()
+        # Tableaux des colonnes (sans copie) : lire une ligne coûte quelques µs par colonne, pas un iloc
+        self._columns = {column: self.frame[column].array for column in self.frame.columns}
+        self._selection = (None, [])
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._records(self.frame.iloc[index])
+        position = range(len(self.frame))[index]
+        return {
+            column: _python(values[position]) for column, values in self._columns.items()
+            if values[position] == values[position]
+        }
+
+    def __iter__(self):
+        start = 0
+        while start < len(self.frame):
+            yield from self._records(self.frame.iloc[start:start + CSV_CHUNK_ROWS])
+            start += CSV_CHUNK_ROWS
+
+    @staticmethod
+    def _records(rows):
+        # Les valeurs manquantes sont omises : segment.get(..., "N/A") s'applique comme avant
+        columns = list(rows.columns)
+        return [
+            {column: _python(value) for column, value in zip(columns, values) if value == value}
+            for values in rows.itertuples(index=False, name=None)
+        ]
+
+    def get(self, segment_id):
+        """
+        Segment de cet id (dictionnaire), ou None
+        """
+        try:
+            position = self._ids.get_loc(segment_id)
+        except (KeyError, TypeError):
+            return None
+        return self[int(self._rows[position])]
+
+    def search(self, query, limit=MAX_SELECT_OPTIONS):
+        """
+        Couples (id, nom) dont le nom contient query ou dont l'id vaut query, au plus limit
+        """
+        query = (query or "").strip()
+        if query:
+            mask = self.frame["name"].str.contains(query, case=False, regex=False, na=False)
+            ids = self.frame["id"]
+            if ids.dtype == "int64":
+                if query.lstrip("-").isdigit():
+                    mask |= ids == int(query)
+            else:
+                mask |= ids.str.casefold() == query.casefold()
+            rows = self.frame.loc[mask, ["id", "name"]].head(limit)
+        else:
+            rows = self.frame[["id", "name"]].head(limit)
+        # Nom vide : "Unknown" comme ailleurs, les libellés de sélection attendent une chaîne
+        return [
+            (_python(segment_id), name if isinstance(name, str) else "Unknown")
+            for segment_id, name in rows.itertuples(index=False, name=None)
+        ]
+
+    def select(self, segment_ids):
+        """
+        Liste des segments de ces ids ; la même liste est retournée tant que les ids ne
+        changent pas (ChatContext ne reconstruit alors pas son bloc de segments)
+        """
+        key = frozenset(segment_ids)
+        if self._selection[0] != key:
+            segments = (self.get(segment_id) for segment_id in sorted(key, key=str))
+            self._selection = (key, [segment for segment in segments if segment is not None])
+        return self._selection[1]
+
+    def memory_bytes(self):
+        return int(self.frame.memory_usage(deep=True).sum())
+
+
+def find_segment(segments, segment_id):
+    """
+    Segment d'un id dans une SegmentTable (accès direct) ou une liste de dictionnaires
+    """
+    if isinstance(segments, SegmentTable):
+        return segments.get(segment_id)
+    return next((s for s in segments if s.get("id", -1) == segment_id), None)
+
+
+def find_segment_name(segments, segment_id):
+    segment = find_segment(segments, segment_id)
+    return segment.get("name", "Unknown") if segment is not None else "Unknown"
@@ -0,0 +1,223 @@
+"""
+Stockage persistant des personas générés (SQLite en mode WAL), partagé par les sessions
+et les redémarrages du serveur. Les écritures sont regroupées par un thread d'écriture
+différée : l'interface ne fait que déposer les personas dans une file.
+
+Un seul persona est gardé par segment, avec l'empreinte de son prompt : un nouveau persona
+du même id de segment (autre catalogue, CSV chargé contre segments par défaut) remplace le
+précédent, et load() ne relit que ceux dont le prompt est encore d'actualité.
+"""
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from persona_core.cache import prompt_key
+
+# Emplacement par défaut du stockage (surchargeable par variable d'environnement)
+DEFAULT_STORE_PATH = os.environ.get(
+    "PERSONA_STORE_PATH",
+    os.path.join(os.path.expanduser("~"), ".local", "share", "chatbot_persona", "personas.sqlite3")
+)
+# Nombre maximum de personas par transaction, et délai de regroupement des écritures
+WRITE_BATCH_SIZE = 64
+WRITE_BATCH_DELAY = 0.2
+
+
+def _plain(value):
+    # Scalaires numpy (ids lus par pandas) -> types Python sérialisables en JSON
+    return value.item() if hasattr(value, "item") else value
+
+
+class PersonaStore:
+    """
+    Un persona par espace de travail (une application) et id de segment, avec l'empreinte de
+    son prompt, le segment, le modèle et la date de génération.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, batch_size=WRITE_BATCH_SIZE, batch_delay=WRITE_BATCH_DELAY):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.last_error = None
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            # WAL : les lectures des sessions ne sont jamais bloquées par le thread d'écriture
+            conn.execute("PRAGMA journal_mode=WAL")
+            key = [row[1] for row in conn.execute("PRAGMA table_info(personas)") if row[5]]
+            if key and "prompt_hash" not in key:
+                # Ancien schéma (un persona par id de segment) : repris dans la nouvelle table
+                conn.execute("ALTER TABLE personas RENAME TO personas_by_segment")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS personas (
+                    workspace TEXT NOT NULL,
+                    segment_id TEXT NOT NULL,
+                    segment_name TEXT,
+                    segment TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    prompt_hash TEXT NOT NULL,
+                    model TEXT,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (workspace, segment_id, prompt_hash)
+                )"""
+            )
+            if key and "prompt_hash" not in key:
+                conn.execute(
+                    """INSERT INTO personas SELECT workspace, segment_id, segment_name, segment, content,
+                       COALESCE(prompt_hash, ''), model, created_at FROM personas_by_segment"""
+                )
+                conn.execute("DROP TABLE personas_by_segment")
+            # Anciennes empreintes laissées par les versions qui gardaient tous les prompts d'un segment
+            conn.execute(
+                """DELETE FROM personas WHERE EXISTS (
+                       SELECT 1 FROM personas AS newer
+                       WHERE newer.workspace = personas.workspace AND newer.segment_id = personas.segment_id
+                       AND newer.created_at > personas.created_at
+                   )"""
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def load(self, workspace, current_prompt=None):
+        """
+        Personas enregistrés pour cet espace de travail : {id de segment: enregistrement}.
+        current_prompt(enregistrement) : prompt que ce segment aurait avec les données actuelles
+        (segments, catalogue), ou None ; seuls les personas générés avec ce prompt exact sont
+        alors retournés.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                """SELECT segment_id, segment_name, segment, content, prompt_hash, model, created_at
+                   FROM personas WHERE workspace = ? ORDER BY created_at""",
+                (workspace,)
+            ).fetchall()
+
+        records = {}
+        for segment_id, segment_name, segment, content, prompt_hash, model, created_at in rows:
+            segment_id = json.loads(segment_id)
+            record = {
+                "id": segment_id,
+                "name": segment_name,
+                "segment": json.loads(segment),
+                "content": content,
+                "prompt_hash": prompt_hash,
+                "model": model,
+                "created_at": created_at,
+            }
+            if current_prompt is not None:
+                prompt = current_prompt(record)
+                if prompt is None or prompt_key(model, prompt) != prompt_hash:
+                    continue
+            records[segment_id] = record
+        return records
+
+    def save(self, workspace, segment, content, prompt_hash=None, model=None):
+        """
+        Dépose un persona dans la file d'écriture ; retourne immédiatement. À l'écriture, il
+        remplace le persona précédent du segment, quel que soit son prompt
+        """
+        segment = {key: _plain(value) for key, value in segment.items()}
+        self._queue.put((
+            workspace,
+            json.dumps(segment.get("id"), ensure_ascii=False),
+            segment.get("name"),
+            json.dumps(segment, ensure_ascii=False, default=str),
+            content,
+            prompt_hash or "",
+            model,
+            time.time(),
+        ))
+        self._ensure_writer()
+
+    def delete(self, workspace, segment_id=None):
+        """
+        Supprime un persona, ou tout l'espace de travail si segment_id est None
+        """
+        self.flush()
+        with self._connect() as conn:
+            if segment_id is None:
+                conn.execute("DELETE FROM personas WHERE workspace = ?", (workspace,))
+            else:
+                conn.execute(
+                    "DELETE FROM personas WHERE workspace = ? AND segment_id = ?",
+                    (workspace, json.dumps(_plain(segment_id), ensure_ascii=False))
+                )
+
+    def flush(self, timeout=None):
+        """
+        Attend que toutes les écritures en file soient sur disque
+        """
+        if self._writer is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _ensure_writer(self):
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                if self._writer is None:
+                    # Vide la file à l'arrêt du processus (le thread est un démon)
+                    atexit.register(self.flush, 5)
+                self._writer = threading.Thread(target=self._write_loop, name="persona-store-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            # Regroupe ce qui arrive pendant batch_delay (génération par lot) en une transaction
+            deadline = time.monotonic() + self.batch_delay
+            # (un flush() en attente arrête le regroupement)
+            while len(batch) < self.batch_size and not isinstance(batch[-1], threading.Event):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            rows = [item for item in batch if not isinstance(item, threading.Event)]
+            if rows:
+                try:
+                    with self._connect() as conn:
+                        # Ligne par ligne, dans l'ordre de la file : le dernier persona d'un segment gagne
+                        for row in rows:
+                            conn.execute(
+                                "DELETE FROM personas WHERE workspace = ? AND segment_id = ? AND prompt_hash != ?",
+                                (row[0], row[1], row[5])
+                            )
+                            conn.execute(
+                                """INSERT OR REPLACE INTO personas
+                                   (workspace, segment_id, segment_name, segment, content, prompt_hash, model, created_at)
+                                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                                row
+                            )
+                    self.last_error = None
+                except sqlite3.Error as e:
+                    # Le thread d'écriture ne doit pas mourir : l'erreur est gardée dans last_error,
+                    # que les applications affichent dans la barre latérale
+                    self.last_error = e
+
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
@@ -0,0 +1,55 @@
+def chunk_text(chunk):
+    """
+    Texte d'un fragment de flux, quel que soit le client :
+    str (LLM LangChain), AIMessageChunk (.content) ou chunk OpenAI (choices[0].delta.content)
+    """
+    if isinstance(chunk, str):
+        return chunk
+
+    content = getattr(chunk, "content", None)
+    if isinstance(content, str):
+        return content
+
+    choices = getattr(chunk, "choices", None)
+    if choices:
+        delta = getattr(choices[0], "delta", None)
+        return getattr(delta, "content", None) or ""
+
+    return ""
+
+
+def iter_text(stream):
+    """
+    Convertit un flux de fragments LLM en flux de texte, prêt pour st.write_stream
+    """
+    for chunk in stream:
+        text = chunk_text(chunk)
+        if text:
+            yield text
+
+
+class StreamCollector:
+    """
+    Enveloppe un flux LLM pour st.write_stream : accumule le texte reçu et
+    capture une éventuelle interruption au lieu de la propager en cours d'affichage.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._parts = []
+        self.error = None
+        self.completed = False
+
+    def __iter__(self):
+        try:
+            for text in iter_text(self._stream):
+                self._parts.append(text)
+                yield text
+        except Exception as e:
+            self.error = e
+            return
+        self.completed = True
+
+    @property
+    def text(self):
+        return "".join(self._parts)
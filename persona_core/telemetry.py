@@ -0,0 +1,282 @@
+"""
+Mesure de chaque appel LLM : tokens du prompt et de la réponse, délai avant le premier
+token, latence totale, coût estimé et succès du cache, avec export CSV et Prometheus.
+"""
+import copy
+import csv
+import io
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict, fields
+
+from persona_core.backends import LLMBackend
+from persona_core.tokens import TokenCounts
+
+# Prix indicatifs en USD par million de tokens (prompt, réponse)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+DEFAULT_MAX_RECORDS = 10000
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return 0.0
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+@dataclass
+class CallRecord:
+    timestamp: float
+    label: str
+    model: str
+    cache_hit: bool
+    prompt_tokens: int
+    completion_tokens: int
+    time_to_first_token: float
+    latency: float
+    cost_usd: float
+    error: str = ""
+
+
+def _new_histogram():
+    return {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0}
+
+
+def _new_totals():
+    return {
+        "calls": {"hit": 0, "miss": 0},
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cost_usd": 0.0,
+        "latency": _new_histogram(),
+        "time_to_first_token": _new_histogram(),
+    }
+
+
+def _observe(histogram, value):
+    for i, bucket in enumerate(LATENCY_BUCKETS):
+        if value <= bucket:
+            histogram["buckets"][i] += 1
+    histogram["sum"] += value
+    histogram["count"] += 1
+
+
+class TelemetryRecorder:
+    """
+    Journal des appels LLM, partagé entre threads (les générations par lot
+    enregistrent depuis les workers). Garde les max_records derniers appels pour
+    le résumé et le CSV ; les compteurs Prometheus sont cumulés depuis le démarrage.
+    """
+
+    def __init__(self, max_records=DEFAULT_MAX_RECORDS):
+        self._records = deque(maxlen=max_records)
+        # Par modèle, jamais évincés : un compteur Prometheus ne doit pas diminuer
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, label, model, messages, completion, time_to_first_token, latency, cache_hit=False, error=None,
+               token_counts=None):
+        """
+        Enregistre un appel ; token_counts (TokenCounts) évite de recompter un prompt déjà compté
+        """
+        token_counts = token_counts or TokenCounts(messages, model)
+        prompt_tokens = token_counts.prompt
+        completion_tokens = token_counts.completion(completion)
+        record = CallRecord(
+            timestamp=time.time(),
+            label=label or "",
+            model=model,
+            cache_hit=cache_hit,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            time_to_first_token=time_to_first_token,
+            latency=latency,
+            # Un succès du cache ne coûte rien
+            cost_usd=0.0 if cache_hit else estimate_cost(model, prompt_tokens, completion_tokens),
+            error=str(error) if error else "",
+        )
+        with self._lock:
+            self._records.append(record)
+            totals = self._totals.get(model)
+            if totals is None:
+                totals = self._totals[model] = _new_totals()
+            totals["calls"]["hit" if cache_hit else "miss"] += 1
+            if not cache_hit:
+                totals["prompt_tokens"] += prompt_tokens
+                totals["completion_tokens"] += completion_tokens
+                totals["cost_usd"] += record.cost_usd
+                if not record.error:
+                    _observe(totals["latency"], latency)
+                    _observe(totals["time_to_first_token"], time_to_first_token)
+        return record
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        """
+        Vide le journal (résumé, CSV) ; les compteurs Prometheus sont conservés
+        """
+        with self._lock:
+            self._records.clear()
+
+    def summary(self):
+        """
+        Agrégats pour l'affichage : appels, succès du cache, tokens, coût, latences (appels réels)
+        """
+        records = self.records()
+        calls = [r for r in records if not r.cache_hit and not r.error]
+        latencies = sorted(r.latency for r in calls)
+        ttfts = sorted(r.time_to_first_token for r in calls)
+        return {
+            "calls": len(records),
+            "cache_hits": sum(r.cache_hit for r in records),
+            "errors": sum(bool(r.error) for r in records),
+            "prompt_tokens": sum(r.prompt_tokens for r in calls),
+            "completion_tokens": sum(r.completion_tokens for r in calls),
+            "cost_usd": sum(r.cost_usd for r in records),
+            "latency_p50": _percentile(latencies, 50),
+            "latency_p95": _percentile(latencies, 95),
+            "ttft_p50": _percentile(ttfts, 50),
+        }
+
+    def by_label(self, top=10):
+        """
+        Libellés (segment, chat...) classés par tokens consommés
+        """
+        totals = {}
+        for r in self.records():
+            if r.cache_hit:
+                continue
+            entry = totals.setdefault(r.label, {"label": r.label, "calls": 0, "prompt_tokens": 0,
+                                                "completion_tokens": 0, "cost_usd": 0.0, "latencies": []})
+            entry["calls"] += 1
+            entry["prompt_tokens"] += r.prompt_tokens
+            entry["completion_tokens"] += r.completion_tokens
+            entry["cost_usd"] += r.cost_usd
+            entry["latencies"].append(r.latency)
+        rows = []
+        for entry in totals.values():
+            entry["latency_mean"] = statistics.mean(entry.pop("latencies"))
+            rows.append(entry)
+        rows.sort(key=lambda e: e["prompt_tokens"] + e["completion_tokens"], reverse=True)
+        return rows[:top]
+
+    def to_csv(self):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=[f.name for f in fields(CallRecord)])
+        writer.writeheader()
+        for record in self.records():
+            writer.writerow(asdict(record))
+        return buffer.getvalue()
+
+    def to_prometheus(self):
+        """
+        Exposition au format texte Prometheus (compteurs et histogrammes par modèle,
+        cumulés depuis le démarrage, indépendamment de max_records)
+        """
+        with self._lock:
+            per_model = copy.deepcopy(self._totals)
+
+        lines = [
+            "# HELP persona_llm_calls_total Appels LLM, succès du cache compris.",
+            "# TYPE persona_llm_calls_total counter",
+        ]
+        for model, totals in per_model.items():
+            for cache in ("hit", "miss"):
+                lines.append(f'persona_llm_calls_total{{model="{_escape(model)}",cache="{cache}"}} {totals["calls"][cache]}')
+
+        for name, attr, help_text in (
+            ("persona_llm_prompt_tokens_total", "prompt_tokens", "Tokens envoyés au LLM."),
+            ("persona_llm_completion_tokens_total", "completion_tokens", "Tokens générés par le LLM."),
+            ("persona_llm_cost_usd_total", "cost_usd", "Coût estimé des appels LLM en USD."),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for model, totals in per_model.items():
+                lines.append(f'{name}{{model="{_escape(model)}"}} {totals[attr]:g}')
+
+        for name, attr, help_text in (
+            ("persona_llm_latency_seconds", "latency", "Latence totale des appels LLM."),
+            ("persona_llm_time_to_first_token_seconds", "time_to_first_token", "Délai avant le premier token."),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for model, totals in per_model.items():
+                histogram = totals[attr]
+                labels = f'model="{_escape(model)}"'
+                for bucket, count in zip(LATENCY_BUCKETS, histogram["buckets"]):
+                    lines.append(f'{name}_bucket{{{labels},le="{bucket:g}"}} {count}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram['sum']:g}")
+                lines.append(f"{name}_count{{{labels}}} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+class InstrumentedBackend(LLMBackend):
+    """
+    Enveloppe un backend et enregistre chaque appel dans un TelemetryRecorder.
+    Les options label= (segment, chat...) et token_counts= (tokens déjà comptés par
+    ScheduledBackend) sont retirées avant de transmettre l'appel.
+    """
+
+    def __init__(self, backend, telemetry):
+        self.backend = backend
+        self.telemetry = telemetry
+        self.model_name = backend.model_name
+
+    def complete(self, messages, label=None, token_counts=None, **options):
+        start = time.perf_counter()
+        content, error = "", None
+        try:
+            content = self.backend.complete(messages, **options)
+            return content
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            # Sans streaming, le premier token arrive avec la réponse complète
+            self.telemetry.record(label, options.get("model") or self.model_name, messages, content,
+                                  latency, latency, error=error, token_counts=token_counts)
+
+    def stream(self, messages, label=None, token_counts=None, **options):
+        start = time.perf_counter()
+        first_token = None
+        parts = []
+        error = None
+        try:
+            for text in self.backend.stream(messages, **options):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                parts.append(text)
+                yield text
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Exécuté aussi si le consommateur abandonne le flux (GeneratorExit)
+            latency = time.perf_counter() - start
+            self.telemetry.record(label, options.get("model") or self.model_name, messages, "".join(parts),
+                                  latency if first_token is None else first_token, latency, error=error,
+                                  token_counts=token_counts)
+
+    def record_cache_hit(self, messages, content, label=None):
+        self.telemetry.record(label, self.model_name, messages, content, 0.0, 0.0, cache_hit=True)
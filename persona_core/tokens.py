@@ -0,0 +1,61 @@
+"""
+Comptage des tokens, partagé par l'historique du chat, l'ordonnanceur et la télémétrie :
+tiktoken s'il est installé (importé au premier comptage), une estimation sinon.
+"""
+from functools import lru_cache
+
+# Approximation sans tokenizer : environ 4 caractères par token pour le français
+CHARS_PER_TOKEN = 4
+DEFAULT_MODEL = "gpt-4o-mini"
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+@lru_cache(maxsize=16)
+def _encoding(model):
+    # tiktoken est importé au premier comptage, pas au démarrage des applications
+    try:
+        import tiktoken
+    except ImportError:  # comptage approximatif si tiktoken n'est pas installé
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Modèles inconnus de tiktoken (socgenai, faux backend) : encodage des modèles GPT-4
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text, model=DEFAULT_MODEL):
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages, model=DEFAULT_MODEL):
+    # Format chat OpenAI : ~4 tokens d'enveloppe par message, 3 pour amorcer la réponse
+    return sum(count_tokens(m["content"], model) + 4 for m in messages) + 3
+
+
+class TokenCounts:
+    """
+    Tokens d'un appel LLM, comptés une seule fois : ScheduledBackend le crée et le transmet
+    (option token_counts=) à l'ordonnanceur puis à InstrumentedBackend, qui le retire.
+    """
+
+    def __init__(self, messages, model=DEFAULT_MODEL):
+        self.model = model
+        self.prompt = count_message_tokens(messages, model)
+        self._completion = None
+
+    def completion(self, text):
+        """
+        Tokens de la réponse ; recomptés seulement si le texte a changé (nouvelle tentative)
+        """
+        if self._completion is None or self._completion[0] != text:
+            self._completion = (text, count_tokens(text, self.model))
+        return self._completion[1]
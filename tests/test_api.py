@@ -0,0 +1,191 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("starlette")
+
+from persona_core.api import (  # noqa: E402
+    ConcurrencyLimiter, Overloaded, PersonaService, RequestError, _error_response, boolean, create_app,
+    positive_int,
+)
+from persona_core.backends import FakeBackend, LLMBackend  # noqa: E402
+from persona_core.jobs import JobQueue  # noqa: E402
+from persona_core.scheduler import DeadlineExceeded  # noqa: E402
+
+SEGMENTS = [{"id": 1, "name": "Seniors", "age": 62}, {"id": 2, "name": "Jeunes", "age": 24}]
+
+
+class FailingBackend(LLMBackend):
+    model_name = "failing"
+
+    def complete(self, messages, **options):
+        raise RuntimeError("fournisseur indisponible")
+
+
+class CountingBackend(LLMBackend):
+    """
+    Appels lents qui mesurent le nombre maximal d'appels simultanés
+    """
+
+    model_name = "counting"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def complete(self, messages, **options):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        return "persona"
+
+
+async def call(app, method, path, body=None):
+    """
+    Requête HTTP envoyée directement à l'application ASGI : (statut, en-têtes, corps)
+    """
+    raw = body if isinstance(body, bytes) else (b"" if body is None else json.dumps(body).encode("utf-8"))
+    requests = [{"type": "http.request", "body": raw, "more_body": False}]
+    sent = []
+
+    async def receive():
+        if requests:
+            return requests.pop(0)
+        # Client toujours connecté : attend l'annulation en fin de réponse
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    await app({
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode("utf-8"), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json")], "client": ("test", 1), "server": ("test", 80),
+    }, receive, send)
+    start = next(message for message in sent if message["type"] == "http.response.start")
+    headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in start["headers"]}
+    return start["status"], headers, b"".join(message.get("body", b"") for message in sent[1:])
+
+
+def run(app, method, path, body=None):
+    return asyncio.run(call(app, method, path, body))
+
+
+def make_app(backend=None, **options):
+    service = PersonaService(backend or FakeBackend("instant"), segments=SEGMENTS, job_queue=JobQueue(max_workers=4))
+    return create_app(service, **options)
+
+
+def test_error_mapping():
+    assert _error_response(RequestError("invalide")).status_code == 400
+    assert _error_response(RequestError("absent", 404)).status_code == 404
+    overloaded = _error_response(Overloaded())
+    assert overloaded.status_code == 503 and "retry-after" in overloaded.headers
+    assert _error_response(DeadlineExceeded("trop long")).status_code == 504
+    assert _error_response(RuntimeError("fournisseur")).status_code == 502
+
+
+def test_positive_int():
+    assert positive_int({}, "n", 3) == 3
+    assert positive_int({"n": 5}, "n") == 5
+    assert positive_int({}, "n") is None
+    for value in ("5", 0, -1, 2.5, True):
+        with pytest.raises(RequestError):
+            positive_int({"n": value}, "n")
+
+
+def test_boolean():
+    assert boolean({}, "force") is False
+    assert boolean({"force": None}, "force") is False
+    assert boolean({"force": True}, "force") is True
+    assert boolean({"force": False}, "force", default=True) is False
+    for value in ("false", "true", 0, 1, [], {}):
+        with pytest.raises(RequestError):
+            boolean({"force": value}, "force")
+
+
+def test_generate_persona_and_read_it_back():
+    app = make_app()
+    status, _, body = run(app, "POST", "/personas", {"segment_id": 1})
+    assert status == 200
+    persona = json.loads(body)
+    assert persona["id"] == 1 and persona["content"] and persona["from_cache"] is False
+    status, _, body = run(app, "GET", "/personas/1")
+    assert status == 200 and json.loads(body)["content"] == persona["content"]
+
+
+@pytest.mark.parametrize("method, path, body, expected", [
+    ("POST", "/personas", b"{pas du json", 400),
+    ("POST", "/personas", [1, 2], 400),
+    ("POST", "/personas", {"segment_id": 9}, 404),
+    ("POST", "/personas", {"segment_id": [1]}, 400),
+    ("POST", "/personas", {"segment": {"name": "sans id"}}, 400),
+    ("POST", "/personas", {"segment_id": 1, "force": "false"}, 400),
+    ("POST", "/personas/stream", {"segment_id": 1, "force": 1}, 400),
+    ("GET", "/personas/7", None, 404),
+    ("POST", "/batches", {"segment_ids": 3}, 400),
+    ("POST", "/batches", {"segments": {"id": 1}}, 400),
+    ("POST", "/batches", {"segment_ids": []}, 400),
+    ("POST", "/batches", {"segment_ids": [1], "max_in_flight": "4"}, 400),
+    ("POST", "/batches", {"segment_ids": [1], "force": "true"}, 400),
+    ("POST", "/chat", {"messages": []}, 400),
+    ("POST", "/chat", {"messages": [{"role": "user", "content": "Bonjour"}], "stream": "false"}, 400),
+    ("POST", "/chat", {"messages": [{"role": "user", "content": "Bonjour"}], "history_budget": "x"}, 400),
+    ("GET", "/batches/999", None, 404),
+])
+def test_invalid_requests_get_client_errors(method, path, body, expected):
+    status, _, payload = run(make_app(), method, path, body)
+    assert status == expected
+    assert "error" in json.loads(payload)
+
+
+def test_backend_errors_get_502():
+    status, _, body = run(make_app(FailingBackend()), "POST", "/personas", {"segment_id": 1})
+    assert status == 502
+    assert "fournisseur indisponible" in json.loads(body)["error"]
+
+
+def test_limiter_rejects_beyond_waiting_queue():
+    async def scenario():
+        limiter = ConcurrencyLimiter(1, 0)
+        async with limiter.slot():
+            with pytest.raises(Overloaded):
+                async with limiter.slot():
+                    pass
+            # Les générations des lots attendent au lieu d'être refusées
+            waiter = asyncio.ensure_future(limiter.slot(reject=False).__aenter__())
+            await asyncio.sleep(0)
+            assert not waiter.done() and limiter.waiting == 0
+        await waiter
+        assert limiter.rejected == 1
+
+    asyncio.run(scenario())
+
+
+def test_batches_share_the_concurrency_limit():
+    backend = CountingBackend()
+    app = make_app(backend, max_concurrency=1, max_waiting=8)
+
+    async def scenario():
+        status, _, body = await call(app, "POST", "/batches", {"segment_ids": [1, 2], "max_in_flight": 2})
+        assert status == 202
+        batch_id = json.loads(body)["batch_id"]
+        status, _, _ = await call(app, "POST", "/personas", {"segment_id": 1, "force": True})
+        assert status == 200
+        for _ in range(200):
+            status, _, body = await call(app, "GET", f"/batches/{batch_id}")
+            if json.loads(body)["done"]:
+                return json.loads(body)
+            await asyncio.sleep(0.01)
+        raise AssertionError("lot non terminé")
+
+    batch = asyncio.run(scenario())
+    assert [persona["id"] for persona in sorted(batch["personas"], key=lambda p: p["id"])] == [1, 2]
+    assert backend.peak == 1
@@ -0,0 +1,53 @@
+from persona_core.backends import OPENAI_BIND_OPTIONS, LangChainBackend
+
+MESSAGES = [{"role": "user", "content": "Bonjour"}]
+
+
+class BindableModel:
+    """
+    Modèle LangChain minimal : bind() retourne un modèle portant les options liées
+    """
+    model_name = "modele-interne"
+
+    def __init__(self, bound=None):
+        self.bound = bound or {}
+
+    def bind(self, **kwargs):
+        return type(self)({**self.bound, **kwargs})
+
+    def invoke(self, messages):
+        if self.bound:
+            raise TypeError(f"options inattendues: {sorted(self.bound)}")
+        return "réponse"
+
+
+class ChatOpenAI(BindableModel):
+    model_name = "gpt-4o-mini"
+
+    def invoke(self, messages):
+        return f"réponse {sorted(self.bound.items())}"
+
+
+def langchain_backend(llm, monkeypatch, **options):
+    backend = LangChainBackend(llm, **options)
+    # Messages passés tels quels : langchain n'est pas nécessaire au test
+    monkeypatch.setattr(backend, "_to_langchain", lambda messages: messages)
+    return backend
+
+
+def test_options_are_not_bound_on_other_models(monkeypatch):
+    backend = langchain_backend(BindableModel(), monkeypatch)
+    assert backend.bind_options == ()
+    assert backend.complete(MESSAGES, timeout=3.0, max_tokens=100) == "réponse"
+
+
+def test_chat_openai_receives_timeout_and_max_tokens(monkeypatch):
+    backend = langchain_backend(ChatOpenAI(), monkeypatch)
+    assert backend.bind_options == OPENAI_BIND_OPTIONS
+    assert backend.complete(MESSAGES, timeout=3.0, max_tokens=100) == "réponse [('max_tokens', 100), ('timeout', 3.0)]"
+    assert backend.complete(MESSAGES) == "réponse []"
+
+
+def test_bind_options_can_be_given_explicitly(monkeypatch):
+    backend = langchain_backend(ChatOpenAI(), monkeypatch, bind_options=("max_tokens",))
+    assert backend.complete(MESSAGES, timeout=3.0, max_tokens=100) == "réponse [('max_tokens', 100)]"
@@ -0,0 +1,70 @@
+import pytest
+
+from persona_core import cache as cache_module
+from persona_core.cache import PersonaCache, prompt_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Horloge contrôlée par le test (expiration et ordre LRU)
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    return now
+
+
+def test_prompt_key_depends_on_model_and_prompt():
+    assert prompt_key("gpt-4o-mini", "p") == prompt_key("gpt-4o-mini", "p")
+    assert prompt_key("gpt-4o-mini", "p") != prompt_key("gpt-4o", "p")
+    assert prompt_key("gpt-4o-mini", "p") != prompt_key("gpt-4o-mini", "q")
+
+
+def test_get_returns_what_put_stored(tmp_path):
+    cache = PersonaCache(str(tmp_path / "cache.db"))
+    assert cache.get("m", "prompt") is None
+    cache.put("m", "prompt", "persona")
+    assert cache.get("m", "prompt") == "persona"
+    assert cache.get("autre", "prompt") is None
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = PersonaCache(str(tmp_path / "cache.db"), ttl_seconds=60)
+    cache.put("m", "prompt", "persona")
+    clock[0] += 59
+    assert cache.get("m", "prompt") == "persona"
+    clock[0] += 2
+    assert cache.get("m", "prompt") is None
+
+
+def test_least_recently_used_entries_are_evicted_above_max_bytes(tmp_path, clock):
+    cache = PersonaCache(str(tmp_path / "cache.db"), ttl_seconds=0, max_bytes=25)
+    cache.put("m", "a", "x" * 10)
+    clock[0] += 1
+    cache.put("m", "b", "y" * 10)
+    clock[0] += 1
+    # Relire "a" le rend plus récent que "b"
+    assert cache.get("m", "a") == "x" * 10
+    clock[0] += 1
+    cache.put("m", "c", "z" * 10)
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") == "x" * 10
+    assert cache.get("m", "c") == "z" * 10
+
+
+def test_get_or_generate_calls_generate_once(tmp_path):
+    cache = PersonaCache(str(tmp_path / "cache.db"))
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return "persona"
+
+    assert cache.get_or_generate("m", "prompt", generate) == ("persona", False)
+    assert cache.get_or_generate("m", "prompt", generate) == ("persona", True)
+    assert cache.get_or_generate("m", "prompt", generate, force=True) == ("persona", False)
+    assert len(calls) == 2
+
+
+def test_empty_content_is_not_cached(tmp_path):
+    cache = PersonaCache(str(tmp_path / "cache.db"))
+    assert cache.get_or_generate("m", "prompt", lambda: "") == ("", False)
+    assert cache.get("m", "prompt") is None
@@ -0,0 +1,112 @@
+import json
+import os
+
+import pytest
+
+from persona_core import cli
+
+
+@pytest.fixture
+def segments_csv(tmp_path):
+    path = tmp_path / "segments.csv"
+    path.write_text("id,name,age\n1,Seniors,62\n2,Jeunes,24\n3,Familles,38\n", encoding="utf-8")
+    return str(path)
+
+
+def run(segments, output_dir, *extra):
+    return cli.main([
+        "--segments", segments, "--output-dir", str(output_dir), "--backend", "fake", "--model", "instant",
+        "--no-cache", "--formats", "txt,json", *extra
+    ])
+
+
+def test_generates_every_segment(segments_csv, tmp_path):
+    output = tmp_path / "sortie"
+    assert run(segments_csv, output) == 0
+    for segment_id in (1, 2, 3):
+        record = json.loads((output / f"persona_cluster_{segment_id}.json").read_text(encoding="utf-8"))
+        assert record["id"] == segment_id and record["content"]
+        assert (output / f"persona_cluster_{segment_id}.txt").read_text(encoding="utf-8") == record["content"]
+
+
+def test_resume_skips_finished_segments(segments_csv, tmp_path, capsys):
+    output = tmp_path / "sortie"
+    assert run(segments_csv, output) == 0
+    os.remove(output / "persona_cluster_2.txt")
+    capsys.readouterr()
+    assert run(segments_csv, output) == 0
+    assert "3 segment(s), 2 déjà généré(s), 1 à générer" in capsys.readouterr().err
+    assert (output / "persona_cluster_2.txt").exists()
+    assert run(segments_csv, output, "--force") == 0
+    assert "0 déjà généré(s), 3 à générer" in capsys.readouterr().err
+
+
+def test_changed_segment_is_regenerated(segments_csv, tmp_path, capsys):
+    output = tmp_path / "sortie"
+    assert run(segments_csv, output) == 0
+    with open(segments_csv, "a", encoding="utf-8") as f:
+        f.write("4,Entrepreneurs,45\n")
+    with open(segments_csv, encoding="utf-8") as f:
+        edited = f.read().replace("Seniors,62", "Seniors,65")
+    with open(segments_csv, "w", encoding="utf-8") as f:
+        f.write(edited)
+    capsys.readouterr()
+    assert run(segments_csv, output) == 0
+    assert "4 segment(s), 2 déjà généré(s), 2 à générer" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("content, name", [
+    (b"%PDF-1.4 contenu tronque", "catalogue.pdf"),
+    (b"PK\x03\x04archive tronquee", "catalogue.xlsx"),
+    (None, "absent.xlsx"),
+])
+def test_unreadable_catalogue_exits_2(segments_csv, tmp_path, capsys, content, name):
+    catalogue = tmp_path / name
+    if content is not None:
+        catalogue.write_bytes(content)
+    assert run(segments_csv, tmp_path / "sortie", "--catalogue", str(catalogue)) == 2
+    err = capsys.readouterr().err
+    assert err.startswith(f"Catalogue {catalogue}:") and "Traceback" not in err
+
+
+def test_invalid_segments_exit_2(tmp_path, capsys):
+    bad = tmp_path / "segments.csv"
+    bad.write_text("nom,age\nSeniors,62\n", encoding="utf-8")
+    assert run(str(bad), tmp_path / "sortie") == 2
+    assert capsys.readouterr().err.startswith("Segments:")
+    assert run(str(tmp_path / "absent.csv"), tmp_path / "sortie") == 2
+
+
+def test_unknown_format_exits_2(segments_csv, tmp_path):
+    assert run(segments_csv, tmp_path / "sortie", "--formats", "txt,docx") == 2
+
+
+def test_write_errors_fail_the_segment_only(segments_csv, tmp_path, monkeypatch, capsys):
+    write_outputs = cli.write_outputs
+
+    def failing(output_dir, segment, *args):
+        if segment["id"] == 2:
+            raise OSError("disque plein")
+        return write_outputs(output_dir, segment, *args)
+
+    monkeypatch.setattr(cli, "write_outputs", failing)
+    output = tmp_path / "sortie"
+    assert run(segments_csv, output) == 1
+    err = capsys.readouterr().err
+    assert "Cluster 2 en échec: écriture impossible: disque plein" in err and "1 échec(s)" in err
+    assert sorted(os.listdir(output)) == [
+        "persona_cluster_1.json", "persona_cluster_1.txt", "persona_cluster_3.json", "persona_cluster_3.txt"
+    ]
+    # Le segment en échec est repris au lancement suivant
+    monkeypatch.setattr(cli, "write_outputs", write_outputs)
+    assert run(segments_csv, output) == 0
+    assert "2 déjà généré(s), 1 à générer" in capsys.readouterr().err
+
+
+def test_pdf_render_error_fails_the_segment(segments_csv, tmp_path, monkeypatch, capsys):
+    def broken(segment_id, content, name):
+        raise ValueError("rendu impossible")
+
+    monkeypatch.setattr(cli, "generate_persona_pdf", broken)
+    assert run(segments_csv, tmp_path / "sortie", "--formats", "pdf") == 1
+    assert capsys.readouterr().err.count("écriture impossible: rendu impossible") == 3
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from persona_core.history import ChatHistoryManager, _message_tokens
+
+
+class SummaryBackend:
+    def __init__(self, summary="résumé des échanges", error=None):
+        self.summary = summary
+        self.error = error
+        self.calls = []
+
+    def complete(self, messages, **options):
+        self.calls.append(messages)
+        if self.error:
+            raise self.error
+        return self.summary
+
+
+def wait_until(condition, timeout=2.0):
+    # Le callback de compact() s'exécute dans le thread du résumé, après le résultat du Future
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition jamais atteinte"
+        time.sleep(0.005)
+
+
+def exchange(count, size=40):
+    history = []
+    for i in range(count):
+        history.append({"role": "user", "content": f"question {i} " + "q" * size})
+        history.append({"role": "assistant", "content": f"réponse {i} " + "r" * size})
+    return history
+
+
+def test_short_history_is_sent_as_is():
+    history = exchange(2)
+    assert ChatHistoryManager().messages_for(history) == history
+
+
+def test_budget_keeps_most_recent_messages():
+    history = exchange(10)
+    manager = ChatHistoryManager(budget_tokens=_message_tokens(history[-1]) * 3)
+    messages = manager.messages_for(history)
+    assert messages == history[-3:]
+
+
+def test_last_message_is_kept_even_over_budget():
+    history = [{"role": "user", "content": "x" * 1000}]
+    assert ChatHistoryManager(budget_tokens=10).messages_for(history) == history
+
+
+def test_consecutive_questions_are_merged():
+    history = [
+        {"role": "user", "content": "question interrompue"},
+        {"role": "user", "content": "nouvelle question"},
+    ]
+    messages = ChatHistoryManager().messages_for(history)
+    assert messages == [{"role": "user", "content": "question interrompue\n\nnouvelle question"}]
+    # L'historique affiché n'est pas modifié
+    assert history[0]["content"] == "question interrompue"
+
+
+def test_compact_folds_old_messages_into_summary():
+    history = exchange(10)
+    manager = ChatHistoryManager(budget_tokens=200, keep_recent=4)
+    backend = SummaryBackend()
+    future = manager.compact(history, backend)
+    assert future is not None
+    future.result()
+    wait_until(lambda: manager.summarized_count == len(history) - 4)
+    messages = manager.messages_for(history)
+    assert messages[0]["role"] == "system" and "résumé des échanges" in messages[0]["content"]
+    assert messages[1:] == history[-4:]
+
+
+def test_compact_does_nothing_under_threshold():
+    assert ChatHistoryManager().compact(exchange(2), SummaryBackend()) is None
+
+
+def test_summary_error_is_kept_and_history_unchanged():
+    history = exchange(10)
+    manager = ChatHistoryManager(budget_tokens=200, keep_recent=4)
+    future = manager.compact(history, SummaryBackend(error=RuntimeError("quota")))
+    with pytest.raises(RuntimeError):
+        future.result()
+    wait_until(lambda: manager.last_error is not None)
+    assert isinstance(manager.last_error, RuntimeError)
+    assert manager.summarized_count == 0
+
+
+def test_cleared_history_resets_summary():
+    history = exchange(10)
+    manager = ChatHistoryManager(budget_tokens=200, keep_recent=4)
+    manager.compact(history, SummaryBackend()).result()
+    wait_until(lambda: manager.summarized_count > 0)
+    assert manager.messages_for(exchange(1)) == exchange(1)
+    assert manager.summary == ""
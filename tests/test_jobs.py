@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+from persona_core.jobs import CANCELLED, DONE, FAILED, JobQueue
+
+
+@pytest.fixture
+def job_queue():
+    jobs = JobQueue(max_workers=8, keep_batches=2)
+    yield jobs
+    jobs.shutdown(wait=True)
+
+
+def wait_done(jobs, batch_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not jobs.batch(batch_id).done:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    return jobs.batch(batch_id)
+
+
+def test_results_errors_and_partial_text(job_queue):
+    def worker(payload, job):
+        if payload < 0:
+            raise ValueError("négatif")
+        job.append("x")
+        job.append(str(payload))
+        return payload * 2
+
+    batch = wait_done(job_queue, job_queue.submit([("a", 1), ("b", -1), ("c", 3)], worker, max_in_flight=2))
+    assert {job.key: job.result for job in batch.completed if job.status == DONE} == {"a": 2, "c": 6}
+    failed = [job for job in batch.completed if job.status == FAILED]
+    assert [job.key for job in failed] == ["b"] and isinstance(failed[0].error, ValueError)
+    assert batch.jobs["c"].partial == "x3"
+    assert job_queue.metrics()["failed"] == 1
+
+
+def test_max_in_flight_is_respected(job_queue):
+    lock = threading.Lock()
+    active = [0, 0]
+
+    def worker(payload, job):
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+
+    wait_done(job_queue, job_queue.submit([(i, i) for i in range(8)], worker, max_in_flight=2))
+    assert active[1] == 2
+
+
+def test_cancel_skips_pending_jobs(job_queue):
+    release = threading.Event()
+
+    def worker(payload, job):
+        release.wait(5)
+        return payload
+
+    batch_id = job_queue.submit([(i, i) for i in range(5)], worker, max_in_flight=1)
+    assert job_queue.cancel(batch_id) == 4
+    release.set()
+    batch = wait_done(job_queue, batch_id)
+    assert batch.counts()[DONE] == 1 and batch.counts()[CANCELLED] == 4
+
+
+def test_finished_batches_are_evicted_beyond_keep_batches(job_queue):
+    batch_ids = [job_queue.submit([(1, 1)], lambda payload, job: payload) for _ in range(2)]
+    for batch_id in batch_ids:
+        wait_done(job_queue, batch_id)
+    last = job_queue.submit([(1, 1)], lambda payload, job: payload)
+    wait_done(job_queue, last)
+    job_queue.submit([(1, 1)], lambda payload, job: payload)
+    assert job_queue.batch(batch_ids[0]) is None
+    assert job_queue.batch(last) is not None
@@ -0,0 +1,99 @@
+import pytest
+
+PyPDF2 = pytest.importorskip("PyPDF2")
+platypus = pytest.importorskip("reportlab.platypus")
+
+from persona_core.pdf import (  # noqa: E402
+    STYLE_VERSION, _inline_markup, generate_persona_pdf, markdown_to_flowables, persona_pdf_key,
+)
+
+
+def rendered(markdown_text):
+    """
+    (texte reportlab, nom du style) de chaque paragraphe ; None pour un espacement
+    """
+    return [
+        (flowable.text, flowable.style.name) if isinstance(flowable, platypus.Paragraph) else None
+        for flowable in markdown_to_flowables(markdown_text)
+    ]
+
+
+def test_headings():
+    assert rendered("# Titre\n### Sous-titre #\n**PROFIL DÉMOGRAPHIQUE**\n**Besoins**:") == [
+        ("Titre", "CustomHeading"),
+        ("Sous-titre", "CustomHeading"),
+        ("PROFIL DÉMOGRAPHIQUE", "CustomHeading"),
+        ("Besoins", "CustomHeading"),
+    ]
+
+
+def test_blank_lines_become_spacers():
+    assert rendered("Texte\n\n  \nSuite") == [
+        ("Texte", "CustomNormal"), None, None, ("Suite", "CustomNormal"),
+    ]
+
+
+def test_nested_bullets():
+    assert rendered("- un\n  * deux\n    + trois\n\t\t\t- profond\n• puce") == [
+        ("• un", "CustomBullet0"),
+        ("– deux", "CustomBullet1"),
+        ("· trois", "CustomBullet2"),
+        ("· profond", "CustomBullet2"),
+        ("• puce", "CustomBullet0"),
+    ]
+
+
+def test_numbered_lists():
+    assert rendered("1. premier\n2) second\n  3. imbriqué\n2024 en chiffres") == [
+        ("1. premier", "CustomNumber0"),
+        ("2. second", "CustomNumber0"),
+        ("3. imbriqué", "CustomNumber1"),
+        ("2024 en chiffres", "CustomNormal"),
+    ]
+
+
+def test_emphasis_line_is_not_a_bullet():
+    assert rendered("*important* pour tous\n-5 % de frais") == [
+        ("<i>important</i> pour tous", "CustomNormal"),
+        ("-5 % de frais", "CustomNormal"),
+    ]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("**gras** et *italique*", "<b>gras</b> et <i>italique</i>"),
+    ("__gras__ et _italique_", "<b>gras</b> et <i>italique</i>"),
+    ("***les deux***", "<b><i>les deux</i></b>"),
+    ("___les deux___ puis *fin*", "<b><i>les deux</i></b> puis <i>fin</i>"),
+    ("**gras avec *italique* dedans**", "<b>gras avec <i>italique</i> dedans</b>"),
+    ("code `a<b>`", 'code <font face="Courier">a&lt;b&gt;</font>'),
+    ("snake_case et 2 * 3 * 4", "snake_case et 2 * 3 * 4"),
+    ("R&D <client>", "R&amp;D &lt;client&gt;"),
+    ("**R&D**", "<b>R&amp;D</b>"),
+])
+def test_inline_markup(text, expected):
+    assert _inline_markup(text) == expected
+
+
+def test_special_characters_are_escaped_in_every_line_kind():
+    assert rendered("# A & B\n- <b> brut\nPrix < 5 & > 2") == [
+        ("A &amp; B", "CustomHeading"),
+        ("• &lt;b&gt; brut", "CustomBullet0"),
+        ("Prix &lt; 5 &amp; &gt; 2", "CustomNormal"),
+    ]
+
+
+def test_generate_persona_pdf():
+    content = "**PROFIL**\n- revenu ***élevé***\n  - épargne & crédit\n1. Offre <premium>\n\nTexte normal"
+    reader = PyPDF2.PdfReader(generate_persona_pdf(3, content, "Jeunes actifs & étudiants"))
+    text = reader.pages[0].extract_text()
+    for expected in ("PERSONA MARKETING", "Cluster 3: Jeunes actifs & étudiants", "PROFIL",
+                     "revenu élevé", "épargne & crédit", "1. Offre <premium>", "Texte normal"):
+        assert expected in text
+
+
+def test_pdf_key_depends_on_style_version(monkeypatch):
+    key = persona_pdf_key(1, "contenu", "segment")
+    assert persona_pdf_key(1, "contenu", "segment") == key
+    assert persona_pdf_key(1, "contenu modifié", "segment") != key
+    monkeypatch.setattr("persona_core.pdf.STYLE_VERSION", STYLE_VERSION + 1)
+    assert persona_pdf_key(1, "contenu", "segment") != key
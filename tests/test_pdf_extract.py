@@ -0,0 +1,76 @@
+import io
+import os
+
+import pytest
+
+PyPDF2 = pytest.importorskip("PyPDF2")
+canvas = pytest.importorskip("reportlab.pdfgen.canvas")
+
+from persona_core.pdf_extract import PageTextCache, extract_pdf_text, page_fingerprint  # noqa: E402
+
+
+def make_pdf(form_text="Compte courant", pages=1):
+    """
+    PDF dont chaque page dessine un formulaire (XObject) commun puis son numéro
+    """
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, invariant=1)
+    c.beginForm("bloc")
+    c.drawString(72, 700, form_text)
+    c.endForm()
+    for i in range(pages):
+        c.doForm("bloc")
+        c.drawString(72, 600, f"page {i}")
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def first_page(data):
+    return PyPDF2.PdfReader(io.BytesIO(data)).pages[0]
+
+
+def test_fingerprint_is_stable():
+    assert page_fingerprint(first_page(make_pdf())) == page_fingerprint(first_page(make_pdf()))
+    assert page_fingerprint(first_page(make_pdf()), salt="v1") != page_fingerprint(first_page(make_pdf()), salt="v2")
+
+
+def test_fingerprint_covers_xobject_streams():
+    current, changed = first_page(make_pdf("Compte courant")), first_page(make_pdf("Carte Visa"))
+    # Même flux de contenu : seul le formulaire référencé dans les ressources diffère
+    assert current.get_contents().get_data() == changed.get_contents().get_data()
+    assert page_fingerprint(current) != page_fingerprint(changed)
+
+
+def test_extract_uses_page_cache(tmp_path):
+    cache = PageTextCache(str(tmp_path))
+    text, pages, extracted = extract_pdf_text(make_pdf(pages=3), cache=cache)
+    assert (pages, extracted) == (3, 3)
+    assert "Compte courant" in text and "page 2" in text
+    assert extract_pdf_text(make_pdf(pages=3), cache=cache) == (text, 3, 0)
+    # Le formulaire a changé : toutes les pages sont relues
+    text, _, extracted = extract_pdf_text(make_pdf("Carte Visa", pages=3), cache=cache)
+    assert extracted == 3 and "Carte Visa" in text and "Compte courant" not in text
+
+
+def test_prune_removes_expired_pages(tmp_path):
+    cache = PageTextCache(str(tmp_path), max_age_seconds=100, max_bytes=0)
+    cache.put("aa01", "ancienne")
+    cache.put("bb02", "récente")
+    path = cache._path("aa01")
+    os.utime(path, (os.path.getmtime(path) - 200,) * 2)
+    assert cache.prune() == 1
+    assert cache.get("aa01") is None and cache.get("bb02") == "récente"
+
+
+def test_prune_evicts_least_recently_read(tmp_path):
+    cache = PageTextCache(str(tmp_path), max_age_seconds=0, max_bytes=15)
+    for age, key in enumerate(("aa01", "bb02", "cc03")):
+        cache.put(key, "x" * 10)
+        path = cache._path(key)
+        os.utime(path, (os.path.getmtime(path) - 100 + age,) * 2)
+    # Relire la plus ancienne la rend la plus récente
+    assert cache.get("aa01") == "x" * 10
+    assert cache.prune() == 2
+    assert cache.get("aa01") == "x" * 10
+    assert cache.get("bb02") is None and cache.get("cc03") is None
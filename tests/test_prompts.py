@@ -0,0 +1,51 @@
+import pickle
+
+from persona_core.backends import wire_content
+from persona_core.prompts import PREFIX_SEPARATOR, Prompt, build_persona_prompt, prefix_length
+
+SENIORS = {"id": 1, "name": "Seniors", "age": 62, "characteristics": "Retraités"}
+JEUNES = {"id": 2, "name": "Jeunes", "age": 24, "characteristics": "Étudiants"}
+
+
+def test_prompt_keeps_prefix_length():
+    prompt = Prompt("instructions", "données")
+    assert prompt == "instructions" + PREFIX_SEPARATOR + "données"
+    assert prompt[:prefix_length(prompt)] == "instructions" + PREFIX_SEPARATOR
+    assert prefix_length("texte quelconque") == 0
+
+
+def test_separator_inside_variable_part_does_not_move_prefix():
+    prompt = Prompt("instructions", "persona" + PREFIX_SEPARATOR + "suite")
+    assert prefix_length(prompt) == len("instructions" + PREFIX_SEPARATOR)
+
+
+def test_prompt_survives_pickle():
+    prompt = Prompt("instructions", "données" + PREFIX_SEPARATOR + "suite")
+    restored = pickle.loads(pickle.dumps(prompt))
+    assert restored == prompt and isinstance(restored, Prompt)
+    assert prefix_length(restored) == prefix_length(prompt)
+
+
+def test_segments_share_the_stable_prefix():
+    seniors, jeunes = build_persona_prompt(SENIORS), build_persona_prompt(JEUNES)
+    assert prefix_length(seniors) == prefix_length(jeunes) > 0
+    assert seniors[:prefix_length(seniors)] == jeunes[:prefix_length(jeunes)]
+    assert "Seniors" in seniors[prefix_length(seniors):] and "Seniors" not in seniors[:prefix_length(seniors)]
+
+
+def test_catalogue_placement():
+    selected = build_persona_prompt(SENIORS, catalogue_products="Livret Sénior")
+    assert "Livret Sénior" in selected[prefix_length(selected):]
+    shared = build_persona_prompt(SENIORS, shared_catalogue="Catalogue complet")
+    assert "Catalogue complet" in shared[:prefix_length(shared)]
+    assert shared[:prefix_length(shared)] == build_persona_prompt(JEUNES, shared_catalogue="Catalogue complet")[
+        :prefix_length(shared)]
+
+
+def test_wire_content_marks_prefix_only_when_enabled():
+    prompt = build_persona_prompt(SENIORS)
+    message = {"role": "user", "content": prompt, "cache_prefix": prefix_length(prompt)}
+    assert wire_content(message) == prompt
+    prefix, data = wire_content(message, cache_control=True)
+    assert prefix["cache_control"] == {"type": "ephemeral"} and prefix["text"] + data["text"] == prompt
+    assert "cache_control" not in data
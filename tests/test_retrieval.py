@@ -0,0 +1,67 @@
+from persona_core.retrieval import BM25Index, CatalogueIndex, segment_query, split_catalogue, tokenize
+
+
+def catalogue_text(count):
+    products = [
+        "Nom: Plan Retraite Sérénité\nDescription: épargne retraite et pension complémentaire pour seniors",
+        "Nom: Crédit Immobilier Habitat\nDescription: financement de la résidence principale des familles",
+        "Nom: Carte Jeune\nDescription: premier compte et carte pour étudiants",
+    ]
+    products += [f"Nom: Produit générique {i}\nDescription: compte courant standard" for i in range(count - len(products))]
+    return "".join(f"--- PRODUIT {i + 1} ---\n{product}\n\n" for i, product in enumerate(products))
+
+
+def test_tokenize_removes_accents_stopwords_and_plurals():
+    assert tokenize("Les retraités et l'épargne") == ["retraite", "epargne"]
+
+
+def test_split_catalogue_by_product_marker():
+    products = split_catalogue(catalogue_text(5))
+    assert len(products) == 5
+    assert products[0].startswith("--- PRODUIT 1 ---")
+
+
+def test_split_catalogue_groups_plain_text_in_chunks():
+    text = "\n".join(f"Paragraphe {i} " + "x" * 100 for i in range(20))
+    chunks = split_catalogue(text, chunk_chars=300)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 300 for chunk in chunks)
+    assert "".join(chunks).count("Paragraphe") == 20
+
+
+def test_bm25_ranks_matching_document_first():
+    index = BM25Index(["compte courant", "épargne retraite pension", "crédit immobilier"])
+    ranked = index.search("préparer sa retraite", k=3)
+    assert ranked[0][0] == 1
+    assert [doc_id for doc_id, _ in ranked] == [1]
+    assert index.search("inconnu") == []
+
+
+def test_relevant_products_keeps_catalogue_order_and_budget():
+    index = CatalogueIndex.from_text(catalogue_text(40))
+    text = index.relevant_products("retraite pension immobilier", k=2)
+    assert "(2 produits sélectionnés sur 40" in text
+    assert text.index("Plan Retraite") < text.index("Crédit Immobilier")
+    assert len(index.relevant_products("compte", k=40, max_chars=500)) < 800
+
+
+def test_relevant_products_falls_back_to_first_products():
+    index = CatalogueIndex.from_text(catalogue_text(20))
+    text = index.relevant_products("zzz", k=2)
+    assert "Plan Retraite" in text and "Crédit Immobilier" in text
+
+
+def test_persona_catalogue_shares_small_catalogues():
+    small = CatalogueIndex.from_text(catalogue_text(3))
+    shared, selection = small.persona_catalogue("retraite")
+    assert selection is None and shared.startswith("(3 produits)")
+
+    large = CatalogueIndex.from_text(catalogue_text(40))
+    shared, selection = large.persona_catalogue("retraite")
+    assert shared is None and "Plan Retraite" in selection
+
+
+def test_segment_query_adds_needs_from_age():
+    assert "retraite" in segment_query({"name": "Seniors", "age": 62})
+    assert "étudiant" in segment_query({"name": "Jeunes", "age": "24"})
+    assert segment_query({"name": "Sans âge", "age": None}).startswith("Sans âge")
@@ -0,0 +1,144 @@
+import pytest
+
+from persona_core.scheduler import DeadlineExceeded, RequestScheduler, TokenBucket, is_retryable, retry_after
+
+
+class FakeClock:
+    """
+    Horloge et sleep simulés : attendre fait avancer le temps
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+def scheduler(clock, **options):
+    options.setdefault("deadline", 600)
+    return RequestScheduler(clock=clock, sleep=clock.sleep, seed=0, **options)
+
+
+def test_token_bucket_waits_when_empty():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)
+    assert bucket.reserve(60) == 0.0
+    # Débit d'un jeton par seconde : le suivant est disponible dans une seconde
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    clock.now += 10
+    bucket.adjust(-5)
+    assert bucket.reserve(1) == 0.0
+
+
+def test_is_retryable_by_status_and_type():
+    assert is_retryable(HTTPError(429))
+    assert is_retryable(HTTPError(503))
+    assert not is_retryable(HTTPError(400))
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(ValueError())
+    assert not is_retryable(DeadlineExceeded())
+
+
+def test_retry_after_header():
+    assert retry_after(HTTPError(429, {"retry-after": "7"})) == 7.0
+    assert retry_after(HTTPError(429)) is None
+
+
+def test_transient_errors_are_retried_with_backoff():
+    clock = FakeClock()
+    errors = [HTTPError(503), HTTPError(502)]
+
+    def call(messages, **options):
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    requests = scheduler(clock, base_delay=1.0, max_delay=30.0)
+    assert requests.complete(call, [{"role": "user", "content": "q"}], {}) == "ok"
+    metrics = requests.metrics()
+    assert metrics["attempts"] == 3 and metrics["retries"] == 2
+    # Gigue complète entre la moitié et la totalité du délai exponentiel
+    assert 0.5 <= clock.sleeps[0] <= 1.0 and 1.0 <= clock.sleeps[1] <= 2.0
+
+
+def test_permanent_error_is_not_retried():
+    clock = FakeClock()
+
+    def call(messages, **options):
+        raise HTTPError(400)
+
+    requests = scheduler(clock)
+    with pytest.raises(HTTPError):
+        requests.complete(call, [{"role": "user", "content": "q"}], {})
+    assert requests.metrics()["attempts"] == 1
+    assert requests.metrics()["failures"] == 1
+
+
+def test_rate_limit_respects_retry_after():
+    clock = FakeClock()
+    errors = [HTTPError(429, {"retry-after": "20"})]
+
+    def call(messages, **options):
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    requests = scheduler(clock)
+    assert requests.complete(call, [{"role": "user", "content": "q"}], {}) == "ok"
+    assert requests.metrics()["rate_limited"] == 1
+    assert clock.now >= 20
+
+
+def test_deadline_stops_retries():
+    clock = FakeClock()
+
+    def call(messages, **options):
+        raise HTTPError(503)
+
+    requests = scheduler(clock, deadline=5, base_delay=4.0)
+    with pytest.raises(DeadlineExceeded):
+        requests.complete(call, [{"role": "user", "content": "q"}], {})
+    assert requests.metrics()["deadline_exceeded"] == 1
+
+
+def test_remaining_time_is_passed_as_timeout():
+    clock = FakeClock()
+    seen = {}
+
+    def call(messages, **options):
+        seen.update(options)
+        return "ok"
+
+    scheduler(clock, deadline=90).complete(call, [{"role": "user", "content": "q"}], {"label": "x"})
+    assert seen["timeout"] == pytest.approx(90)
+    assert seen["label"] == "x"
+
+
+def test_stream_is_not_retried_after_first_chunk():
+    clock = FakeClock()
+    attempts = []
+
+    def call(messages, **options):
+        attempts.append(1)
+        yield "début"
+        raise HTTPError(503)
+
+    requests = scheduler(clock)
+    received = []
+    with pytest.raises(HTTPError):
+        for chunk in requests.stream(call, [{"role": "user", "content": "q"}], {}):
+            received.append(chunk)
+    assert received == ["début"] and len(attempts) == 1
@@ -0,0 +1,80 @@
+import io
+
+import pytest
+
+from persona_core.segments import SegmentSchemaError, SegmentTable, find_segment, find_segment_name, load_segment_csv
+
+
+def csv_file(text):
+    return io.BytesIO(text.encode("utf-8"))
+
+
+def test_load_keeps_known_columns_and_reports_the_others():
+    table, ignored, missing, warnings = load_segment_csv(csv_file(
+        "id,name,age,nbProducts,extra\n1,Seniors,62,3,x\n2,Jeunes,24,1,y\n"
+    ))
+    assert isinstance(table, SegmentTable) and len(table) == 2
+    assert ignored == ["extra"]
+    assert "age" not in missing and "characteristics" in missing
+    assert warnings == []
+    assert table[0] == {"id": 1, "name": "Seniors", "age": 62, "nbProducts": 3}
+
+
+@pytest.mark.parametrize("text", ["name,age\nSeniors,62\n", "id,age\n1,62\n"])
+def test_missing_required_column_is_rejected(text):
+    with pytest.raises(SegmentSchemaError, match="obligatoire"):
+        load_segment_csv(csv_file(text))
+
+
+def test_empty_file_is_rejected():
+    with pytest.raises(SegmentSchemaError):
+        load_segment_csv(csv_file(""))
+    with pytest.raises(SegmentSchemaError, match="Aucun segment"):
+        load_segment_csv(csv_file("id,name\n"))
+
+
+def test_non_numeric_values_are_blanked_with_a_warning():
+    table, _, _, warnings = load_segment_csv(csv_file("id,name,age\n1,A,40\n2,B,quarante\n3,C,\n"))
+    assert warnings == ["age : 1 valeur(s) non numérique(s) remplacée(s) par N/A"]
+    assert table.get(1)["age"] == 40
+    assert "age" not in table.get(2)
+    assert "age" not in table.get(3)
+
+
+def test_rows_without_id_are_dropped():
+    table, _, _, warnings = load_segment_csv(csv_file("id,name\n1,A\n,B\n3,C\n"))
+    assert [segment["id"] for segment in table] == [1, 3]
+    assert warnings == ["1 ligne(s) sans id ignorée(s)"]
+
+
+def test_reading_in_chunks_gives_the_same_table():
+    text = "id,name,age\n" + "".join(f"{i},Segment {i},{20 + i % 50}\n" for i in range(25))
+    whole, _, _, _ = load_segment_csv(csv_file(text))
+    chunked, _, _, _ = load_segment_csv(csv_file(text), chunk_rows=4)
+    assert list(whole) == list(chunked)
+
+
+def test_text_ids_are_kept_as_text():
+    table, _, _, _ = load_segment_csv(csv_file("id,name\nA1,Premier\nB2,Second\n"))
+    assert table.get("B2")["name"] == "Second"
+    assert table.search("a1") == [("A1", "Premier")]
+
+
+def test_get_search_and_select():
+    table, _, _, _ = load_segment_csv(csv_file("id,name\n1,Seniors urbains\n2,Jeunes\n2,Doublon\n3,\n"))
+    assert table.get(2)["name"] == "Jeunes"
+    assert table.get(99) is None
+    assert table.get("pas un id") is None
+    assert table.search("senior") == [(1, "Seniors urbains")]
+    assert table.search("3") == [(3, "Unknown")]
+    assert len(table.search("", limit=2)) == 2
+    selection = table.select([1, 2])
+    assert [segment["id"] for segment in selection] == [1, 2]
+    assert table.select([2, 1]) is selection
+
+
+def test_find_segment_works_on_tables_and_lists():
+    table, _, _, _ = load_segment_csv(csv_file("id,name\n1,A\n"))
+    segments = [{"id": 1, "name": "A"}]
+    assert find_segment(table, 1) == find_segment(segments, 1) == {"id": 1, "name": "A"}
+    assert find_segment_name(table, 9) == find_segment_name(segments, 9) == "Unknown"
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from persona_core.cache import PersonaCache, SingleFlight
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_followers_wait_for_the_leader_result():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "persona"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do("k", slow)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flights.do("k", slow))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    wait_until(lambda: flights.joined == 3)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results) == [("persona", False)] * 3 + [("persona", True)]
+    assert flights.in_flight() == 0
+
+
+def test_leader_error_is_raised_to_followers():
+    flights = SingleFlight()
+    future, leader = flights.acquire("k")
+    assert leader
+    follower_future, follower_leader = flights.acquire("k")
+    assert follower_future is future and not follower_leader
+    flights.release("k", future, error=ValueError("échec"))
+    with pytest.raises(ValueError):
+        follower_future.result(1)
+    # La clé est libérée : l'appel suivant redevient leader
+    assert flights.acquire("k")[1]
+
+
+def test_stream_once_follower_gets_full_text_and_leader_flag(tmp_path):
+    cache = PersonaCache(str(tmp_path / "cache.db"))
+    gate = threading.Event()
+
+    def stream():
+        yield "Bon"
+        gate.wait(5)
+        yield "jour"
+
+    leader = cache.stream_once("m", "prompt", stream)
+    assert leader.leader is None
+    assert next(leader) == "Bon"
+    assert leader.leader is True
+
+    follower_result = []
+
+    def follow():
+        flight = cache.stream_once("m", "prompt", stream)
+        follower_result.append(("".join(flight), flight.leader))
+
+    thread = threading.Thread(target=follow)
+    thread.start()
+    wait_until(lambda: cache.flights.joined == 1)
+    gate.set()
+    assert "".join(leader) == "jour"
+    thread.join(5)
+
+    assert follower_result == [("Bonjour", False)]
+    assert cache.get("m", "prompt") == "Bonjour"
+
+
+def test_abandoned_stream_releases_its_flight(tmp_path):
+    cache = PersonaCache(str(tmp_path / "cache.db"))
+    flight = cache.stream_once("m", "prompt", lambda: iter(["a", "b"]))
+    assert next(flight) == "a"
+    flight.close()
+    assert cache.flights.in_flight() == 0
+    assert cache.get("m", "prompt") is None
@@ -0,0 +1,118 @@
+import sqlite3
+
+from persona_core.cache import prompt_key
+from persona_core.store import PersonaStore
+
+
+def make_store(tmp_path, **options):
+    return PersonaStore(str(tmp_path / "store.db"), **options)
+
+
+def test_save_is_written_behind_and_visible_after_flush(tmp_path):
+    store = make_store(tmp_path)
+    store.save("app", {"id": 3, "name": "Seniors"}, "persona", prompt_key("m", "p"), "m")
+    assert store.flush(5)
+    records = store.load("app")
+    assert list(records) == [3]
+    assert records[3]["content"] == "persona"
+    assert records[3]["segment"] == {"id": 3, "name": "Seniors"}
+    assert store.load("autre") == {}
+
+
+def test_saves_are_grouped_in_one_transaction(tmp_path):
+    store = make_store(tmp_path, batch_size=100, batch_delay=0.5)
+    connect = store._connect
+    transactions = []
+
+    def counting_connect():
+        transactions.append(1)
+        return connect()
+
+    store._connect = counting_connect
+    for segment_id in range(20):
+        store.save("app", {"id": segment_id}, f"persona {segment_id}", prompt_key("m", str(segment_id)), "m")
+    store.flush(5)
+    assert len(transactions) == 1
+    store._connect = connect
+    assert len(store.load("app")) == 20
+
+
+def rows(store):
+    with sqlite3.connect(store.path) as conn:
+        return conn.execute("SELECT workspace, segment_id, content FROM personas ORDER BY workspace, segment_id").fetchall()
+
+
+def test_same_segment_with_another_prompt_replaces_the_record(tmp_path):
+    store = make_store(tmp_path)
+    store.save("app", {"id": 3, "name": "Défaut"}, "persona défaut", prompt_key("m", "prompt défaut"), "m")
+    store.flush(5)
+    store.save("app", {"id": 3, "name": "CSV"}, "persona csv", prompt_key("m", "prompt csv"), "m")
+    store.save("autre", {"id": 3}, "persona autre", prompt_key("m", "prompt autre"), "m")
+    store.flush(5)
+
+    def current(prompt):
+        return lambda record: prompt
+
+    assert store.load("app", current("prompt csv"))[3]["content"] == "persona csv"
+    assert store.load("app", current("prompt défaut")) == {}
+    assert store.load("app", lambda record: None) == {}
+    assert rows(store) == [("app", "3", "persona csv"), ("autre", "3", "persona autre")]
+
+
+def test_last_save_of_a_segment_wins_within_a_batch(tmp_path):
+    store = make_store(tmp_path, batch_size=100, batch_delay=0.5)
+    for version in range(5):
+        store.save("app", {"id": 1}, f"persona {version}", prompt_key("m", str(version)), "m")
+    store.flush(5)
+    assert rows(store) == [("app", "1", "persona 4")]
+
+
+def test_older_prompts_are_pruned_on_open(tmp_path):
+    store = make_store(tmp_path)
+    with sqlite3.connect(store.path) as conn:
+        conn.executemany(
+            "INSERT INTO personas VALUES ('app', '1', NULL, '{\"id\": 1}', ?, ?, 'm', ?)",
+            [("ancien", "h1", 1), ("récent", "h2", 2), ("plus ancien", "h0", 0)]
+        )
+    store = make_store(tmp_path)
+    assert rows(store) == [("app", "1", "récent")]
+
+
+def test_delete_one_segment_or_whole_workspace(tmp_path):
+    store = make_store(tmp_path)
+    for segment_id in (1, 2):
+        store.save("app", {"id": segment_id}, "persona", prompt_key("m", str(segment_id)), "m")
+    store.save("autre", {"id": 1}, "persona", prompt_key("m", "1"), "m")
+    store.delete("app", 1)
+    assert list(store.load("app")) == [2]
+    store.delete("app")
+    assert store.load("app") == {}
+    assert list(store.load("autre")) == [1]
+
+
+def test_old_schema_is_migrated(tmp_path):
+    path = str(tmp_path / "store.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """CREATE TABLE personas (workspace TEXT NOT NULL, segment_id TEXT NOT NULL, segment_name TEXT,
+           segment TEXT NOT NULL, content TEXT NOT NULL, prompt_hash TEXT, model TEXT, created_at REAL NOT NULL,
+           PRIMARY KEY (workspace, segment_id))"""
+    )
+    conn.execute("""INSERT INTO personas VALUES ('app', '3', 'A', '{"id": 3}', 'ancien', NULL, 'm', 1)""")
+    conn.commit()
+    conn.close()
+
+    store = PersonaStore(path)
+    assert store.load("app")[3]["content"] == "ancien"
+    store.save("app", {"id": 3}, "nouveau", prompt_key("m", "p"), "m")
+    store.flush(5)
+    assert store.load("app", lambda record: "p")[3]["content"] == "nouveau"
+
+
+def test_write_errors_are_kept_in_last_error(tmp_path):
+    store = make_store(tmp_path)
+    with sqlite3.connect(store.path) as conn:
+        conn.execute("DROP TABLE personas")
+    store.save("app", {"id": 1}, "persona", prompt_key("m", "p"), "m")
+    assert store.flush(5)
+    assert isinstance(store.last_error, sqlite3.Error)
@@ -0,0 +1,140 @@
+import pytest
+
+from persona_core import tokens
+from persona_core.backends import LLMBackend
+from persona_core.telemetry import InstrumentedBackend, TelemetryRecorder, estimate_cost
+from persona_core.tokens import TokenCounts, count_message_tokens
+
+MESSAGES = [{"role": "system", "content": "Tu es un assistant."}, {"role": "user", "content": "Bonjour"}]
+
+
+class StubBackend(LLMBackend):
+    model_name = "gpt-4o-mini"
+
+    def __init__(self, chunks=("Bonjour", " à vous"), error=None):
+        self.chunks = chunks
+        self.error = error
+
+    def complete(self, messages, **options):
+        if self.error:
+            raise self.error
+        return "".join(self.chunks)
+
+    def stream(self, messages, **options):
+        for chunk in self.chunks:
+            yield chunk
+        if self.error:
+            raise self.error
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    """
+    Textes passés au comptage de tokens
+    """
+    calls = []
+    count = tokens.count_tokens
+
+    def counting(text, model=tokens.DEFAULT_MODEL):
+        calls.append(text)
+        return count(text, model)
+
+    monkeypatch.setattr(tokens, "count_tokens", counting)
+    return calls
+
+
+def test_count_message_tokens_adds_envelope():
+    assert count_message_tokens([]) == 3
+    assert count_message_tokens([{"role": "user", "content": ""}]) == 7
+
+
+def test_token_counts_recount_only_changed_completion(counted):
+    counts = TokenCounts(MESSAGES)
+    assert len(counted) == len(MESSAGES)
+    first = counts.completion("réponse")
+    assert counts.completion("réponse") == first
+    assert counted[len(MESSAGES):] == ["réponse"]
+    counts.completion("autre réponse")
+    assert counted[-1] == "autre réponse"
+
+
+def test_estimate_cost():
+    assert estimate_cost("gpt-4o-mini", 1_000_000, 1_000_000) == pytest.approx(0.75)
+    assert estimate_cost("modèle inconnu", 1000, 1000) == 0.0
+
+
+def test_instrumented_complete_records_call():
+    telemetry = TelemetryRecorder()
+    backend = InstrumentedBackend(StubBackend(), telemetry)
+    assert backend.complete(MESSAGES, label="Segment 1") == "Bonjour à vous"
+    (record,) = telemetry.records()
+    assert record.label == "Segment 1" and record.model == "gpt-4o-mini" and not record.error
+    assert record.prompt_tokens == count_message_tokens(MESSAGES)
+    assert record.completion_tokens > 0 and record.cost_usd > 0
+
+
+def test_instrumented_reuses_token_counts(counted):
+    telemetry = TelemetryRecorder()
+    counts = TokenCounts(MESSAGES)
+    counted.clear()
+    InstrumentedBackend(StubBackend(), telemetry).complete(MESSAGES, token_counts=counts)
+    # Seule la réponse est comptée : le prompt l'a déjà été
+    assert counted == ["Bonjour à vous"]
+
+
+def test_stream_errors_and_abandons_are_recorded():
+    telemetry = TelemetryRecorder()
+    backend = InstrumentedBackend(StubBackend(error=RuntimeError("coupure")), telemetry)
+    with pytest.raises(RuntimeError):
+        list(backend.stream(MESSAGES))
+    stream = InstrumentedBackend(StubBackend(), telemetry).stream(MESSAGES, label="abandon")
+    next(stream)
+    stream.close()
+    failed, abandoned = telemetry.records()
+    assert failed.error == "coupure"
+    assert abandoned.label == "abandon" and abandoned.completion_tokens == tokens.count_tokens("Bonjour")
+
+
+def test_summary_excludes_cache_hits_and_errors():
+    telemetry = TelemetryRecorder()
+    InstrumentedBackend(StubBackend(), telemetry).complete(MESSAGES)
+    InstrumentedBackend(StubBackend(), telemetry).record_cache_hit(MESSAGES, "Bonjour à vous")
+    with pytest.raises(RuntimeError):
+        InstrumentedBackend(StubBackend(error=RuntimeError("quota")), telemetry).complete(MESSAGES)
+    summary = telemetry.summary()
+    assert (summary["calls"], summary["cache_hits"], summary["errors"]) == (3, 1, 1)
+    assert summary["prompt_tokens"] == count_message_tokens(MESSAGES)
+    hit = telemetry.records()[1]
+    assert hit.cache_hit and hit.cost_usd == 0.0
+
+
+def test_exports():
+    telemetry = TelemetryRecorder(max_records=2)
+    for _ in range(3):
+        InstrumentedBackend(StubBackend(), telemetry).complete(MESSAGES, label='segment "A"')
+    assert len(telemetry.records()) == 2
+    assert telemetry.to_csv().splitlines()[0].startswith("timestamp,label,model")
+    exposition = telemetry.to_prometheus()
+    assert 'persona_llm_calls_total{model="gpt-4o-mini",cache="miss"} 3' in exposition
+    assert 'persona_llm_latency_seconds_bucket{model="gpt-4o-mini",le="+Inf"} 3' in exposition
+
+
+def test_prometheus_counters_never_decrease():
+    telemetry = TelemetryRecorder(max_records=4)
+    backend = InstrumentedBackend(StubBackend(), telemetry)
+    previous = None
+    for _ in range(3):
+        for _ in range(5):
+            backend.complete(MESSAGES)
+        counters = {
+            line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+            for line in telemetry.to_prometheus().splitlines() if not line.startswith("#")
+        }
+        if previous:
+            assert all(counters[name] >= value for name, value in previous.items())
+        previous = counters
+    assert previous['persona_llm_calls_total{model="gpt-4o-mini",cache="miss"}'] == 15
+    assert previous['persona_llm_prompt_tokens_total{model="gpt-4o-mini"}'] == 15 * count_message_tokens(MESSAGES)
+    telemetry.clear()
+    assert telemetry.records() == []
+    assert 'persona_llm_latency_seconds_count{model="gpt-4o-mini"} 15' in telemetry.to_prometheus()